@@ -3,4 +3,15 @@ from om_lite.core.implicitcomponent import ImplicitComponent
 from om_lite.core.indepvarcomp import IndepVarComp
 # from om_lite.core.system import System
 from om_lite.core.group import Group
-# from om_lite.core.problem import Problem
\ No newline at end of file
+from om_lite.core.parallel_group import ParallelGroup
+from om_lite.core.problem import Problem
+from om_lite.core.driver import Driver
+from om_lite.core.linear_solvers import DirectSolver, ILUSolver, LinearBlockJac, ScipyKrylov
+from om_lite.core.nonlinear_solvers import NonlinearBlockGS, NewtonSolver, BoundsEnforceLS, \
+    ArmijoGoldsteinLS
+from om_lite.core.doe_driver import DOEDriver, ListGenerator, UniformGenerator, \
+    FullFactorialGenerator
+from om_lite.core.units import convert_units, unit_conversion
+from om_lite.core.recording import BinaryRecorder
+from om_lite.core.case_reader import CaseReader
+from om_lite.core.profiling import Profiler
@@ -0,0 +1 @@
+"""Benchmarks of scalable synthetic models, run with ``python -m om_lite.benchmarks``."""
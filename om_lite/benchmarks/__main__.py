@@ -0,0 +1,82 @@
+"""Command line interface of the benchmarks."""
+import argparse
+import sys
+
+from om_lite.benchmarks.suite import compare_results, get_benchmarks, load_results, \
+    run_benchmarks, write_comparison
+
+
+def _parse_case(text):
+    model, partials, num_comps, size = text.split(':')
+    return model, partials, int(num_comps), int(size)
+
+
+def main(args=None):
+    """
+    Run the benchmarks or compare saved results.
+    Parameters
+    ----------
+    args : list of str or None
+        Command line arguments, sys.argv if None.
+    Returns
+    -------
+    int
+        Exit status, 1 if a comparison found a regression.
+    """
+    parser = argparse.ArgumentParser(prog='python -m om_lite.benchmarks',
+                                     description='Benchmarks of scalable synthetic models.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='Run the benchmarks.')
+    run.add_argument('-o', '--output', help='JSON file the results are saved to.')
+    run.add_argument('-k', '--select', action='append',
+                     help='Pattern of the names of the benchmarks to run, repeatable.')
+    run.add_argument('-c', '--case', action='append', type=_parse_case,
+                     help='Benchmark model:partials:num_comps:size, repeatable, replacing '
+                     'the default suite.')
+    run.add_argument('-r', '--repeat', type=int, default=3,
+                     help='Number of timed repetitions.')
+    run.add_argument('-n', '--num-calls', type=int, default=1000,
+                     help='Number of set_val and get_val calls timed.')
+    run.add_argument('--no-memory', action='store_true',
+                     help='Do not measure the peak memory.')
+    run.add_argument('-b', '--baseline', help='JSON file of results to compare with.')
+    run.add_argument('-t', '--tolerance', type=float, default=0.1,
+                     help='Relative increase reported as a regression.')
+
+    sub.add_parser('list', help='List the benchmarks of the default suite.')
+
+    compare = sub.add_parser('compare', help='Compare saved results.')
+    compare.add_argument('baseline', help='JSON file of the reference results.')
+    compare.add_argument('current', help='JSON file of the results to check.')
+    compare.add_argument('-t', '--tolerance', type=float, default=0.1,
+                         help='Relative increase reported as a regression.')
+    compare.add_argument('--changed', action='store_true',
+                         help='Only show the metrics that changed by more than the tolerance.')
+
+    options = parser.parse_args(args)
+
+    if options.command == 'list':
+        for name in get_benchmarks():
+            print(name)
+        return 0
+
+    if options.command == 'run':
+        baseline = load_results(options.baseline) if options.baseline else None
+        current = run_benchmarks(options.select, options.case, options.repeat,
+                                 options.num_calls, not options.no_memory, options.output,
+                                 out_stream=sys.stdout)
+        if baseline is None:
+            return 0
+    else:
+        baseline = load_results(options.baseline)
+        current = load_results(options.current)
+
+    rows = compare_results(baseline, current, options.tolerance)
+    write_comparison(rows, only_changed=getattr(options, 'changed', False),
+                     tolerance=options.tolerance)
+    return int(any(row['regression'] for row in rows))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
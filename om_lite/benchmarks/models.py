@@ -0,0 +1,233 @@
+"""Synthetic models whose number of components and variable size are parameters."""
+import numpy as np
+
+from om_lite.core.explicitcomponent import ExplicitComponent
+from om_lite.core.implicitcomponent import ImplicitComponent
+from om_lite.core.indepvarcomp import IndepVarComp
+from om_lite.core.group import Group
+from om_lite.core.problem import Problem
+from om_lite.core.linear_solvers import DirectSolver
+from om_lite.core.nonlinear_solvers import NewtonSolver
+
+_PARTIALS = ('dense', 'coo')
+
+
+class _ScaleComp(ExplicitComponent):
+    """
+    Elementwise y = a * x + sin(x), with dense or COO partials.
+    """
+
+    def initialize(self):
+        self.options.declare('size', types=int, default=1)
+        self.options.declare('a', default=1.0)
+        self.options.declare('partials', default='coo', values=_PARTIALS)
+
+    def setup(self):
+        size = self.options['size']
+        self.add_input('x', np.ones(size))
+        self.add_output('y', np.ones(size))
+        if self.options['partials'] == 'coo':
+            arange = np.arange(size)
+            self.declare_partials('y', 'x', rows=arange, cols=arange)
+        else:
+            self.declare_partials('y', 'x')
+
+    def compute(self, inputs, outputs):
+        x = inputs['x']
+        outputs['y'] = self.options['a'] * x + np.sin(x)
+
+    def compute_partials(self, inputs, outputs, partials):
+        deriv = self.options['a'] + np.cos(inputs['x'])
+        if self.options['partials'] == 'coo':
+            partials['y', 'x'] = deriv
+        else:
+            partials['y', 'x'] = np.diag(deriv)
+
+
+class _SumComp(ExplicitComponent):
+    """
+    Sum of n inputs of the same size, with dense or COO partials.
+    """
+
+    def initialize(self):
+        self.options.declare('size', types=int, default=1)
+        self.options.declare('n', types=int, default=1)
+        self.options.declare('partials', default='coo', values=_PARTIALS)
+
+    def setup(self):
+        size = self.options['size']
+        self.add_output('y', np.zeros(size))
+        arange = np.arange(size)
+        for k in range(self.options['n']):
+            name = 'x{}'.format(k)
+            self.add_input(name, np.ones(size))
+            if self.options['partials'] == 'coo':
+                self.declare_partials('y', name, rows=arange, cols=arange, val=1.0)
+            else:
+                self.declare_partials('y', name, val=np.eye(size))
+
+    def compute(self, inputs, outputs):
+        total = np.zeros(self.options['size'])
+        for k in range(self.options['n']):
+            total += inputs['x{}'.format(k)]
+        outputs['y'] = total
+
+    def compute_partials(self, inputs, outputs, partials):
+        # constant partials, given at declaration
+        pass
+
+
+class _CycleComp(ImplicitComponent):
+    """
+    Residual R = y - c * tanh(x) - b of one member of a coupled cycle.
+    """
+
+    def initialize(self):
+        self.options.declare('size', types=int, default=1)
+        self.options.declare('c', default=0.5)
+        self.options.declare('partials', default='coo', values=_PARTIALS)
+
+    def setup(self):
+        size = self.options['size']
+        self.add_input('x', np.zeros(size))
+        self.add_input('b', np.zeros(size))
+        self.add_output('y', np.zeros(size))
+        if self.options['partials'] == 'coo':
+            arange = np.arange(size)
+            self.declare_partials('y', 'y', rows=arange, cols=arange, val=1.0)
+            self.declare_partials('y', 'x', rows=arange, cols=arange)
+            self.declare_partials('y', 'b', rows=arange, cols=arange, val=-1.0)
+        else:
+            self.declare_partials('y', 'y', val=np.eye(size))
+            self.declare_partials('y', 'x')
+            self.declare_partials('y', 'b', val=-np.eye(size))
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals['y'] = outputs['y'] - self.options['c'] * np.tanh(inputs['x']) - inputs['b']
+
+    def linearize(self, inputs, outputs, partials):
+        deriv = -self.options['c'] / np.cosh(inputs['x']) ** 2
+        if self.options['partials'] == 'coo':
+            partials['y', 'x'] = deriv
+        else:
+            partials['y', 'x'] = np.diag(deriv)
+
+
+def chain_model(num_comps, size, partials='coo'):
+    """
+    Build a chain of explicit components, each feeding the next one.
+    Parameters
+    ----------
+    num_comps : int
+        Number of components in the chain.
+    size : int
+        Size of each variable.
+    partials : str
+        'dense' or 'coo' declaration of the partials.
+    Returns
+    -------
+    Problem
+        The problem, not set up.
+    list of str
+        Names of the design variables, for set_val and compute_totals.
+    list of str
+        Names of the responses.
+    """
+    prob = Problem()
+    model = prob.model
+    model.add_subsystem('ivc', IndepVarComp('x', np.ones(size)))
+    src = 'ivc.x'
+    for k in range(num_comps):
+        name = 'c{}'.format(k)
+        model.add_subsystem(name, _ScaleComp(size=size, a=0.5, partials=partials))
+        model.connect(src, name + '.x')
+        src = name + '.y'
+    model.add_design_var('ivc.x')
+    model.add_objective(src, index=0)
+    return prob, ['ivc.x'], [src]
+
+
+def fanout_model(num_comps, size, partials='coo'):
+    """
+    Build one output feeding many parallel explicit components, summed by a last one.
+    Parameters
+    ----------
+    num_comps : int
+        Number of parallel components.
+    size : int
+        Size of each variable.
+    partials : str
+        'dense' or 'coo' declaration of the partials.
+    Returns
+    -------
+    Problem
+        The problem, not set up.
+    list of str
+        Names of the design variables, for set_val and compute_totals.
+    list of str
+        Names of the responses.
+    """
+    prob = Problem()
+    model = prob.model
+    model.add_subsystem('ivc', IndepVarComp('x', np.ones(size)))
+    fan = model.add_subsystem('fan', Group())
+    model.add_subsystem('sum', _SumComp(size=size, n=num_comps, partials=partials))
+    for k in range(num_comps):
+        name = 'c{}'.format(k)
+        fan.add_subsystem(name, _ScaleComp(size=size, a=1.0 + k, partials=partials))
+        model.connect('ivc.x', 'fan.{}.x'.format(name))
+        model.connect('fan.{}.y'.format(name), 'sum.x{}'.format(k))
+    model.add_design_var('ivc.x')
+    model.add_objective('sum.y', index=0)
+    return prob, ['ivc.x'], ['sum.y']
+
+
+def cycle_model(num_comps, size, partials='coo'):
+    """
+    Build a cycle of implicit components, each driven by the previous one and the last
+    driving the first, converged by a Newton solver with a DirectSolver.
+    Parameters
+    ----------
+    num_comps : int
+        Number of components in the cycle.
+    size : int
+        Size of each variable.
+    partials : str
+        'dense' or 'coo' declaration of the partials.
+    Returns
+    -------
+    Problem
+        The problem, not set up.
+    list of str
+        Names of the design variables, for set_val and compute_totals.
+    list of str
+        Names of the responses.
+    """
+    prob = Problem()
+    model = prob.model
+    model.add_subsystem('ivc', IndepVarComp('b', np.ones(size)))
+    cycle = model.add_subsystem('cycle', Group())
+    for k in range(num_comps):
+        name = 'c{}'.format(k)
+        cycle.add_subsystem(name, _CycleComp(size=size, c=0.5, partials=partials))
+        model.connect('ivc.b', 'cycle.{}.b'.format(name))
+        # made in the cycle group, whose Newton solver transfers them at each iteration
+        cycle.connect(name + '.y', 'c{}.x'.format((k + 1) % num_comps))
+
+    newton = cycle.nonlinear_solver = NewtonSolver(maxiter=20, atol=1e-10, rtol=1e-10,
+                                                   iprint=-1)
+    newton.linesearch = None
+    cycle.linear_solver = DirectSolver()
+    model.linear_solver = DirectSolver()
+
+    res = 'cycle.c{}.y'.format(num_comps - 1)
+    model.add_design_var('ivc.b')
+    model.add_objective(res, index=0)
+    return prob, ['ivc.b'], [res]
+
+
+MODELS = {
+    'chain': chain_model,
+    'fanout': fanout_model,
+    'cycle': cycle_model,
+}
@@ -0,0 +1,337 @@
+"""Time the phases of the synthetic models and compare the results between versions."""
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+from om_lite.benchmarks.models import MODELS
+
+# timed phases, in the order they run
+PHASES = ('setup', 'final_setup', 'run_model', 'set_val', 'get_val', 'compute_totals')
+
+# (model, partials, number of components, variable size) of the default suite, scaled in
+# component count at a small size and in variable size at a small count
+_DEFAULT_CASES = [
+    (model, partials, num_comps, size)
+    for model in ('chain', 'fanout', 'cycle')
+    for partials in ('coo', 'dense')
+    for num_comps, size in ((10, 10), (100, 10), (10, 1000))
+    if not (partials == 'dense' and size > 100)
+]
+
+_FORMAT_VERSION = 1
+
+
+def get_benchmarks(cases=None):
+    """
+    Return the benchmarks of a list of model configurations.
+    Parameters
+    ----------
+    cases : list of tuple or None
+        (model, partials, number of components, variable size) of each benchmark, the
+        default suite if None.
+    Returns
+    -------
+    dict
+        (builder, kwargs) keyed by benchmark name, 'model_partials_n<count>_s<size>'.
+    """
+    if cases is None:
+        cases = _DEFAULT_CASES
+    benchmarks = {}
+    for model, partials, num_comps, size in cases:
+        if model not in MODELS:
+            raise ValueError("Unknown benchmark model '{}', choose from {}.".format(
+                model, sorted(MODELS)))
+        name = '{}_{}_n{}_s{}'.format(model, partials, num_comps, size)
+        benchmarks[name] = (MODELS[model], {'num_comps': num_comps, 'size': size,
+                                            'partials': partials})
+    return benchmarks
+
+
+def _run_phases(builder, kwargs, num_calls):
+    """
+    Build a model and time each phase once.
+    Parameters
+    ----------
+    builder : callable
+        Function returning the problem, design variables and responses.
+    kwargs : dict
+        Arguments of the builder.
+    num_calls : int
+        Number of set_val and get_val calls timed.
+    Returns
+    -------
+    dict
+        Wall time of each phase in seconds, per call for set_val and get_val.
+    """
+    prob, desvars, responses = builder(**kwargs)
+    clock = time.perf_counter
+    times = {}
+
+    start = clock()
+    prob.setup()
+    times['setup'] = clock() - start
+
+    start = clock()
+    prob.final_setup()
+    times['final_setup'] = clock() - start
+
+    start = clock()
+    prob.run_model()
+    times['run_model'] = clock() - start
+
+    name = desvars[0]
+    val = prob.get_val(name).copy()
+    start = clock()
+    for _ in range(num_calls):
+        prob.set_val(name, val)
+    times['set_val'] = (clock() - start) / num_calls
+
+    name = responses[0]
+    start = clock()
+    for _ in range(num_calls):
+        prob.get_val(name)
+    times['get_val'] = (clock() - start) / num_calls
+
+    start = clock()
+    prob.compute_totals(responses, desvars)
+    times['compute_totals'] = clock() - start
+
+    prob.cleanup()
+    return times
+
+
+def _peak_memory(builder, kwargs):
+    """
+    Measure the peak memory allocated while building, running and differentiating a model.
+    Parameters
+    ----------
+    builder : callable
+        Function returning the problem, design variables and responses.
+    kwargs : dict
+        Arguments of the builder.
+    Returns
+    -------
+    int
+        Peak traced bytes, above those allocated before the build.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        prob, desvars, responses = builder(**kwargs)
+        prob.setup()
+        prob.final_setup()
+        prob.run_model()
+        prob.compute_totals(responses, desvars)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        prob.cleanup()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return peak
+
+
+def run_benchmark(builder, kwargs, repeat=3, num_calls=1000, memory=True):
+    """
+    Time the phases of one synthetic model.
+    Each repetition builds a new model. The fastest time of each phase is kept, being the
+    least disturbed by the rest of the machine. The peak memory is measured in a separate
+    run, since tracing the allocations slows everything down.
+    Parameters
+    ----------
+    builder : callable
+        Function returning the problem, design variables and responses.
+    kwargs : dict
+        Arguments of the builder.
+    repeat : int
+        Number of timed repetitions.
+    num_calls : int
+        Number of set_val and get_val calls timed in each repetition.
+    memory : bool
+        If True, also measure the peak memory.
+    Returns
+    -------
+    dict
+        Fastest time of each phase in seconds and 'peak_memory' in bytes, None if not
+        measured.
+    """
+    best = {}
+    for _ in range(repeat):
+        gc.collect()
+        for phase, elapsed in _run_phases(builder, kwargs, num_calls).items():
+            best[phase] = min(best.get(phase, elapsed), elapsed)
+
+    result = {phase: best[phase] for phase in PHASES}
+    gc.collect()
+    result['peak_memory'] = _peak_memory(builder, kwargs) if memory else None
+    return result
+
+
+def _get_environment():
+    """
+    Return the versions and machine the results are measured on.
+    Returns
+    -------
+    dict
+        Python, NumPy and SciPy versions, platform and time of the run.
+    """
+    import scipy
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_benchmarks(names=None, cases=None, repeat=3, num_calls=1000, memory=True,
+                   filepath=None, out_stream=None):
+    """
+    Run benchmarks of the synthetic models.
+    Parameters
+    ----------
+    names : list of str or None
+        Patterns of the names of the benchmarks to run, all if None.
+    cases : list of tuple or None
+        (model, partials, number of components, variable size) of each benchmark, the
+        default suite if None.
+    repeat : int
+        Number of timed repetitions of each benchmark.
+    num_calls : int
+        Number of set_val and get_val calls timed in each repetition.
+    memory : bool
+        If True, also measure the peak memory of each benchmark.
+    filepath : str or None
+        If given, the results are saved to this JSON file.
+    out_stream : file-like or None
+        Where to report progress, nothing is reported if None.
+    Returns
+    -------
+    dict
+        'environment' of the run and 'benchmarks', the parameters and results of each
+        benchmark keyed by name.
+    """
+    results = {'version': _FORMAT_VERSION, 'environment': _get_environment(),
+               'benchmarks': {}}
+    for name, (builder, kwargs) in get_benchmarks(cases).items():
+        if names is not None and not any(fnmatchcase(name, pat) for pat in names):
+            continue
+        result = run_benchmark(builder, kwargs, repeat, num_calls, memory)
+        results['benchmarks'][name] = {'params': dict(kwargs, model=builder.__name__),
+                                       'results': result}
+        if out_stream is not None:
+            out_stream.write('{:<28} {}\n'.format(name, '  '.join(
+                '{}={:.3e}'.format(phase, result[phase]) for phase in PHASES)))
+            out_stream.flush()
+
+    if filepath is not None:
+        save_results(results, filepath)
+    return results
+
+
+def save_results(results, filepath):
+    """
+    Save benchmark results to a JSON file.
+    Parameters
+    ----------
+    results : dict
+        Results returned by run_benchmarks.
+    filepath : str
+        Path of the file.
+    """
+    with open(filepath, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(filepath):
+    """
+    Load benchmark results saved by save_results.
+    Parameters
+    ----------
+    filepath : str
+        Path of the file.
+    Returns
+    -------
+    dict
+        The results.
+    """
+    with open(filepath) as f:
+        results = json.load(f)
+    if results.get('version') != _FORMAT_VERSION:
+        raise ValueError("'{}' is not a file of benchmark results of version {}.".format(
+            filepath, _FORMAT_VERSION))
+    return results
+
+
+def compare_results(baseline, current, tolerance=0.1):
+    """
+    Compare benchmark results with a baseline.
+    Parameters
+    ----------
+    baseline : dict
+        Results of the reference version.
+    current : dict
+        Results of the version being checked.
+    tolerance : float
+        Relative increase of a time or of the peak memory above which it is a regression.
+    Returns
+    -------
+    list of dict
+        'benchmark', 'metric', 'baseline' and 'current' values, their 'ratio' and whether it
+        is a 'regression', for each metric measured in both.
+    """
+    rows = []
+    base_benchmarks = baseline['benchmarks']
+    for name, bench in current['benchmarks'].items():
+        if name not in base_benchmarks:
+            continue
+        base_results = base_benchmarks[name]['results']
+        for metric in PHASES + ('peak_memory', ):
+            val = bench['results'].get(metric)
+            base_val = base_results.get(metric)
+            if val is None or base_val is None:
+                continue
+            ratio = val / base_val if base_val > 0 else float('inf') if val > 0 else 1.0
+            rows.append({'benchmark': name, 'metric': metric, 'baseline': base_val,
+                         'current': val, 'ratio': ratio,
+                         'regression': ratio > 1.0 + tolerance})
+    return rows
+
+
+def write_comparison(rows, out_stream=None, only_changed=False, tolerance=0.1):
+    """
+    Write the rows of compare_results as a table.
+    Parameters
+    ----------
+    rows : list of dict
+        Rows returned by compare_results.
+    out_stream : file-like or None
+        Where to write the table, sys.stdout if None.
+    only_changed : bool
+        If True, only write the rows whose ratio differs from 1 by more than tolerance.
+    tolerance : float
+        Relative change written when only_changed is True.
+    """
+    if out_stream is None:
+        out_stream = sys.stdout
+    if only_changed:
+        rows = [row for row in rows if abs(row['ratio'] - 1.0) > tolerance]
+    width = max([len(row['benchmark']) for row in rows] + [len('Benchmark')])
+    out_stream.write('{:<{w}}  {:<14}  {:>12}  {:>12}  {:>7}\n'.format(
+        'Benchmark', 'Metric', 'Baseline', 'Current', 'Ratio', w=width))
+    for row in rows:
+        out_stream.write('{:<{w}}  {:<14}  {:>12.4e}  {:>12.4e}  {:>7.3f}{}\n'.format(
+            row['benchmark'], row['metric'], row['baseline'], row['current'], row['ratio'],
+            '  REGRESSION' if row['regression'] else '', w=width))
@@ -0,0 +1,102 @@
+import copy
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from om_lite.benchmarks.__main__ import main
+from om_lite.benchmarks.suite import PHASES, compare_results, load_results, save_results
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
+    def _main(self, *args):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            status = main(list(args))
+        return status, out.getvalue()
+
+    def _run(self, name='base.json'):
+        path = os.path.join(self.tmpdir, name)
+        status, out = self._main('run', '-c', 'chain:coo:5:5', '-r', '1', '-n', '10', '-o', path)
+        self.assertEqual(status, 0)
+        self.assertTrue(out.startswith('chain_coo_n5_s5 '))
+        return path
+
+    def test_run(self):
+        results = load_results(self._run())
+        bench = results['benchmarks']['chain_coo_n5_s5']
+        self.assertEqual(bench['params'], {'model': 'chain_model', 'partials': 'coo',
+                                           'num_comps': 5, 'size': 5})
+        for metric in PHASES + ('peak_memory', ):
+            self.assertGreater(bench['results'][metric], 0.0)
+
+    def test_compare(self):
+        base = self._run()
+        status, out = self._main('compare', base, base)
+        self.assertEqual(status, 0)
+        self.assertNotIn('REGRESSION', out)
+
+        # twice as slow at run_model only
+        results = load_results(base)
+        results['benchmarks']['chain_coo_n5_s5']['results']['run_model'] *= 2.0
+        slow = os.path.join(self.tmpdir, 'slow.json')
+        save_results(results, slow)
+
+        status, out = self._main('compare', base, slow)
+        self.assertEqual(status, 1)
+        regressions = [line for line in out.splitlines() if line.endswith('REGRESSION')]
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('run_model', regressions[0])
+
+        status, out = self._main('compare', base, slow, '--tolerance', '1.5')
+        self.assertEqual(status, 0)
+
+        # only the changed metric is listed, after the header
+        status, out = self._main('compare', base, slow, '--changed')
+        self.assertEqual(status, 1)
+        self.assertEqual(len(out.splitlines()), 2)
+
+    def test_run_against_baseline(self):
+        base = self._run()
+        results = load_results(base)
+        for metric in PHASES:
+            results['benchmarks']['chain_coo_n5_s5']['results'][metric] = 1e-12
+        fast = os.path.join(self.tmpdir, 'fast.json')
+        save_results(results, fast)
+
+        status, out = self._main('run', '-c', 'chain:coo:5:5', '-r', '1', '-n', '10',
+                                 '--no-memory', '-b', fast)
+        self.assertEqual(status, 1)
+        self.assertIn('REGRESSION', out)
+
+
+class TestCompareResults(unittest.TestCase):
+
+    def test_ratios(self):
+        baseline = {'benchmarks': {
+            'a': {'results': {'setup': 1.0, 'run_model': 2.0, 'peak_memory': 100}},
+            'gone': {'results': {'setup': 1.0}},
+        }}
+        current = copy.deepcopy(baseline)
+        del current['benchmarks']['gone']
+        current['benchmarks']['a']['results'].update(setup=1.05, run_model=1.0, peak_memory=150)
+        current['benchmarks']['new'] = {'results': {'setup': 1.0}}
+
+        rows = compare_results(baseline, current, tolerance=0.1)
+        by_metric = {row['metric']: row for row in rows}
+        self.assertEqual([row['benchmark'] for row in rows], ['a'] * 3)
+        self.assertAlmostEqual(by_metric['setup']['ratio'], 1.05)
+        self.assertFalse(by_metric['setup']['regression'])
+        self.assertFalse(by_metric['run_model']['regression'])
+        self.assertTrue(by_metric['peak_memory']['regression'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,323 @@
+"""Finite difference and complex step approximation of component partials."""
+import numpy as np
+
+from om_lite.core.coloring import color_columns
+
+
+class ApproximationScheme(object):
+    """
+    Base class for the approximation of the partials of one component.
+    Approximated partials are grouped by their settings, and the columns of each group (the
+    entries of all its wrt variables) are colored using the declared rows/cols patterns.
+    Columns of one color share no nonzero row, so they are perturbed together and cost one
+    evaluation of the component.
+    Attributes
+    ----------
+    _wrt_meta : dict
+        Settings of each approximated partial, keyed by (of, wrt).
+    _groups : list or None
+        For each set of settings, the nonzero pattern, colors and blocks of its partials.
+        Computed on the first call to compute_approximations.
+    """
+
+    DEFAULT_OPTIONS = {}
+
+    def __init__(self):
+        """
+        Initialize all attributes.
+        """
+        self._wrt_meta = {}
+        self._groups = None
+
+    def add_approximation(self, key, options):
+        """
+        Declare a partial to be approximated.
+        Parameters
+        ----------
+        key : tuple of str
+            (of, wrt) names relative to the component.
+        options : dict
+            Settings of the approximation, missing or None entries take the scheme defaults.
+        """
+        meta = self.DEFAULT_OPTIONS.copy()
+        meta.update({k: v for k, v in options.items() if v is not None})
+        self._wrt_meta[key] = meta
+        self._groups = None
+
+    def _get_pattern(self, comp, of, wrt):
+        """
+        Return the nonzeros of one declared partial in the results x (inputs, outputs) matrix.
+        Parameters
+        ----------
+        comp : Component
+            The component owning the partials.
+        of : str
+            Relative name of the output.
+        wrt : str
+            Relative name of the input or output.
+        Returns
+        -------
+        ndarray of int
+            Rows, in the output vector of the component.
+        ndarray of int
+            Columns, in the inputs followed by the outputs of the component.
+        tuple or None
+            Shape of a dense partial, None for a sparse one.
+        """
+        prefix = comp.pathname + '.' if comp.pathname else ''
+        if (of, wrt, 'coo') in comp.partials:
+            rows, cols = comp.partials[of, wrt, 'coo']
+            shape = None
+        else:
+            shape = (comp._var_rel2meta[of]['size'], comp._var_rel2meta[wrt]['size'])
+            rows = np.repeat(np.arange(shape[0], dtype=int), shape[1])
+            cols = np.tile(np.arange(shape[1], dtype=int), shape[0])
+
+        if wrt in comp._var_rel_names['output']:
+            col_start = comp._inputs.asarray().size + comp._outputs._slices[prefix + wrt].start
+        else:
+            col_start = comp._inputs._slices[prefix + wrt].start
+
+        return rows + comp._outputs._slices[prefix + of].start, cols + col_start, shape
+
+    def _setup(self, comp):
+        """
+        Compute the colored nonzero pattern of each group of partials.
+        Parameters
+        ----------
+        comp : Component
+            The component owning the partials.
+        """
+        # a perturbation changes every result that depends on it, approximated or not, so
+        # columns are colored against all the declared partials of the component
+        all_rows = []
+        all_cols = []
+        patterns = {}
+        for key in comp.partials:
+            if len(key) == 2:
+                patterns[key] = self._get_pattern(comp, *key)
+                all_rows.append(patterns[key][0])
+                all_cols.append(patterns[key][1])
+        full_rows = np.concatenate(all_rows)
+        full_cols = np.concatenate(all_cols)
+
+        by_settings = {}
+        for key, meta in self._wrt_meta.items():
+            by_settings.setdefault(tuple(sorted(meta.items())), []).append(key)
+
+        self._groups = []
+        for settings, keys in by_settings.items():
+            group_rows = []
+            group_cols = []
+            blocks = []
+            start = 0
+            for key in keys:
+                rows, cols, shape = patterns[key]
+                group_rows.append(rows)
+                group_cols.append(cols)
+                blocks.append((key, start, start + rows.size, shape))
+                start += rows.size
+
+            rows = np.concatenate(group_rows)
+            cols = np.concatenate(group_cols)
+
+            # only color the columns of this group
+            used = np.unique(cols)
+            mask = np.isin(full_cols, used)
+            colors = color_columns(full_rows[mask], np.searchsorted(used, full_cols[mask]),
+                                   used.size)
+            color_of = np.empty(used.size, dtype=int)
+            for c, members in enumerate(colors):
+                color_of[members] = c
+
+            nz_color = color_of[np.searchsorted(used, cols)]
+            order = np.argsort(nz_color, kind='stable')
+            bounds = np.zeros(len(colors) + 1, dtype=int)
+            np.cumsum(np.bincount(nz_color, minlength=len(colors)), out=bounds[1:])
+
+            self._groups.append({
+                'options': dict(settings),
+                'rows': rows,
+                'cols': cols,
+                'colors': [(used[members], order[bounds[c]:bounds[c + 1]])
+                           for c, members in enumerate(colors)],
+                'blocks': blocks,
+            })
+
+    def _get_steps(self, x, cols, options):
+        """
+        Return the step of each perturbed column.
+        Parameters
+        ----------
+        x : ndarray
+            Current values of the inputs followed by the outputs of the component.
+        cols : ndarray of int
+            Perturbed columns.
+        options : dict
+            Settings of the approximation.
+        Returns
+        -------
+        ndarray
+            Step of each column.
+        """
+        step = options['step']
+        if options['step_calc'] == 'rel':
+            scale = np.abs(x[cols])
+            return step * np.where(scale > 0.0, scale, 1.0)
+        return np.full(cols.size, step)
+
+    def compute_approximations(self, comp):
+        """
+        Compute all approximated partials of a component and store them in its partials.
+        Parameters
+        ----------
+        comp : Component
+            The component owning the partials.
+        """
+        if self._groups is None:
+            self._setup(comp)
+
+        x = np.concatenate((comp._inputs.asarray(), comp._outputs.asarray()))
+        self._begin(comp)
+
+        for group in self._groups:
+            options = group['options']
+            rows = group['rows']
+            cols = group['cols']
+            data = np.empty(rows.size)
+            steps = np.zeros(x.size)
+
+            for color_cols, nz in group['colors']:
+                steps[color_cols] = self._get_steps(x, color_cols, options)
+                delta = self._get_delta(comp, color_cols, steps[color_cols], options)
+                data[nz] = delta[rows[nz]] / steps[cols[nz]]
+
+            partials = comp.partials
+            for key, start, end, shape in group['blocks']:
+                vals = data[start:end]
+                partials[key] = vals.reshape(shape) if shape is not None else vals.copy()
+
+    def _begin(self, comp):
+        """
+        Do any work needed once per compute_approximations, before the perturbations.
+        Parameters
+        ----------
+        comp : Component
+            The component owning the partials.
+        """
+        pass
+
+    def _get_delta(self, comp, cols, steps, options):
+        """
+        Return the change of the component results for one perturbation.
+        Parameters
+        ----------
+        comp : Component
+            The component owning the partials.
+        cols : ndarray of int
+            Perturbed columns, indices into the inputs followed by the outputs.
+        steps : ndarray
+            Step of each perturbed column.
+        options : dict
+            Settings of the approximation.
+        Returns
+        -------
+        ndarray
+            Change of the outputs (explicit) or residuals (implicit), laid out like the output
+            vector of the component, to be divided by the step of the column of each row.
+        """
+        raise NotImplementedError()
+
+
+def _perturb(inputs, outputs, cols, delta):
+    """
+    Add delta to the given columns of the inputs followed by the outputs.
+    Parameters
+    ----------
+    inputs : ndarray
+        Flat inputs.
+    outputs : ndarray
+        Flat outputs.
+    cols : ndarray of int
+        Columns to perturb.
+    delta : ndarray
+        Perturbation of each column.
+    """
+    n_in = inputs.size
+    is_in = cols < n_in
+    inputs[cols[is_in]] += delta[is_in]
+    outputs[cols[~is_in] - n_in] += delta[~is_in]
+
+
+class FiniteDifference(ApproximationScheme):
+    """
+    Finite difference approximation, 'forward', 'backward' or 'central'.
+    Attributes
+    ----------
+    _results0 : ndarray or None
+        Unperturbed results of the component, computed once per compute_approximations.
+    """
+
+    DEFAULT_OPTIONS = {
+        'step': 1e-6,
+        'form': 'forward',
+        'step_calc': 'abs',
+    }
+
+    def __init__(self):
+        """
+        Initialize all attributes.
+        """
+        super().__init__()
+        self._results0 = None
+
+    def _begin(self, comp):
+        forms = {group['options']['form'] for group in self._groups}
+        self._results0 = comp._run_approx(comp.inputs, comp.outputs, comp.residuals) \
+            if forms != {'central'} else None
+
+    def _run_perturbed(self, comp, cols, delta):
+        inputs = comp._inputs.asarray()
+        outputs = comp._outputs.asarray()
+        saved_in = inputs[cols[cols < inputs.size]].copy()
+        saved_out = outputs.copy()
+
+        _perturb(inputs, outputs, cols, delta)
+        results = comp._run_approx(comp.inputs, comp.outputs, comp.residuals)
+
+        inputs[cols[cols < inputs.size]] = saved_in
+        outputs[:] = saved_out
+        return results
+
+    def _get_delta(self, comp, cols, steps, options):
+        form = options['form']
+        if form == 'forward':
+            return self._run_perturbed(comp, cols, steps) - self._results0
+        if form == 'backward':
+            return self._results0 - self._run_perturbed(comp, cols, -steps)
+        return 0.5 * (self._run_perturbed(comp, cols, steps) -
+                      self._run_perturbed(comp, cols, -steps))
+
+
+class ComplexStep(ApproximationScheme):
+    """
+    Complex step approximation, exact to machine precision for complex-safe components.
+    The component is run on complex copies of its vectors, so its own vectors are left
+    untouched.
+    """
+
+    DEFAULT_OPTIONS = {
+        'step': 1e-40,
+        'step_calc': 'abs',
+    }
+
+    def _get_delta(self, comp, cols, steps, options):
+        vectors = comp._get_approx_vectors(complex)
+        inputs = vectors['input'].asarray()
+        outputs = vectors['output'].asarray()
+        inputs[:] = comp._inputs.asarray()
+        outputs[:] = comp._outputs.asarray()
+
+        _perturb(inputs, outputs, cols, 1j * steps)
+        results = comp._run_approx(vectors['input'], vectors['output'], vectors['residual'])
+        return results.imag
@@ -0,0 +1,347 @@
+"""Define the CaseReader class, reading the files of a BinaryRecorder in place."""
+import json
+import mmap
+
+import numpy as np
+
+from om_lite.core.recording import _CASE_HEADER, _MAGIC, _RECORD_HEADER, _padded
+
+
+class Case(object):
+    """
+    One recorded case, whose values are views of the memory-mapped file.
+    Attributes
+    ----------
+    coord : str
+        Coordinate of the case, including the case prefix of the run.
+    source : str
+        Name of the driver, solver or problem that recorded the case.
+    counter : int
+        Position of the case among all the cases of its recorder.
+    timestamp : float
+        Time the case was recorded at.
+    abs_err : float
+        Absolute residual norm of a solver case, nan otherwise.
+    rel_err : float
+        Relative residual norm of a solver case, nan otherwise.
+    success : bool
+        False if the iteration failed.
+    _reader : CaseReader
+        The reader of the file.
+    _index : int
+        Index of the case in the file.
+    """
+
+    def __init__(self, reader, index):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        reader : CaseReader
+            The reader of the file.
+        index : int
+            Index of the case in the file.
+        """
+        self._reader = reader
+        self._index = index
+        info = reader._cases
+        self.coord = reader._coords[index]
+        self.source = reader._schemas[info['schema'][index]]['source']
+        self.counter = int(info['counter'][index])
+        self.timestamp = float(info['timestamp'][index])
+        self.abs_err = float(info['abs_err'][index])
+        self.rel_err = float(info['rel_err'][index])
+        self.success = bool(info['success'][index])
+
+    def __repr__(self):
+        return 'Case({!r})'.format(self.coord)
+
+    def keys(self):
+        """
+        Return the names of the recorded variables.
+        Returns
+        -------
+        list of str
+            The names.
+        """
+        return list(self._reader._schemas[self._reader._cases['schema'][self._index]]['vars'])
+
+    def __contains__(self, name):
+        return name in self._reader._schemas[self._reader._cases['schema'][self._index]]['vars']
+
+    def __getitem__(self, name):
+        """
+        Return the value of a variable in this case.
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        Returns
+        -------
+        ndarray
+            Read-only view of the value in the file.
+        """
+        reader = self._reader
+        schema = reader._schemas[reader._cases['schema'][self._index]]
+        try:
+            start, size, shape = schema['vars'][name]
+        except KeyError:
+            raise KeyError("{}: Variable '{}' was not recorded.".format(self, name))
+        return np.frombuffer(reader._mmap, dtype=float, count=size,
+                             offset=int(reader._cases['offset'][self._index]) + 8 * start
+                             ).reshape(shape)
+
+
+class CaseReader(object):
+    """
+    Reader of a file written by a BinaryRecorder, without loading it in memory.
+    Opening the file only reads the record headers to index the cases. Values are then
+    read-only NumPy views of the memory-mapped file, so the pages of a variable are only read
+    when it is used.
+    Attributes
+    ----------
+    _filepath : str
+        Path of the file.
+    _file : file or None
+        The open file.
+    _mmap : mmap or None
+        The memory map of the file.
+    _schemas : list of dict
+        Source of each schema, and the start, size and shape of each of its variables.
+    _coords : list of str
+        Coordinate of each case.
+    _cases : dict of ndarray
+        Schema, offset of the values in the file, counter, timestamp, abs_err, rel_err and
+        success of each case.
+    _coord2index : dict
+        Indices of the cases with each coordinate, in recording order.
+    """
+
+    def __init__(self, filepath):
+        """
+        Open and index a recorded file.
+        Parameters
+        ----------
+        filepath : str
+            Path of the file.
+        """
+        self._filepath = filepath
+        self._file = open(filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(_MAGIC)] != _MAGIC:
+            self.close()
+            raise ValueError("'{}' is not a file written by a BinaryRecorder.".format(
+                filepath))
+
+        self._schemas = []
+        self._coords = []
+        self._coord2index = {}
+        self._index_file()
+
+    def _index_file(self):
+        """
+        Read the record headers of the file.
+        A record cut short by a recorder still writing, or stopped while writing, is ignored.
+        """
+        mm = self._mmap
+        end = len(mm)
+        pos = len(_MAGIC)
+        schemas = {}
+        fields = {key: [] for key in ('schema', 'offset', 'counter', 'timestamp', 'abs_err',
+                                      'rel_err', 'success')}
+
+        while pos + _RECORD_HEADER.size <= end:
+            tag, schema_id, size = _RECORD_HEADER.unpack_from(mm, pos)
+            payload = pos + _RECORD_HEADER.size
+            if payload + size > end:
+                break
+
+            if tag == b'META':
+                meta = json.loads(mm[payload:payload + size].decode('utf-8'))
+                variables = {}
+                start = 0
+                for name, shape in zip(meta['names'], meta['shapes']):
+                    shape = tuple(shape)
+                    nvals = int(np.prod(shape))
+                    variables[name] = (start, nvals, shape)
+                    start += nvals
+                schemas[schema_id] = {'source': meta['source'], 'vars': variables,
+                                      'size': start}
+            elif tag == b'CASE':
+                counter, timestamp, abs_err, rel_err, coord_size, success = \
+                    _CASE_HEADER.unpack_from(mm, payload)
+                coord_start = payload + _CASE_HEADER.size
+                coord = mm[coord_start:coord_start + coord_size].decode('utf-8')
+                self._coord2index.setdefault(coord, []).append(len(self._coords))
+                self._coords.append(coord)
+                for key, val in (('schema', schema_id),
+                                 ('offset', payload + size - 8 * schemas[schema_id]['size']),
+                                 ('counter', counter), ('timestamp', timestamp),
+                                 ('abs_err', abs_err), ('rel_err', rel_err),
+                                 ('success', success)):
+                    fields[key].append(val)
+
+            pos = payload + _padded(size)
+
+        self._schemas = [schemas[i] for i in range(len(schemas))]
+        dtypes = {'schema': int, 'offset': np.int64, 'counter': np.int64, 'success': bool}
+        self._cases = {key: np.array(vals, dtype=dtypes.get(key, float))
+                       for key, vals in fields.items()}
+
+    def close(self):
+        """
+        Close the file.
+        The memory map itself is released once no value returned by this reader is in use.
+        """
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._coords)
+
+    def list_sources(self):
+        """
+        Return the drivers, solvers and problems that recorded cases.
+        Returns
+        -------
+        list of str
+            Names of the sources.
+        """
+        return list(dict.fromkeys(schema['source'] for schema in self._schemas))
+
+    def _select(self, source=None, prefix=None):
+        """
+        Return the indices of the cases of a source and run prefix.
+        Parameters
+        ----------
+        source : str or None
+            Name of the source, all sources if None.
+        prefix : str or None
+            Case prefix given to run_model or run_driver, any prefix if None.
+        Returns
+        -------
+        ndarray of int
+            Indices of the selected cases, in recording order.
+        """
+        mask = np.ones(len(self._coords), dtype=bool)
+        if source is not None:
+            schema_ids = [i for i, schema in enumerate(self._schemas)
+                          if schema['source'] == source]
+            mask &= np.isin(self._cases['schema'], schema_ids)
+        if prefix is not None:
+            start = prefix + '_'
+            mask &= np.array([coord.startswith(start) for coord in self._coords], dtype=bool)
+        return np.nonzero(mask)[0]
+
+    def list_cases(self, source=None, prefix=None):
+        """
+        Return the coordinates of the recorded cases.
+        Parameters
+        ----------
+        source : str or None
+            Only list the cases of this driver, solver or problem.
+        prefix : str or None
+            Only list the cases recorded with this case prefix.
+        Returns
+        -------
+        list of str
+            The coordinates, in recording order.
+        """
+        return [self._coords[i] for i in self._select(source, prefix)]
+
+    def get_case(self, case_id, occurrence=None):
+        """
+        Return one case.
+        Parameters
+        ----------
+        case_id : str or int
+            Coordinate of the case, or its index in recording order. Negative indices count
+            from the last case.
+        occurrence : int or None
+            Position of the case among the cases recorded with the same coordinate, such as
+            the runs of run_model without a case prefix. Required if there are several.
+        Returns
+        -------
+        Case
+            The case.
+        """
+        if isinstance(case_id, str):
+            try:
+                indices = self._coord2index[case_id]
+            except KeyError:
+                raise KeyError("No case with coordinate '{}' in '{}'.".format(
+                    case_id, self._filepath))
+            if occurrence is None:
+                if len(indices) > 1:
+                    raise ValueError("{} cases have the coordinate '{}' in '{}', select one "
+                                     "with occurrence.".format(len(indices), case_id,
+                                                               self._filepath))
+                occurrence = 0
+            index = indices[occurrence]
+        else:
+            index = range(len(self._coords))[case_id]
+        return Case(self, index)
+
+    def get_history(self, name, source=None, prefix=None):
+        """
+        Return the values of a variable in every case that recorded it.
+        The history is a view of the file when the cases are evenly spaced in it, which holds
+        for the iterations of one source unless other sources recorded cases in between, and a
+        copy otherwise.
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        source : str or None
+            Only use the cases of this driver, solver or problem.
+        prefix : str or None
+            Only use the cases recorded with this case prefix.
+        Returns
+        -------
+        ndarray
+            Read-only values, with a leading case axis.
+        list of str
+            Coordinate of each case.
+        """
+        cases = self._cases
+        indices = self._select(source, prefix)
+        starts = {i: schema['vars'][name] for i, schema in enumerate(self._schemas)
+                  if name in schema['vars']}
+        indices = indices[np.isin(cases['schema'][indices], list(starts))]
+        coords = [self._coords[i] for i in indices]
+        if indices.size == 0:
+            raise KeyError("Variable '{}' was not recorded in the selected cases.".format(name))
+
+        shapes = {starts[s][2] for s in np.unique(cases['schema'][indices])}
+        if len(shapes) > 1:
+            raise ValueError("Variable '{}' was recorded with different shapes.".format(name))
+        shape = shapes.pop()
+        nvals = int(np.prod(shape))
+
+        offsets = cases['offset'][indices] + 8 * np.array(
+            [starts[s][0] for s in cases['schema'][indices]], dtype=np.int64)
+        strides = np.diff(offsets)
+        if strides.size == 0 or (strides[0] > 0 and np.all(strides == strides[0])):
+            stride = int(strides[0]) if strides.size else 8 * nvals
+            start = int(offsets[0])
+            first = np.frombuffer(self._mmap, dtype=float, offset=start,
+                                  count=(len(self._mmap) - start) // 8)
+            hist = np.lib.stride_tricks.as_strided(
+                first, shape=(indices.size, nvals), strides=(stride, 8), writeable=False)
+            return hist.reshape((indices.size, ) + shape), coords
+
+        hist = np.empty((indices.size, nvals))
+        for k, offset in enumerate(offsets):
+            hist[k] = np.frombuffer(self._mmap, dtype=float, count=nvals, offset=int(offset))
+        return hist.reshape((indices.size, ) + shape), coords
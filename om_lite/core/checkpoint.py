@@ -0,0 +1,182 @@
+"""Save and restore the state of a Problem."""
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# The file starts with _MAGIC and the size of a JSON header describing the model layout,
+# the counters and the location of each array. The raw arrays follow, each starting on an
+# _ALIGN byte boundary, so they are written straight from the model vectors and read back as
+# views of the memory-mapped file.
+_MAGIC = b'OMLCKPT1'
+_SIZE = struct.Struct('<Q')
+_ALIGN = 64
+
+_VECTOR_KINDS = ('input', 'output', 'residual')
+
+
+def _padded(nbytes):
+    return -(-nbytes // _ALIGN) * _ALIGN
+
+
+def _get_layout(model):
+    """
+    Return the name and size of each variable of the model vectors, in vector order.
+    Parameters
+    ----------
+    model : System
+        The model.
+    Returns
+    -------
+    dict
+        List of [name, size] for 'input' and 'output'.
+    """
+    return {io: [[name, meta['size']] for name, meta in model._var_allprocs_abs2meta[io].items()]
+            for io in ('input', 'output')}
+
+
+def _get_solvers(model):
+    """
+    Return the nonlinear and linear solvers of every system of the model.
+    Parameters
+    ----------
+    model : System
+        The model.
+    Returns
+    -------
+    dict
+        Solver keyed by '<system pathname>:nonlinear' or '<system pathname>:linear'.
+    """
+    solvers = {}
+    for system in model.system_iter(include_self=True, recurse=True):
+        for kind, solver in (('nonlinear', system._nonlinear_solver),
+                             ('linear', system._linear_solver)):
+            if solver is not None:
+                solvers['{}:{}'.format(system.pathname, kind)] = solver
+    return solvers
+
+
+def save_checkpoint(problem, filepath, model_is_current=None):
+    """
+    Write the state of a problem to a file.
+    The file is written next to its destination and then renamed, so an interrupted save
+    leaves the previous checkpoint intact.
+    Parameters
+    ----------
+    problem : Problem
+        The problem, after setup.
+    filepath : str
+        Path of the checkpoint file.
+    model_is_current : bool or None
+        Whether the saved outputs are those of a run with the saved inputs, which lets an
+        incremental run_model after the restore skip every system. Taken from the problem if
+        None.
+    """
+    from om_lite.core.problem import _SetupStatus
+
+    if problem._metadata is None:
+        raise RuntimeError("{}: Cannot save a checkpoint before setup.".format(problem.msginfo))
+
+    model = problem.model
+    arrays = []
+    if problem._metadata['setup_status'] >= _SetupStatus.POST_FINAL_SETUP:
+        for kind in _VECTOR_KINDS:
+            arrays.append(('vec:' + kind, getattr(model, '_' + kind + 's').asarray()))
+    for name, val in problem._initial_condition_cache.items():
+        arrays.append(('ic:' + name, np.ascontiguousarray(val, dtype=float)))
+
+    header = {
+        'layout': _get_layout(model),
+        'driver_iter_count': problem.driver.iter_count,
+        'run_counter': problem._run_counter,
+        'model_is_current': model_is_current if model_is_current is not None else
+        problem._model_is_current and not problem._dirty_sources,
+        'iter_counts': {s.pathname: s.iter_count
+                        for s in model.system_iter(include_self=True, recurse=True)},
+        'solver_iter_counts': {key: solver._iter_count
+                               for key, solver in _get_solvers(model).items()},
+        'arrays': [],
+    }
+    offset = 0
+    for key, arr in arrays:
+        header['arrays'].append([key, list(arr.shape), offset])
+        offset += _padded(arr.nbytes)
+
+    data = json.dumps(header).encode('utf-8')
+    start = _padded(len(_MAGIC) + _SIZE.size + len(data))
+
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(_SIZE.pack(len(data)))
+        f.write(data)
+        f.write(bytes(start - f.tell()))
+        for key, arr in arrays:
+            f.write(memoryview(arr).cast('B'))
+            f.write(bytes(_padded(arr.nbytes) - arr.nbytes))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+
+def load_checkpoint(problem, filepath):
+    """
+    Restore the state of a problem from a file written by save_checkpoint.
+    The problem must be set up with a model of the same structure. Its vectors are overwritten
+    with the saved values, so a run started from them does not have to converge from scratch.
+    Parameters
+    ----------
+    problem : Problem
+        The problem, after setup.
+    filepath : str
+        Path of the checkpoint file.
+    """
+    if problem._metadata is None:
+        raise RuntimeError("{}: Cannot load a checkpoint before setup.".format(problem.msginfo))
+
+    model = problem.model
+    with open(filepath, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("'{}' is not a checkpoint file.".format(filepath))
+        size, = _SIZE.unpack_from(mm, len(_MAGIC))
+        pos = len(_MAGIC) + _SIZE.size
+        header = json.loads(mm[pos:pos + size].decode('utf-8'))
+        start = _padded(pos + size)
+
+        if header['layout'] != _get_layout(model):
+            raise ValueError("{}: The checkpoint '{}' was saved from a model with different "
+                             "variables.".format(problem.msginfo, filepath))
+
+        arrays = {key: np.frombuffer(mm, dtype=float, count=int(np.prod(shape)),
+                                     offset=start + offset).reshape(shape)
+                  for key, shape, offset in header['arrays']}
+
+        if 'vec:output' in arrays:
+            problem.final_setup()
+            for kind in _VECTOR_KINDS:
+                getattr(model, '_' + kind + 's').asarray()[:] = arrays['vec:' + kind]
+            problem._model_is_current = header['model_is_current']
+            problem._dirty_sources = set()
+
+        else:
+            problem._initial_condition_cache = {
+                key[3:]: val.copy() for key, val in arrays.items() if key.startswith('ic:')}
+        del arrays
+    finally:
+        mm.close()
+
+    problem.driver.iter_count = header['driver_iter_count']
+    problem._run_counter = header['run_counter']
+    iter_counts = header['iter_counts']
+    for system in model.system_iter(include_self=True, recurse=True):
+        system.iter_count = iter_counts.get(system.pathname, 0)
+    solver_counts = header['solver_iter_counts']
+    for key, solver in _get_solvers(model).items():
+        solver._iter_count = solver_counts.get(key, 0)
+        # factorizations are not saved, a Newton solver relinearizes at its first iteration
+        if hasattr(solver, '_jac_is_current'):
+            solver._jac_is_current = False
@@ -0,0 +1,249 @@
+"""Column coloring of sparse Jacobians."""
+import os
+import pickle
+
+import numpy as np
+
+
+def color_columns(rows, cols, ncols):
+    """
+    Split the columns of a sparsity pattern into groups that share no nonzero row.
+    All columns of a group can be perturbed (or seeded) at the same time, since each nonzero
+    row of the result then depends on a single column of the group. Columns are colored
+    greedily, those with the most nonzeros first, each getting the lowest color not already
+    used in one of its rows.
+    Parameters
+    ----------
+    rows : ndarray of int
+        Row index of each nonzero.
+    cols : ndarray of int
+        Column index of each nonzero.
+    ncols : int
+        Number of columns.
+    Returns
+    -------
+    list of ndarray of int
+        Column indices of each color, in increasing order.
+    """
+    rows = np.asarray(rows, dtype=int)
+    cols = np.asarray(cols, dtype=int)
+
+    # rows of each column
+    order = np.argsort(cols, kind='stable')
+    col_ptr = np.zeros(ncols + 1, dtype=int)
+    np.cumsum(np.bincount(cols, minlength=ncols), out=col_ptr[1:])
+    col_rows = rows[order]
+
+    nnz_per_col = np.diff(col_ptr)
+    color = np.full(ncols, -1, dtype=int)
+    row_colors = {}
+
+    for col in np.argsort(-nnz_per_col, kind='stable'):
+        col_r = col_rows[col_ptr[col]:col_ptr[col + 1]]
+        used = set()
+        for r in col_r:
+            used.update(row_colors.get(r, ()))
+
+        c = 0
+        while c in used:
+            c += 1
+        color[col] = c
+
+        for r in col_r:
+            row_colors.setdefault(r, set()).add(c)
+
+    ncolors = color.max() + 1 if ncols else 0
+    return [np.nonzero(color == c)[0] for c in range(ncolors)]
+
+
+class Coloring(object):
+    """
+    Sparsity and forward/reverse colorings of a total Jacobian.
+    In 'fwd' mode the design variable entries of one color are seeded together and cost one
+    linear solve, in 'rev' mode the same holds for the response entries of one color.
+    Attributes
+    ----------
+    _shape : tuple
+        Shape of the total Jacobian.
+    _nzrows : ndarray of int
+        Row of each nonzero.
+    _nzcols : ndarray of int
+        Column of each nonzero.
+    _row_vars : list of (str, int)
+        Name and size of each response, in row order.
+    _col_vars : list of (str, int)
+        Name and size of each design variable, in column order.
+    _colors : dict
+        Column groups in 'fwd' mode and row groups in 'rev' mode.
+    """
+
+    def __init__(self, sparsity, row_vars, col_vars):
+        """
+        Initialize all attributes and compute the colorings.
+        Parameters
+        ----------
+        sparsity : ndarray of bool
+            Nonzero pattern of the total Jacobian.
+        row_vars : list of (str, int)
+            Name and size of each response, in row order.
+        col_vars : list of (str, int)
+            Name and size of each design variable, in column order.
+        """
+        self._shape = sparsity.shape
+        self._nzrows, self._nzcols = np.nonzero(sparsity)
+        self._row_vars = list(row_vars)
+        self._col_vars = list(col_vars)
+        self._colors = {
+            'fwd': color_columns(self._nzrows, self._nzcols, self._shape[1]),
+            'rev': color_columns(self._nzcols, self._nzrows, self._shape[0]),
+        }
+
+    def get_colors(self, mode):
+        """
+        Return the groups of columns ('fwd') or rows ('rev') that are solved together.
+        Parameters
+        ----------
+        mode : str
+            'fwd' or 'rev'.
+        Returns
+        -------
+        list of ndarray of int
+            Indices of each color.
+        """
+        return self._colors[mode]
+
+    def get_nonzeros(self, mode):
+        """
+        Return the nonzeros of each column ('fwd') or row ('rev') of the total Jacobian.
+        Parameters
+        ----------
+        mode : str
+            'fwd' or 'rev'.
+        Returns
+        -------
+        list of ndarray of int
+            Nonzero rows of each column, or nonzero columns of each row.
+        """
+        if mode == 'fwd':
+            major, minor, n = self._nzcols, self._nzrows, self._shape[1]
+        else:
+            major, minor, n = self._nzrows, self._nzcols, self._shape[0]
+        order = np.argsort(major, kind='stable')
+        bounds = np.zeros(n + 1, dtype=int)
+        np.cumsum(np.bincount(major, minlength=n), out=bounds[1:])
+        minor = minor[order]
+        return [minor[bounds[i]:bounds[i + 1]] for i in range(n)]
+
+    def total_solves(self, mode):
+        """
+        Return the number of linear solves needed in the given mode.
+        Parameters
+        ----------
+        mode : str
+            'fwd' or 'rev'.
+        Returns
+        -------
+        int
+            Number of colors.
+        """
+        return len(self._colors[mode])
+
+    def best_mode(self):
+        """
+        Return the mode needing the fewest linear solves.
+        Returns
+        -------
+        str
+            'fwd' or 'rev'.
+        """
+        return 'rev' if self.total_solves('rev') < self.total_solves('fwd') else 'fwd'
+
+    def matches(self, row_vars, col_vars):
+        """
+        Check that this coloring was computed for the given responses and design variables.
+        Parameters
+        ----------
+        row_vars : list of (str, int)
+            Name and size of each response, in row order.
+        col_vars : list of (str, int)
+            Name and size of each design variable, in column order.
+        Returns
+        -------
+        bool
+            True if the names and sizes are the same.
+        """
+        return self._row_vars == list(row_vars) and self._col_vars == list(col_vars)
+
+    def summary(self):
+        """
+        Return a short description of the coloring.
+        Returns
+        -------
+        str
+            Jacobian shape, density and number of solves in each mode.
+        """
+        nrows, ncols = self._shape
+        density = self._nzrows.size / float(nrows * ncols) if nrows and ncols else 0.0
+        return ("Jacobian shape: {} ({:.2f}% nonzero)\n"
+                "FWD solves: {} (uncolored {})\n"
+                "REV solves: {} (uncolored {})").format(
+                    self._shape, 100.0 * density, self.total_solves('fwd'), ncols,
+                    self.total_solves('rev'), nrows)
+
+    def save(self, fname):
+        """
+        Save this coloring to a file, creating its directory if needed.
+        Parameters
+        ----------
+        fname : str
+            Path of the file.
+        """
+        dirname = os.path.dirname(fname)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(fname, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(fname):
+        """
+        Load a coloring saved with save.
+        Parameters
+        ----------
+        fname : str
+            Path of the file.
+        Returns
+        -------
+        Coloring
+            The loaded coloring.
+        """
+        with open(fname, 'rb') as f:
+            return pickle.load(f)
+
+
+def compute_total_coloring(problem, num_full_jacs=3, tol=1e-12):
+    """
+    Compute the coloring of the total Jacobian of the driver design variables and responses.
+    The sparsity is found by computing the full total Jacobian num_full_jacs times with random
+    partials, so that no entry is zero by accident. The partials are recomputed afterwards.
+    Parameters
+    ----------
+    problem : Problem
+        The problem, after final_setup.
+    num_full_jacs : int
+        Number of total Jacobians with random partials to combine.
+    tol : float
+        Entries whose summed magnitude is below tol times the largest one are zeros, which
+        discards the round-off of the linear solves.
+    Returns
+    -------
+    Coloring
+        The coloring.
+    """
+    from om_lite.core.total_jac import _TotalJacInfo
+
+    info = _TotalJacInfo(problem, None, None, False, 'array', use_coloring=False)
+    sparsity = info._compute_sparsity(num_full_jacs)
+    sparsity = sparsity > tol * max(sparsity.max(initial=0.0), 1.0)
+    return Coloring(sparsity, info._get_var_sizes(info.of_meta),
+                    info._get_var_sizes(info.wrt_meta))
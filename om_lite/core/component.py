@@ -1,11 +1,40 @@
+from fnmatch import fnmatchcase
+
 import numpy as np
 
+from om_lite.core.approximation_schemes import ComplexStep, FiniteDifference
 from om_lite.core.system import System
+from om_lite.core.utils import _as_src_indices, _batch_index, ensure_compatible
+from om_lite.core.vector import Vector
+
+_supported_methods = {
+    'fd': FiniteDifference,
+    'cs': ComplexStep,
+}
 
 
 class Component(System):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.options.declare('supports_batch', types=bool, default=False,
+                             desc='If True, compute (or apply_nonlinear) accepts variables with '
+                             'a leading batch axis and evaluates every point along it at once.')
+        self._init_var_data()
+
+    def _init_var_data(self):
+        """
+        Clear all declared variables and partials.
+        """
+        self._var_rel_names = {'input': [], 'output': []}
+        self._var_rel2meta = {}
+
+        self.inputs = Vector('input')
+        self.outputs = Vector('output')
+        self.residuals = Vector('residual')
+        self.partials = {}
+        self._approx_schemes = {}
+        self._approx_vectors = {}
+        self._declared_partial_checks = []
 
     def setup(self):
         pass
@@ -13,9 +42,215 @@ class Component(System):
     def setup_partials(self):
         pass
 
+    def _setup_procs(self, pathname, comm, mode, prob_meta):
+        super()._setup_procs(pathname, comm, mode, prob_meta)
+        self._init_var_data()
+        self.setup()
+        self.setup_partials()
+
+    def _setup_var_data(self):
+        super()._setup_var_data()
+        abs2meta = self._var_allprocs_abs2meta
+        prom2abs = self._var_allprocs_prom2abs_list
+        abs2prom = self._var_allprocs_abs2prom
+
+        for io in ('input', 'output'):
+            for name in self._var_rel_names[io]:
+                abs_name = self.pathname + '.' + name if self.pathname else name
+                abs2meta[io][abs_name] = self._var_rel2meta[name]
+                prom2abs[io][name] = [abs_name]
+                abs2prom[io][abs_name] = name
+
+    def _setup_vectors(self, root_vectors):
+        super()._setup_vectors(root_vectors)
+        self.inputs = self._inputs
+        self.outputs = self._outputs
+        self.residuals = self._residuals
+
+        if self._problem_meta is not None and self._problem_meta['force_alloc_complex']:
+            self._get_approx_vectors(complex)
+
+    def _apply_partials(self, d_inputs, d_outputs, d_residuals, mode):
+        """
+        Multiply a vector by the declared partials of this component.
+        In 'fwd' mode the product with d_inputs and d_outputs is added to d_residuals, in 'rev'
+        mode the product of the transpose with d_residuals is added to d_inputs and d_outputs.
+        Parameters
+        ----------
+        d_inputs : Vector
+            Input derivatives.
+        d_outputs : Vector or None
+            Output derivatives, only needed if partials with respect to outputs are declared.
+        d_residuals : Vector
+            Residual derivatives.
+        mode : str
+            'fwd' or 'rev'.
+        """
+        prefix = self.pathname + '.' if self.pathname else ''
+        partials = self.partials
+        outputs = self._var_rel_names['output']
+
+        for key, val in partials.items():
+            if len(key) != 2:
+                continue
+            of, wrt = key
+            d_wrt = d_outputs if wrt in outputs else d_inputs
+            res = d_residuals._abs_get_val(prefix + of)
+            arg = d_wrt._abs_get_val(prefix + wrt)
+
+            if (of, wrt, 'coo') in partials:
+                rows, cols = partials[of, wrt, 'coo']
+                val = np.ravel(val)
+                if mode == 'fwd':
+                    res += np.bincount(rows, val * arg[cols], minlength=res.size)
+                else:
+                    arg += np.bincount(cols, val * res[rows], minlength=arg.size)
+            else:
+                shape = (res.size, arg.size)
+                if np.size(val) == res.size * arg.size:
+                    mtx = np.reshape(val, shape)
+                else:
+                    # a scalar set for a whole block
+                    mtx = np.broadcast_to(val, shape)
+                if mode == 'fwd':
+                    res += mtx.dot(arg)
+                else:
+                    arg += mtx.T.dot(res)
+
+    def _needs_exact_partials(self):
+        """
+        Return True unless every declared partial is approximated.
+        Returns
+        -------
+        bool
+            True if compute_partials (or linearize) has to be called.
+        """
+        approx = set()
+        for scheme in self._approx_schemes.values():
+            approx.update(scheme._wrt_meta)
+        return not approx or any(len(key) == 2 and key not in approx for key in self.partials)
+
+    def _compute_approx_partials(self):
+        """
+        Compute the partials declared with method 'fd' or 'cs'.
+        """
+        for scheme in self._approx_schemes.values():
+            scheme.compute_approximations(self)
+
+    def _run_approx(self, inputs, outputs, residuals):
+        """
+        Evaluate the function whose partials are approximated.
+        Parameters
+        ----------
+        inputs : Vector
+            Inputs, possibly perturbed or complex.
+        outputs : Vector
+            Outputs, possibly perturbed or complex.
+        residuals : Vector
+            Residuals, of the same type as the outputs.
+        Returns
+        -------
+        ndarray
+            The results, laid out like the output vector.
+        """
+        raise NotImplementedError()
+
+    def _get_approx_vectors(self, dtype, batch_size=None):
+        """
+        Return standalone 'input', 'output' and 'residual' vectors to run approximations on.
+        Only the vectors of the last batch size are kept.
+        Parameters
+        ----------
+        dtype : type
+            float or complex.
+        batch_size : int or None
+            If given, every variable gets a leading axis of this length.
+        Returns
+        -------
+        dict of Vector
+            The vectors, keyed by kind.
+        """
+        key = (np.dtype(dtype).kind, batch_size)
+        vectors = self._approx_vectors.get(key)
+        if vectors is not None:
+            return vectors
+
+        if batch_size is not None:
+            for old in [k for k in self._approx_vectors if k[1] is not None]:
+                del self._approx_vectors[old]
+
+        vectors = {}
+        for kind, io in (('input', 'input'), ('output', 'output'), ('residual', 'output')):
+            vec = Vector(kind, self.pathname)
+            for name in self._var_rel_names[io]:
+                shape = self._var_rel2meta[name]['shape']
+                vec._add_var(name, None, shape if batch_size is None else (batch_size, ) + shape)
+            size = sum(meta['size'] for meta in vec._abs2meta.values())
+            vec._allocate(np.zeros(size, dtype=dtype))
+            vectors[kind] = vec
+
+        self._approx_vectors[key] = vectors
+        return vectors
+
+    def _run_approx_batch(self, points):
+        """
+        Evaluate the approximated function at many points.
+        With the 'supports_batch' option the component runs once on vectors whose variables have
+        a leading batch axis, otherwise once per point. The vectors of the component are left
+        untouched either way.
+        Parameters
+        ----------
+        points : ndarray
+            Inputs followed by outputs of each point, one point per row, float or complex.
+        Returns
+        -------
+        ndarray
+            Results of each point, one row each, laid out like the output vector.
+        """
+        n_in = self._inputs.asarray().size
+        npts = points.shape[0]
+
+        if self.options['supports_batch']:
+            vectors = self._get_approx_vectors(points.dtype, npts)
+            out_idxs = _batch_index(self._outputs._slices, npts)
+            vectors['input'].asarray()[_batch_index(self._inputs._slices, npts)] = \
+                points[:, :n_in]
+            vectors['output'].asarray()[out_idxs] = points[:, n_in:]
+            flat = self._run_approx(vectors['input'], vectors['output'], vectors['residual'])
+            return flat[out_idxs]
+
+        vectors = self._get_approx_vectors(points.dtype)
+        results = np.empty((npts, points.shape[1] - n_in), dtype=points.dtype)
+        inputs = vectors['input'].asarray()
+        outputs = vectors['output'].asarray()
+        for i, point in enumerate(points):
+            inputs[:] = point[:n_in]
+            outputs[:] = point[n_in:]
+            results[i] = self._run_approx(vectors['input'], vectors['output'],
+                                          vectors['residual'])
+        return results
+
+    def _get_check_partial_options(self, wrt):
+        """
+        Return the options given to set_check_partial_options for one variable.
+        Parameters
+        ----------
+        wrt : str
+            Relative name of the input or output.
+        Returns
+        -------
+        dict
+            The options, later declarations taking precedence.
+        """
+        options = {}
+        for patterns, settings in self._declared_partial_checks:
+            if any(fnmatchcase(wrt, pattern) for pattern in patterns):
+                options.update(settings)
+        return options
+
     def set_val(self, name, val):
         if name in self.inputs:
-            # need more raise error to ensure same type and shape.
+            # values are copied into the existing view, so shapes must broadcast
             self.inputs[name] = val
 
         elif name in self.outputs:
@@ -24,6 +259,29 @@ class Component(System):
         else:
             raise Exception("Given name is not in inputs or outputs")
 
+    def _add_variable(self, name, io, val, shape, meta):
+        if name in self._var_rel2meta:
+            raise ValueError("{}: Variable name '{}' already exists.".format(
+                self.msginfo, name))
+
+        val, shape = ensure_compatible(name, val, shape)
+        meta.update({
+            'val': val,
+            'shape': shape,
+            'size': val.size,
+            'distributed': False,
+        })
+        self._var_rel2meta[name] = meta
+        self._var_rel_names[io].append(name)
+
+        if io == 'input':
+            self.inputs._add_var(name, val, shape)
+        else:
+            self.outputs._add_var(name, val, shape)
+            self.residuals._add_var(name, None, shape)
+
+        return meta
+
     def add_input(self,
                   name,
                   val=1.0,
@@ -32,10 +290,17 @@ class Component(System):
                   flat_src_indices=None,
                   units=None,
                   desc=''):
-        if shape is None:
-            self.inputs[name] = val
-        else:
-            self.inputs[name] = np.zeros(shape, dtype=float)
+        if src_indices is not None:
+            src_indices = _as_src_indices(src_indices)
+
+        return self._add_variable(
+            name, 'input', val, shape, {
+                'src_indices': src_indices,
+                'flat_src_indices': flat_src_indices,
+                'has_src_indices': src_indices is not None,
+                'units': units,
+                'desc': desc,
+            })
 
     def add_output(self,
                    name,
@@ -46,10 +311,14 @@ class Component(System):
                    desc='',
                    lower=None,
                    upper=None):
-        if shape is None:
-            self.outputs[name] = val
-        else:
-            self.outputs[name] = np.zeros(shape, dtype=float)
+        return self._add_variable(
+            name, 'output', val, shape, {
+                'units': units,
+                'res_units': res_units,
+                'desc': desc,
+                'lower': lower,
+                'upper': upper,
+            })
 
     def declare_partials(self,
                          of,
@@ -58,24 +327,35 @@ class Component(System):
                          rows=None,
                          cols=None,
                          val=None,
-                         method='exact'):
+                         method='exact',
+                         step=None,
+                         form=None,
+                         step_calc=None):
+        if not dependent:
+            return
+
+        if method not in ('exact', 'fd', 'cs'):
+            raise ValueError("{}: Method '{}' for partials of '{}' wrt '{}' is not one of "
+                             "'exact', 'fd' or 'cs'.".format(self.msginfo, method, of, wrt))
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=int)
+            cols = np.asarray(cols, dtype=int)
+
         def _declare_partials(of, wrt):
+            if method != 'exact':
+                if method not in self._approx_schemes:
+                    self._approx_schemes[method] = _supported_methods[method]()
+                options = {'step': step, 'step_calc': step_calc}
+                if method == 'fd':
+                    options['form'] = form
+                self._approx_schemes[method].add_approximation((of, wrt), options)
+
             if rows is None:
                 if val is None:
-                    if type(self.outputs[of]) == float:
-                        if type(self.inputs[wrt]) == float:
-                            self.partials[of, wrt] = np.zeros((1, 1))
-                        else:
-                            self.partials[of, wrt] = np.zeros(
-                                (1, self.inputs[wrt].size))
-
-                    elif type(self.inputs[wrt]) == float:
-                        self.partials[of, wrt] = np.zeros(
-                            (self.outputs[of].size, 1))
-
-                    else:
-                        self.partials[of, wrt] = np.zeros(
-                            (self.outputs[of].size, self.inputs[wrt].size))
+                    self.partials[of, wrt] = np.zeros(
+                        (self._var_rel2meta[of]['size'],
+                         self._var_rel2meta[wrt]['size']))
                 else:
                     self.partials[of, wrt] = val
             else:
@@ -88,16 +368,16 @@ class Component(System):
                     self.partials[of, wrt] = val
 
         if of == '*' and wrt == '*':
-            for of_ in self.outputs:
-                for wrt_ in self.inputs:
+            for of_ in self._var_rel_names['output']:
+                for wrt_ in self._var_rel_names['input']:
                     _declare_partials(of_, wrt_)
 
         elif of == '*':
-            for of_ in self.outputs:
+            for of_ in self._var_rel_names['output']:
                 _declare_partials(of_, wrt)
 
         elif wrt == '*':
-            for wrt_ in self.inputs:
+            for wrt_ in self._var_rel_names['input']:
                 _declare_partials(of, wrt_)
 
         else:
@@ -110,4 +390,41 @@ class Component(System):
                                   step=None,
                                   step_calc=None,
                                   directional=False):
-        pass
\ No newline at end of file
+        """
+        Set the options used by Problem.check_partials for the partials wrt some variables.
+        Options left to None take the values passed to check_partials.
+        Parameters
+        ----------
+        wrt : str or list of str
+            Names or glob patterns of the inputs (or outputs) concerned.
+        method : str
+            'fd' or 'cs'.
+        form : str or None
+            'forward', 'backward' or 'central', for 'fd' only.
+        step : float or None
+            Step size.
+        step_calc : str or None
+            'abs' for an absolute step, 'rel' for a step relative to the variable value.
+        directional : bool
+            If True, check the partials along one random direction instead of column by
+            column, which takes a single perturbation per variable.
+        """
+        if method not in ('fd', 'cs'):
+            raise ValueError("{}: Method '{}' is not one of 'fd' or 'cs'.".format(
+                self.msginfo, method))
+        if form not in (None, 'forward', 'backward', 'central'):
+            raise ValueError("{}: Form '{}' is not one of 'forward', 'backward' or "
+                             "'central'.".format(self.msginfo, form))
+        if step_calc not in (None, 'abs', 'rel'):
+            raise ValueError("{}: Step_calc '{}' is not one of 'abs' or 'rel'.".format(
+                self.msginfo, step_calc))
+
+        patterns = [wrt] if isinstance(wrt, str) else list(wrt)
+        self._declared_partial_checks.append((patterns, {
+            'method': method,
+            'form': form,
+            'step': step,
+            'step_calc': step_calc,
+            'directional': directional,
+        }))
+
@@ -0,0 +1,483 @@
+"""Define the DOEDriver class and the generators of its cases."""
+import itertools
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from om_lite.core.driver import Driver
+
+# problem and shared arrays of a worker process, set by _init_worker
+_worker_state = {}
+
+
+class DOEGenerator(object):
+    """
+    Base class of the generators of the cases run by a DOEDriver.
+    """
+
+    def __call__(self, design_vars):
+        """
+        Generate the cases.
+        Parameters
+        ----------
+        design_vars : dict
+            Metadata of the design variables, keyed by promoted name.
+        Returns
+        -------
+        list of list of (str, ndarray)
+            Value of each design variable in each case.
+        """
+        raise NotImplementedError()
+
+
+class ListGenerator(DOEGenerator):
+    """
+    Generator returning a given list of cases.
+    Attributes
+    ----------
+    _data : list of list of (str, value)
+        The cases.
+    """
+
+    def __init__(self, data):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        data : list of list of (str, value)
+            Value of each design variable in each case. Missing design variables keep their
+            current value.
+        """
+        self._data = data
+
+    def __call__(self, design_vars):
+        return [[(name, val) for name, val in case] for case in self._data]
+
+
+class UniformGenerator(DOEGenerator):
+    """
+    Generator of cases drawn uniformly between the bounds of the design variables.
+    Attributes
+    ----------
+    _num_samples : int
+        Number of cases.
+    _seed : int or None
+        Seed of the random generator.
+    """
+
+    def __init__(self, num_samples=1, seed=None):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        num_samples : int
+            Number of cases.
+        seed : int or None
+            Seed of the random generator.
+        """
+        self._num_samples = num_samples
+        self._seed = seed
+
+    def __call__(self, design_vars):
+        rng = np.random.default_rng(self._seed)
+        bounds = _get_bounds(design_vars)
+        samples = {name: rng.uniform(lower, upper, (self._num_samples, lower.size))
+                   for name, (lower, upper) in bounds.items()}
+        return [[(name, samples[name][i]) for name in bounds]
+                for i in range(self._num_samples)]
+
+
+class FullFactorialGenerator(DOEGenerator):
+    """
+    Generator of the cases of a full factorial design between the bounds of the design
+    variables.
+    Attributes
+    ----------
+    _levels : int
+        Number of evenly spaced levels of each design variable entry.
+    """
+
+    def __init__(self, levels=2):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        levels : int
+            Number of evenly spaced levels of each design variable entry.
+        """
+        self._levels = levels
+
+    def __call__(self, design_vars):
+        bounds = _get_bounds(design_vars)
+        axes = []
+        for name, (lower, upper) in bounds.items():
+            for lo, up in zip(lower, upper):
+                axes.append(np.linspace(lo, up, self._levels))
+
+        cases = []
+        for point in itertools.product(*axes):
+            point = np.array(point)
+            case = []
+            start = 0
+            for name, (lower, _) in bounds.items():
+                case.append((name, point[start:start + lower.size]))
+                start += lower.size
+            cases.append(case)
+        return cases
+
+
+def _get_bounds(design_vars):
+    """
+    Return the bounds of every entry of the design variables.
+    Parameters
+    ----------
+    design_vars : dict
+        Metadata of the design variables, keyed by promoted name.
+    Returns
+    -------
+    dict
+        Lower and upper bound arrays of each design variable.
+    """
+    bounds = {}
+    for name, meta in design_vars.items():
+        if meta['lower'] is None or meta['upper'] is None:
+            raise ValueError("Design variable '{}' needs lower and upper bounds to generate "
+                             "cases.".format(name))
+        size = meta['size']
+        bounds[name] = (np.broadcast_to(np.asarray(meta['lower'], dtype=float), (size, )),
+                        np.broadcast_to(np.asarray(meta['upper'], dtype=float), (size, )))
+    return bounds
+
+
+def _create_shared(key, shape, arrays, blocks):
+    """
+    Allocate a float array in a new shared memory block.
+    Parameters
+    ----------
+    key : str
+        Name of the array.
+    shape : tuple
+        Shape of the array.
+    arrays : dict
+        Arrays, the new one is added under key.
+    blocks : dict
+        Shared memory blocks, the new one is added under key.
+    Returns
+    -------
+    ndarray
+        The array, backed by the shared memory block.
+    """
+    shm = SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    blocks[key] = shm
+    arrays[key] = arr = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    return arr
+
+
+def _run_case(model, case, state, dv_slots, resp_slots, results):
+    """
+    Run the model for one case, starting from the same state as every other case.
+    Parameters
+    ----------
+    model : System
+        The model.
+    case : ndarray
+        Flat values of the design variables.
+    state : dict of ndarray
+        Values of the model 'input' and 'output' vectors at the start of the run.
+    dv_slots : list of (str, ndarray or None, slice)
+        Source, indices and location in case of each design variable.
+    resp_slots : list of (str, ndarray or None, slice)
+        Source, indices and location in results of each response.
+    results : ndarray
+        Flat values of the responses, filled in place.
+    Returns
+    -------
+    str or None
+        The error, or None if the case ran.
+    """
+    outputs = model._outputs
+    model._inputs.asarray()[:] = state['input']
+    outputs.asarray()[:] = state['output']
+
+    for src, indices, slc in dv_slots:
+        if indices is None:
+            outputs._abs_get_val(src)[:] = case[slc]
+        else:
+            outputs._abs_get_val(src)[indices] = case[slc]
+
+    try:
+        model.run_solve_nonlinear()
+    except Exception:
+        results[:] = np.nan
+        return traceback.format_exc()
+
+    for src, indices, slc in resp_slots:
+        val = outputs._abs_get_val(src)
+        results[slc] = val if indices is None else val[indices]
+    return None
+
+
+def _init_worker(model, setup_kwargs, dv_slots, resp_slots, shm_specs):
+    """
+    Set up a copy of the model and attach to the shared arrays.
+    Parameters
+    ----------
+    model : System
+        Copy of the model.
+    setup_kwargs : dict
+        Arguments of Problem.setup.
+    dv_slots : list of (str, ndarray or None, slice)
+        Source, indices and location in a case of each design variable.
+    resp_slots : list of (str, ndarray or None, slice)
+        Source, indices and location in the results of each response.
+    shm_specs : dict
+        Name of the shared memory block and shape of each shared array.
+    """
+    from om_lite.core.problem import Problem
+
+    prob = Problem(model)
+    prob.setup(**setup_kwargs)
+    prob.final_setup()
+
+    arrays = {}
+    blocks = []
+    for key, (name, shape) in shm_specs.items():
+        shm = SharedMemory(name=name)
+        blocks.append(shm)
+        arrays[key] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+    _worker_state.update(problem=prob, arrays=arrays, blocks=blocks, dv_slots=dv_slots,
+                         resp_slots=resp_slots)
+
+
+def _run_worker_cases(start, stop):
+    """
+    Run a range of cases in a worker process, the results land in the shared arrays.
+    Parameters
+    ----------
+    start : int
+        First case.
+    stop : int
+        End of the range.
+    Returns
+    -------
+    list of (int, str)
+        Index and error of the failed cases.
+    """
+    model = _worker_state['problem'].model
+    arrays = _worker_state['arrays']
+    state = {'input': arrays['state_input'], 'output': arrays['state_output']}
+
+    failures = []
+    for i in range(start, stop):
+        msg = _run_case(model, arrays['cases'][i], state, _worker_state['dv_slots'],
+                        _worker_state['resp_slots'], arrays['results'][i])
+        if msg is not None:
+            failures.append((i, msg))
+    return failures
+
+
+class DOEDriver(Driver):
+    """
+    Driver running the model for each case of a design of experiments.
+    Every case starts from the state of the model when run is called, so the results do not
+    depend on the order in which the cases are run. With num_workers > 1 the cases are run by a
+    pool of worker processes, each holding its own set-up copy of the model. Design variable
+    values and responses move through shared memory arrays, only the range of cases to run is
+    sent to a worker. A case that raises is recorded as failed, with NaN responses, and the
+    other cases still run.
+    Attributes
+    ----------
+    results : dict or None
+        Results of the last run: the 'inputs' and 'outputs' of each case keyed by design
+        variable and response name, with one row per case, the 'success' flag of each case and
+        the 'errors' of the failed cases keyed by case index.
+    _generator : DOEGenerator
+        Generator of the cases.
+    """
+
+    def __init__(self, generator=None, **kwargs):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        generator : DOEGenerator or None
+            Generator of the cases, a ListGenerator with no case if None.
+        **kwargs : dict
+            Options of the driver.
+        """
+        super().__init__(**kwargs)
+        self._generator = ListGenerator([]) if generator is None else generator
+        self.results = None
+
+    def _declare_options(self):
+        self.options.declare('num_workers', types=int, default=1, lower=1,
+                             desc='Number of worker processes running the cases, 1 to run '
+                             'them in this process.')
+        self.options.declare('chunk_size', types=int, default=None, allow_none=True, lower=1,
+                             desc='Number of cases sent to a worker at a time. Defaults to '
+                             'splitting the cases in four chunks per worker.')
+
+    def _get_slots(self, meta_dict):
+        """
+        Return the source, indices and flat location of each design variable or response.
+        Parameters
+        ----------
+        meta_dict : dict
+            Metadata of the design variables or responses.
+        Returns
+        -------
+        list of (str, ndarray or None, slice)
+            The slots.
+        int
+            Total size.
+        """
+        slots = []
+        start = 0
+        for meta in meta_dict.values():
+            slots.append((meta['source'], meta['indices'], slice(start, start + meta['size'])))
+            start += meta['size']
+        return slots, start
+
+    def run(self):
+        """
+        Run the model for every case of the generator.
+        Returns
+        -------
+        boolean
+            Failure flag; True if any case failed.
+        """
+        problem = self._problem
+        model = problem.model
+        design_vars = model.get_design_vars()
+        responses = model.get_responses()
+        dv_slots, dv_size = self._get_slots(design_vars)
+        resp_slots, resp_size = self._get_slots(responses)
+
+        generated = self._generator(design_vars)
+        ncases = len(generated)
+        arrays = {}
+        blocks = {}
+        try:
+            cases = _create_shared('cases', (ncases, dv_size), arrays, blocks)
+            results = _create_shared('results', (ncases, resp_size), arrays, blocks)
+            state = {}
+            for kind, vec in (('input', model._inputs), ('output', model._outputs)):
+                state[kind] = _create_shared('state_' + kind, vec.asarray().shape, arrays,
+                                             blocks)
+                state[kind][:] = vec.asarray()
+
+            # cases start from the current design, then get the given values
+            for (src, indices, slc) in dv_slots:
+                val = model._outputs._abs_get_val(src)
+                cases[:, slc] = val if indices is None else val[indices]
+            slot_of = dict(zip(design_vars, dv_slots))
+            for i, case in enumerate(generated):
+                for name, val in case:
+                    if name not in slot_of:
+                        raise KeyError("{}: '{}' is not a design variable.".format(
+                            self.msginfo, name))
+                    cases[i, slot_of[name][2]] = np.ravel(val)
+
+            rec_mgr = self._rec_mgr
+            first = self.iter_count + 1
+            if self.options['num_workers'] > 1 and ncases > 1:
+                errors = self._run_parallel(dv_slots, resp_slots, arrays, blocks)
+                if rec_mgr:
+                    # the model state of each case stays in its worker, only the design
+                    # variables and responses are recorded
+                    schema_ids = rec_mgr.add_schema(
+                        self.msginfo, list(design_vars) + list(responses),
+                        [(meta['size'], ) for meta in design_vars.values()] +
+                        [(meta['size'], ) for meta in responses.values()])
+                    for i in range(ncases):
+                        rec_mgr.record_data('{}|{}'.format(self.msginfo, first + i),
+                                            schema_ids, np.concatenate((cases[i], results[i])),
+                                            success=i not in errors)
+            else:
+                errors = {}
+                stack = problem._recording_iter.stack
+                for i in range(ncases):
+                    self.iter_count += 1
+                    stack.append((self.msginfo, self.iter_count))
+                    try:
+                        msg = _run_case(model, cases[i], state, dv_slots, resp_slots,
+                                        results[i])
+                    finally:
+                        stack.pop()
+                    if msg is not None:
+                        errors[i] = msg
+                    if rec_mgr:
+                        rec_mgr.record_iteration(
+                            '{}|{}'.format(self.msginfo, self.iter_count),
+                            success=msg is None)
+                    self._checkpoint(model_is_current=msg is None)
+                model._inputs.asarray()[:] = state['input']
+                model._outputs.asarray()[:] = state['output']
+
+            success = np.ones(ncases, dtype=bool)
+            success[list(errors)] = False
+            self.results = {
+                'inputs': {name: cases[:, slc].copy()
+                           for name, (_, _, slc) in zip(design_vars, dv_slots)},
+                'outputs': {name: results[:, slc].copy()
+                            for name, (_, _, slc) in zip(responses, resp_slots)},
+                'success': success,
+                'errors': errors,
+            }
+        finally:
+            for shm in blocks.values():
+                shm.close()
+                shm.unlink()
+
+        return not success.all()
+
+    def _run_parallel(self, dv_slots, resp_slots, arrays, blocks):
+        """
+        Run the cases in a pool of worker processes.
+        The iteration count advances as each chunk of cases completes, when a checkpoint may be
+        saved. The model state of each case stays in its worker, so the checkpoint holds the
+        state the cases started from.
+        Parameters
+        ----------
+        dv_slots : list of (str, ndarray or None, slice)
+            Source, indices and location in a case of each design variable.
+        resp_slots : list of (str, ndarray or None, slice)
+            Source, indices and location in the results of each response.
+        arrays : dict of ndarray
+            The 'cases', 'results', 'state_input' and 'state_output' shared arrays.
+        blocks : dict of SharedMemory
+            Shared memory block of each array.
+        Returns
+        -------
+        dict
+            Error of each failed case, keyed by case index.
+        """
+        problem = self._problem
+        ncases = arrays['cases'].shape[0]
+        num_workers = min(self.options['num_workers'], ncases)
+        chunk = self.options['chunk_size'] or max(1, -(-ncases // (4 * num_workers)))
+
+        shm_specs = {key: (blocks[key].name, arr.shape) for key, arr in arrays.items()}
+        setup_kwargs = {
+            'mode': problem._orig_mode,
+            'force_alloc_complex': problem._metadata['force_alloc_complex'],
+            'derivatives': problem._metadata['use_derivatives'],
+        }
+
+        errors = {}
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                 initargs=(problem.model, setup_kwargs, dv_slots, resp_slots,
+                                           shm_specs)) as executor:
+            starts = range(0, ncases, chunk)
+            futures = [executor.submit(_run_worker_cases, start, min(start + chunk, ncases))
+                       for start in starts]
+            for start, future in zip(starts, futures):
+                errors.update(future.result())
+                num_run = min(start + chunk, ncases) - start
+                self.iter_count += num_run
+                self._checkpoint(num_run, model_is_current=None)
+
+        return errors
@@ -0,0 +1,200 @@
+import os
+
+from om_lite.core.checkpoint import save_checkpoint
+from om_lite.core.coloring import Coloring, compute_total_coloring
+from om_lite.core.options_dictionary import OptionsDictionary
+from om_lite.core.recording import _RecordingManager, _declare_recording_options
+
+
+class Driver(object):
+    """
+    Base driver, runs the model once.
+    Attributes
+    ----------
+    iter_count : int
+        Number of times the driver has run the model.
+    options : OptionsDictionary
+        Options of this driver.
+    recording_options : OptionsDictionary
+        Variables recorded at each iteration.
+    _problem : weakref or None
+        The problem this driver belongs to, set during final setup.
+    _coloring_info : dict
+        Settings of the total coloring and the coloring itself once computed or loaded.
+    _rec_mgr : _RecordingManager
+        The recorders of this driver.
+    """
+
+    def __init__(self, **kwargs):
+        self.iter_count = 0
+        self.options = OptionsDictionary()
+        self._problem = None
+        self._coloring_info = {
+            'num_full_jacs': 3,
+            'tol': 1e-12,
+            'dynamic': False,
+            'static': None,
+            'coloring': None,
+        }
+
+        self._rec_mgr = _RecordingManager()
+        self.recording_options = OptionsDictionary()
+        _declare_recording_options(self.recording_options, [])
+
+        self.options.declare('checkpoint_file', types=str, default=None, allow_none=True,
+                             desc='Path of the checkpoint written every checkpoint_freq '
+                             'iterations.')
+        self.options.declare('checkpoint_freq', types=int, default=0, lower=0,
+                             desc='Number of iterations between checkpoints, 0 to never write '
+                             'one.')
+
+        self._declare_options()
+        self.options.update(kwargs)
+
+    def _declare_options(self):
+        pass
+
+    @property
+    def msginfo(self):
+        """
+        Our class name, for use in error messages.
+        """
+        return type(self).__name__
+
+    def add_recorder(self, recorder):
+        """
+        Record the design variables, responses and included outputs at each iteration.
+        Parameters
+        ----------
+        recorder : BinaryRecorder
+            The recorder.
+        """
+        self._rec_mgr.append(recorder)
+
+    def _setup_comm(self, comm):
+        """
+        Return the communicator to be used by the model.
+        Parameters
+        ----------
+        comm : FakeComm
+            The communicator of the problem.
+        Returns
+        -------
+        FakeComm
+            The communicator of the model.
+        """
+        return comm
+
+    def _setup_driver(self, problem):
+        """
+        Prepare the driver for execution, called from Problem.final_setup.
+        Parameters
+        ----------
+        problem : Problem
+            The problem this driver belongs to.
+        """
+        self._problem = problem
+        # the variables may have changed since the last setup
+        self._coloring_info['coloring'] = None
+
+    def declare_coloring(self, num_full_jacs=3, tol=1e-12):
+        """
+        Color the total Jacobian the first time the driver totals are computed.
+        The coloring is saved as 'total_coloring.pkl' in the coloring_dir of the problem, from
+        where use_fixed_coloring can load it in later runs.
+        Parameters
+        ----------
+        num_full_jacs : int
+            Number of total Jacobians with random partials used to find the sparsity.
+        tol : float
+            Entries below this magnitude, relative to the largest one, are zeros.
+        """
+        self._coloring_info.update(num_full_jacs=num_full_jacs, tol=tol, dynamic=True)
+
+    def use_fixed_coloring(self, coloring=None):
+        """
+        Use a saved coloring of the total Jacobian instead of computing one.
+        Parameters
+        ----------
+        coloring : str or Coloring or None
+            Coloring or path of a coloring file. Defaults to 'total_coloring.pkl' in the
+            coloring_dir of the problem.
+        """
+        self._coloring_info['static'] = coloring if coloring is not None else True
+
+    def _get_coloring_fname(self):
+        """
+        Return the path of the total coloring file.
+        Returns
+        -------
+        str
+            The path.
+        """
+        return os.path.join(self._problem._metadata['coloring_dir'], 'total_coloring.pkl')
+
+    def _get_total_coloring(self):
+        """
+        Return the total coloring, computing or loading it if needed.
+        Returns
+        -------
+        Coloring or None
+            The coloring, or None if no coloring was requested.
+        """
+        info = self._coloring_info
+        if info['coloring'] is not None:
+            return info['coloring']
+
+        static = info['static']
+        if isinstance(static, Coloring):
+            info['coloring'] = static
+        elif static is not None:
+            info['coloring'] = Coloring.load(self._get_coloring_fname() if static is True
+                                             else static)
+        elif info['dynamic']:
+            info['coloring'] = coloring = compute_total_coloring(
+                self._problem, info['num_full_jacs'], info['tol'])
+            coloring.save(self._get_coloring_fname())
+
+        return info['coloring']
+
+    def _run_model(self):
+        model = self._problem.model
+        self.iter_count += 1
+        # the cases recorded by the solvers are located in this iteration
+        stack = self._problem._recording_iter.stack
+        stack.append((self.msginfo, self.iter_count))
+        try:
+            model.run_solve_nonlinear()
+        finally:
+            stack.pop()
+        if self._rec_mgr:
+            self._rec_mgr.record_iteration('{}|{}'.format(self.msginfo, self.iter_count))
+        # the model has just run, so its outputs match its inputs
+        self._checkpoint()
+
+    def _checkpoint(self, num_iters=1, model_is_current=True):
+        """
+        Save a checkpoint of the problem if one is due at the last iterations.
+        Parameters
+        ----------
+        num_iters : int
+            Number of iterations completed since the previous call.
+        model_is_current : bool or None
+            Whether the outputs of the model match its inputs, taken from the problem if None.
+        """
+        freq = self.options['checkpoint_freq']
+        if freq and self.options['checkpoint_file'] and \
+                self.iter_count // freq > (self.iter_count - num_iters) // freq:
+            save_checkpoint(self._problem, self.options['checkpoint_file'],
+                            model_is_current=model_is_current)
+
+    def run(self):
+        """
+        Run the model once.
+        Returns
+        -------
+        boolean
+            Failure flag; True if failed to converge, False is successful.
+        """
+        self._run_model()
+        return False
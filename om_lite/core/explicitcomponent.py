@@ -1,12 +1,145 @@
+from collections import OrderedDict
+
+import numpy as np
+
 from om_lite.core.component import Component
 
 
+class _ComputeCache(object):
+    """
+    Least recently used cache of the outputs (and partials) computed for given inputs.
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of cached input vectors.
+    hits : int
+        Number of lookups that found their inputs.
+    misses : int
+        Number of lookups that did not.
+    _cache : OrderedDict
+        [outputs, partials or None] keyed by the bytes of the input vector, least recently used
+        first.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of cached input vectors.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        """
+        Return the entry of an input vector, or None.
+        Parameters
+        ----------
+        key : bytes
+            The input vector.
+        Returns
+        -------
+        list or None
+            [outputs, partials or None].
+        """
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return entry
+
+    def put(self, key, outputs):
+        """
+        Cache the outputs of an input vector, evicting the least recently used entry if full.
+        Parameters
+        ----------
+        key : bytes
+            The input vector.
+        outputs : ndarray or None
+            The outputs, copied, or None if only partials will be cached.
+        Returns
+        -------
+        list
+            The new entry.
+        """
+        entry = self._cache[key] = [None if outputs is None else outputs.copy(), None]
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """
+        Drop all cached entries.
+        """
+        self._cache.clear()
+
+
 class ExplicitComponent(Component):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.options.declare('cache_size', types=int, default=0, lower=0,
+                             desc='Number of input vectors whose outputs are kept, so that '
+                             'compute is skipped when one of them comes back. 0 disables '
+                             'the cache.')
+        self.options.declare('cache_partials', types=bool, default=False,
+                             desc='If True and cache_size is set, also keep the partials so '
+                             'that compute_partials is skipped too.')
         self.initialize()
         self.options.update(kwargs)
 
+    def _init_var_data(self):
+        super()._init_var_data()
+        self._compute_cache = None
+        # (input bytes, entry) of the last compute, reused by _linearize at the same inputs
+        self._last_cache_entry = None
+
+    def _get_compute_cache(self):
+        """
+        Return the cache of computed outputs, or None if it is disabled.
+        Returns
+        -------
+        _ComputeCache or None
+            The cache.
+        """
+        if self.options['cache_size'] == 0:
+            return None
+        if self._compute_cache is None or \
+                self._compute_cache.maxsize != self.options['cache_size']:
+            self._compute_cache = _ComputeCache(self.options['cache_size'])
+            self._last_cache_entry = None
+        return self._compute_cache
+
+    def _compute(self):
+        """
+        Compute the outputs, or copy the ones cached for the current inputs.
+        """
+        cache = self._get_compute_cache()
+        if cache is None:
+            self.compute(self.inputs, self.outputs)
+            return
+
+        key = self._inputs.asarray().tobytes()
+        entry = cache.get(key)
+        if entry is not None and entry[0] is not None:
+            self._outputs.asarray()[:] = entry[0]
+        else:
+            self.compute(self.inputs, self.outputs)
+            if entry is None:
+                entry = cache.put(key, self._outputs.asarray())
+            else:
+                entry[0] = self._outputs.asarray().copy()
+        self._last_cache_entry = (key, entry)
+
     def add_output(
         self,
         name,
@@ -29,6 +162,91 @@ class ExplicitComponent(Component):
             upper=upper,
         )
 
+    def _solve_nonlinear(self):
+        self._compute()
+
+    def _solve_nonlinear_batch(self, vectors, npts):
+        if self.options['supports_batch']:
+            self.compute(vectors['input'], vectors['output'])
+        else:
+            super()._solve_nonlinear_batch(vectors, npts)
+
+    def _apply_nonlinear(self):
+        # residual of an explicit output is its current value minus the computed one
+        outputs = self._outputs.asarray()
+        saved = outputs.copy()
+        self._compute()
+        self._residuals.asarray()[:] = saved - outputs
+        outputs[:] = saved
+
+    def _linearize(self, sub_do_ln=True):
+        cache = self._get_compute_cache() if self.options['cache_partials'] else None
+        entry = None
+        if cache is not None:
+            key = self._inputs.asarray().tobytes()
+            last = self._last_cache_entry
+            if last is not None and last[0] == key:
+                # already looked up by the compute at these inputs, not counted again
+                entry = last[1]
+            else:
+                entry = cache.get(key)
+                if entry is None:
+                    entry = cache.put(key, None)
+
+        if entry is not None and entry[1] is not None:
+            for key, val in entry[1].items():
+                self.partials[key] = val.copy()
+        else:
+            if self._needs_exact_partials():
+                self.compute_partials(self.inputs, self.outputs, self.partials)
+            self._compute_approx_partials()
+            if entry is not None:
+                entry[1] = {key: np.array(val, dtype=float) for key, val in
+                            self.partials.items() if len(key) == 2}
+        if self._assembled_jac is not None:
+            self._assembled_jac._update(self)
+
+    def _run_approx(self, inputs, outputs, residuals):
+        vals = outputs.asarray()
+        saved = vals.copy()
+        self.compute(inputs, outputs)
+        results = vals.copy()
+        vals[:] = saved
+        return results
+
+    def _apply_linear(self, mode):
+        # the Jacobian of o - f(i) is I - df/di
+        d_residuals = self._dresiduals
+        d_res = d_residuals.asarray()
+        if mode == 'fwd':
+            d_res[:] = 0.0
+            self.compute_jacvec_product(self.inputs, self._dinputs, d_residuals, 'fwd')
+            d_res *= -1.0
+            d_res += self._doutputs.asarray()
+        else:
+            d_res *= -1.0
+            self.compute_jacvec_product(self.inputs, self._dinputs, d_residuals, 'rev')
+            d_res *= -1.0
+            self._doutputs.asarray()[:] += d_res
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        """
+        Compute a product with the partials of the outputs with respect to the inputs.
+        In 'fwd' mode d_outputs += df/di d_inputs, in 'rev' mode d_inputs += df/di^T d_outputs.
+        The default uses the partials from compute_partials. Override it to avoid forming them.
+        Parameters
+        ----------
+        inputs : Vector
+            Unscaled input values.
+        d_inputs : Vector
+            Input derivatives.
+        d_outputs : Vector
+            Output derivatives.
+        mode : str
+            'fwd' or 'rev'.
+        """
+        self._apply_partials(d_inputs, None, d_outputs, mode)
+
     # intentionally wrong to catch errors
     def compute(self, outputs):
         pass
@@ -1,13 +1,493 @@
+import numpy as np
+
+from om_lite.core.component import Component
+from om_lite.core.nonlinear_solvers import NonlinearBlockGS
 from om_lite.core.system import System
+from om_lite.core.units import _connection_factors
+from om_lite.core.utils import _as_src_indices, _flatten_src_indices, get_sccs_topo, \
+    match_prom_or_alias
 
 
 class Group(System):
-    def __init__(self):
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        # subsystems, connections and promotes added outside of setup are kept across setups
+        self._static_subsystems_allprocs = {}
+        self._static_manual_connections = {}
+        self._static_proc_info = {}
+        self._manual_connections = {}
+        self._proc_info = {}
+
+        # connections from the outputs of '_auto_ivc' to unconnected inputs (top group only)
+        self._auto_ivc_conns = {}
+
+        # group level input metadata (from set_input_defaults) and promoted src_indices
+        self._group_inputs = {}
+        self._var_prom2inds = {}
+
+        # connections resolved by this group, abs input name -> abs output name
+        self._conn_abs_in2out = {}
+        self._transfers = {}
+        # the connections of each subsystem (and of the whole group, keyed by None) compiled
+        # into gather indices of the group vectors, built with the vectors
+        self._transfer_data = {}
+
+        # data dependencies between subsystems, and their strongly connected components in
+        # execution order; components with more than one member are cycles
+        self._subsystems_graph = {}
+        self._sccs = []
+        self._cycle_solver = None
+
+        self.initialize()
+        self.options.update(kwargs)
+
     def setup(self):
         pass
 
+    def _setup(self, comm, mode, prob_meta):
+        super()._setup(comm, mode, prob_meta)
+
+        if self._setup_auto_ivcs():
+            self._setup_var_data()
+            self._setup_connections()
+
+        self._setup_src_indices()
+        self._setup_global_connections(self._conn_global_abs_in2out)
+
+    def _setup_auto_ivcs(self):
+        """
+        Add an '_auto_ivc' component providing a source for every unconnected input.
+        Returns
+        -------
+        bool
+            True if an '_auto_ivc' component was added.
+        """
+        from om_lite.core.indepvarcomp import IndepVarComp
+
+        conns = self._conn_global_abs_in2out
+        abs2meta = self._var_allprocs_abs2meta['input']
+        self._auto_ivc_conns = auto_conns = {}
+
+        auto_ivc = IndepVarComp()
+        auto_ivc._problem_meta = self._problem_meta
+        auto_outputs = []
+
+        for prom, abs_ins in self._var_allprocs_prom2abs_list['input'].items():
+            unconnected = [n for n in abs_ins if n not in conns]
+            if not unconnected:
+                continue
+
+            meta = abs2meta[unconnected[0]]
+            val = meta['val']
+            if meta['has_src_indices']:
+                src_indices = meta['src_indices']
+                if isinstance(src_indices, tuple):
+                    val = np.zeros(tuple(np.max(idx) + 1 for idx in src_indices))
+                else:
+                    val = np.zeros(np.max(src_indices) + 1)
+                val[src_indices] = meta['val'].reshape(val[src_indices].shape)
+
+            src = 'v{}'.format(len(auto_outputs))
+            auto_outputs.append((src, val, meta['units']))
+            for abs_in in unconnected:
+                auto_conns[abs_in] = '_auto_ivc.' + src
+
+        if not auto_outputs:
+            return False
+
+        auto_ivc._indep_external = [(name, val, {'units': units})
+                                    for name, val, units in auto_outputs]
+        auto_ivc.name = '_auto_ivc'
+        auto_ivc._var_promotes = {'any': [], 'input': [], 'output': []}
+        auto_ivc._var_promotes_src_indices = {}
+
+        self._subsystems_allprocs = dict([('_auto_ivc', auto_ivc)] +
+                                         list(self._subsystems_allprocs.items()))
+        self._proc_info['_auto_ivc'] = (1, None, 1.0)
+        auto_ivc._setup_procs('_auto_ivc', self.comm, self._mode, self._problem_meta)
+
+        return True
+
+    def _setup_procs(self, pathname, comm, mode, prob_meta):
+        super()._setup_procs(pathname, comm, mode, prob_meta)
+
+        self._subsystems_allprocs = dict(self._static_subsystems_allprocs)
+        self._manual_connections = dict(self._static_manual_connections)
+        self._proc_info = dict(self._static_proc_info)
+        self._auto_ivc_conns = {}
+
+        self.setup()
+
+        for subname, subsys in self._subsystems_allprocs.items():
+            subpath = self.pathname + '.' + subname if self.pathname else subname
+            subsys._setup_procs(subpath, comm, mode, prob_meta)
+
+    def _setup_var_data(self):
+        super()._setup_var_data()
+        abs2meta = self._var_allprocs_abs2meta
+        prom2abs = self._var_allprocs_prom2abs_list
+        abs2prom = self._var_allprocs_abs2prom
+
+        for subname, subsys in self._subsystems_allprocs.items():
+            subsys._setup_var_data()
+            promotes = subsys._var_promotes
+
+            for io in ('input', 'output'):
+                patterns = promotes['any'] + promotes[io]
+                abs2meta[io].update(subsys._var_allprocs_abs2meta[io])
+
+                for abs_name, sub_prom in subsys._var_allprocs_abs2prom[io].items():
+                    prom = match_prom_or_alias(sub_prom, patterns)
+                    if prom is None:
+                        prom = subname + '.' + sub_prom
+
+                    abs2prom[io][abs_name] = prom
+                    if prom in prom2abs[io]:
+                        if io == 'output':
+                            raise RuntimeError(
+                                "{}: Output name '{}' refers to multiple outputs: "
+                                "{}.".format(self.msginfo, prom,
+                                             sorted([prom2abs[io][prom][0], abs_name])))
+                        prom2abs[io][prom].append(abs_name)
+                    else:
+                        prom2abs[io][prom] = [abs_name]
+
+            for name, (src_indices, flat) in subsys._var_promotes_src_indices.items():
+                for abs_name in subsys._var_allprocs_prom2abs_list['input'][name]:
+                    meta = abs2meta['input'][abs_name]
+                    meta['src_indices'] = _as_src_indices(src_indices)
+                    meta['flat_src_indices'] = flat
+                    meta['has_src_indices'] = True
+
+    def _setup_connections(self):
+        super()._setup_connections()
+        global_conns = self._conn_global_abs_in2out
+        prom2abs = self._var_allprocs_prom2abs_list
+        abs2meta = self._var_allprocs_abs2meta
+
+        for subsys in self._subsystems_allprocs.values():
+            subsys._setup_connections()
+            global_conns.update(subsys._conn_global_abs_in2out)
+
+        # implicit connections, made by promoting an input and an output to the same name
+        self._conn_abs_in2out = conns = {}
+        for prom, abs_ins in prom2abs['input'].items():
+            if prom in prom2abs['output']:
+                src = prom2abs['output'][prom][0]
+                for abs_in in abs_ins:
+                    if abs_in not in global_conns:
+                        conns[abs_in] = src
+
+        for tgt_prom, (src_prom, src_indices, flat) in self._manual_connections.items():
+            if src_prom not in prom2abs['output']:
+                raise NameError(
+                    "{}: Attempted to connect from '{}' to '{}', but '{}' doesn't "
+                    "exist.".format(self.msginfo, src_prom, tgt_prom, src_prom))
+            if tgt_prom not in prom2abs['input']:
+                raise NameError(
+                    "{}: Attempted to connect from '{}' to '{}', but '{}' doesn't "
+                    "exist.".format(self.msginfo, src_prom, tgt_prom, tgt_prom))
+
+            src = prom2abs['output'][src_prom][0]
+            for abs_in in prom2abs['input'][tgt_prom]:
+                if abs_in in global_conns or abs_in in conns:
+                    raise RuntimeError(
+                        "{}: Input '{}' is already connected to '{}'.".format(
+                            self.msginfo, abs_in,
+                            global_conns.get(abs_in, conns.get(abs_in))))
+                conns[abs_in] = src
+                if src_indices is not None:
+                    meta = abs2meta['input'][abs_in]
+                    meta['src_indices'] = _as_src_indices(src_indices)
+                    meta['flat_src_indices'] = flat
+                    meta['has_src_indices'] = True
+
+        conns.update(self._auto_ivc_conns)
+        global_conns.update(conns)
+
+    def _setup_src_indices(self):
+        """
+        Convert the src_indices of every connected input to flat indices into its source.
+        """
+        abs2meta = self._var_allprocs_abs2meta
+        for abs_in, abs_out in self._conn_global_abs_in2out.items():
+            meta = abs2meta['input'][abs_in]
+            if meta['has_src_indices']:
+                meta['src_indices'] = _flatten_src_indices(
+                    abs_in, meta['src_indices'], meta['flat_src_indices'],
+                    abs2meta['output'][abs_out]['shape'], meta['size'])
+                meta['flat_src_indices'] = True
+
+    def _setup_global_connections(self, conns):
+        """
+        Give this group and its subgroups every connection between their own variables.
+        A connection is transferred by the lowest group containing both of its ends, whichever
+        group declared it, so a connection made from an ancestor still runs inside the group.
+        Parameters
+        ----------
+        conns : dict
+            Source of each connected input, for the connections of the parent group.
+        """
+        if self.pathname:
+            prefix = self.pathname + '.'
+            conns = {abs_in: abs_out for abs_in, abs_out in conns.items()
+                     if abs_in.startswith(prefix) and abs_out.startswith(prefix)}
+        self._conn_global_abs_in2out.update(conns)
+
+        self._setup_transfers()
+        self._setup_graph()
+
+        for subsys in self._subsystems_allprocs.values():
+            if isinstance(subsys, Group):
+                subsys._setup_global_connections(conns)
+
+    def _setup_graph(self):
+        """
+        Compute the execution order of the subsystems from their data dependencies.
+        """
+        plen = len(self.pathname) + 1 if self.pathname else 0
+        names = list(self._subsystems_allprocs)
+        self._subsystems_graph = graph = {name: set() for name in names}
+
+        for abs_in, abs_out in self._conn_global_abs_in2out.items():
+            if plen and not (abs_in.startswith(self.pathname + '.') and
+                             abs_out.startswith(self.pathname + '.')):
+                continue
+            tgt = abs_in[plen:].split('.', 1)[0]
+            src = abs_out[plen:].split('.', 1)[0]
+            if src != tgt:
+                graph[src].add(tgt)
+
+        self._sccs = get_sccs_topo(names, graph)
+
+        if any(len(scc) > 1 for scc in self._sccs):
+            self._cycle_solver = NonlinearBlockGS(maxiter=100, iprint=0)
+        else:
+            self._cycle_solver = None
+
+    def get_cycles(self):
+        """
+        Return the groups of subsystems that are coupled through a dependency cycle.
+        Returns
+        -------
+        list of list of str
+            Names of the subsystems in each cycle, in execution order.
+        """
+        return [scc for scc in self._sccs if len(scc) > 1]
+
+    def _setup_solvers(self, depth=0):
+        super()._setup_solvers(depth)
+        if self._cycle_solver is not None:
+            self._cycle_solver._setup_solvers(self, depth)
+
+    def _setup_transfers(self):
+        """
+        Sort the connections between subsystems of this group by the subsystem owning the target.
+        Connections within one subgroup are left to it. The unit conversion of each connection is
+        computed here, once, as a scale and offset with input = (output + offset) * scale.
+        """
+        plen = len(self.pathname) + 1 if self.pathname else 0
+        subsystems = self._subsystems_allprocs
+        self._transfers = transfers = {name: [] for name in subsystems}
+        abs2meta = self._var_allprocs_abs2meta['input']
+        out_meta = self._var_allprocs_abs2meta['output']
+
+        for abs_in, abs_out in self._conn_global_abs_in2out.items():
+            subname = abs_in[plen:].split('.', 1)[0]
+            if subname == abs_out[plen:].split('.', 1)[0] and \
+                    isinstance(subsystems[subname], Group):
+                continue
+            meta = abs2meta[abs_in]
+            src_indices = meta['src_indices'] if meta['has_src_indices'] else None
+            try:
+                scale, offset = _connection_factors(out_meta[abs_out]['units'], meta['units'])
+            except TypeError:
+                raise TypeError("{}: Output '{}' with units of '{}' is connected to input '{}' "
+                                "which has units '{}', which are incompatible.".format(
+                                    self.msginfo, abs_out, out_meta[abs_out]['units'], abs_in,
+                                    meta['units']))
+            transfers[subname].append((abs_in, abs_out, src_indices, scale, offset))
+
+    def _setup_vectors(self, root_vectors):
+        super()._setup_vectors(root_vectors)
+
+        in_slices = self._inputs._slices
+        out_slices = self._outputs._slices
+        self._transfer_data = {
+            subname: _compile_transfers(conns, in_slices, out_slices)
+            for subname, conns in self._transfers.items() if conns}
+        all_conns = [conn for conns in self._transfers.values() for conn in conns]
+        if all_conns:
+            self._transfer_data[None] = _compile_transfers(all_conns, in_slices, out_slices)
+
+    def _transfer(self, subname):
+        """
+        Copy connected output values into the inputs of one subsystem.
+        Parameters
+        ----------
+        subname : str or None
+            Name of the subsystem whose inputs are set, None for all subsystems.
+        """
+        data = self._transfer_data.get(subname)
+        if data is None:
+            return
+
+        val = np.take(self._outputs._data, data['out_idx'])
+        if data['offset'] is not None:
+            val += data['offset']
+        if data['scale'] is not None:
+            val *= data['scale']
+        self._inputs._data[data['in_idx']] = val
+
+    def _transfer_batch(self, subname, vectors, npts):
+        """
+        Copy connected output values into the inputs of one subsystem at every point of a batch.
+        Parameters
+        ----------
+        subname : str or None
+            Name of the subsystem whose inputs are set, None for all subsystems.
+        vectors : dict of Vector
+            Batched 'input' and 'output' vectors of this group.
+        npts : int
+            Number of points in the batch.
+        """
+        data = self._transfer_data.get(subname)
+        if data is None:
+            return
+
+        # a variable of size n starting at s is stored as an (npts, n) block starting at s * npts
+        pts = np.arange(npts)[:, None]
+        in_var_start, in_var_size, in_pos = data['in_var']
+        out_var_start, out_var_size, out_pos = data['out_var']
+        val = np.take(vectors['output'].asarray(),
+                      out_var_start * npts + pts * out_var_size + out_pos)
+        if data['offset'] is not None:
+            val += data['offset']
+        if data['scale'] is not None:
+            val *= data['scale']
+        vectors['input'].asarray()[in_var_start * npts + pts * in_var_size + in_pos] = val
+
+    def _transfer_linear(self, subname, mode):
+        """
+        Transfer derivatives between connected outputs and the inputs of one subsystem.
+        Parameters
+        ----------
+        subname : str or None
+            Name of the subsystem whose inputs are connected, None for all subsystems.
+        mode : str
+            In 'fwd' mode output derivatives are copied into the inputs, in 'rev' mode input
+            derivatives are added back into their source outputs. Both are multiplied by the
+            scale of the unit conversion, the offset has no derivative.
+        """
+        data = self._transfer_data.get(subname)
+        if data is None:
+            return
+
+        d_inputs = self._dinputs._data
+        d_outputs = self._doutputs._data
+        if mode == 'fwd':
+            val = np.take(d_outputs, data['out_idx'])
+            if data['scale'] is not None:
+                val *= data['scale']
+            d_inputs[data['in_idx']] = val
+            return
+
+        # a slice gathers a view of the input derivatives, which must not be scaled in place
+        val = d_inputs[data['in_idx']]
+        if data['scale'] is not None:
+            val = val * data['scale']
+        out_uniq, out_inv = data['out_uniq']
+        if out_inv is None:
+            d_outputs[out_uniq] += val
+        else:
+            d_outputs[out_uniq] += np.bincount(out_inv, weights=val, minlength=out_uniq.size)
+
+    def _apply_linear(self, mode):
+        subsystems = self._subsystems_allprocs
+        if mode == 'fwd':
+            for name, subsys in subsystems.items():
+                self._transfer_linear(name, mode)
+                subsys._apply_linear(mode)
+        else:
+            for name, subsys in subsystems.items():
+                subsys._apply_linear(mode)
+            self._transfer_linear(None, mode)
+
+    def _solve_nonlinear(self):
+        if self._nonlinear_solver is not None:
+            self._nonlinear_solver.solve()
+            return
+
+        subsystems = self._subsystems_allprocs
+        for scc in self._sccs:
+            if len(scc) == 1:
+                self._transfer(scc[0])
+                subsystems[scc[0]].run_solve_nonlinear()
+            else:
+                self._cycle_solver.solve(scc)
+
+    def _solve_nonlinear_incremental(self, changed, dirty, skipped):
+        # groups converged by a solver are run as a whole
+        if self._nonlinear_solver is not None or self._cycle_solver is not None:
+            super()._solve_nonlinear_incremental(changed, dirty, skipped)
+            return
+
+        subsystems = self._subsystems_allprocs
+        for scc in self._sccs:
+            subsys = subsystems[scc[0]]
+            if subsys._needs_rerun(changed, dirty):
+                self._transfer(scc[0])
+                subsys._solve_nonlinear_incremental(changed, dirty, skipped)
+            else:
+                skipped.extend(s.pathname for s in
+                               subsys.system_iter(include_self=True, typ=Component))
+
+    def _solve_nonlinear_batch(self, vectors, npts):
+        # groups converged by a solver run one point at a time
+        if self._nonlinear_solver is not None or self._cycle_solver is not None:
+            super()._solve_nonlinear_batch(vectors, npts)
+            return
+
+        subsystems = self._subsystems_allprocs
+        for scc in self._sccs:
+            subsys = subsystems[scc[0]]
+            self._transfer_batch(scc[0], vectors, npts)
+            subsys._solve_nonlinear_batch(
+                {kind: vec._get_subvector(subsys.pathname) for kind, vec in vectors.items()},
+                npts)
+
+    def _linearize(self, sub_do_ln=True):
+        for scc in self._sccs:
+            for name in scc:
+                self._subsystems_allprocs[name]._linearize()
+
+        super()._linearize(sub_do_ln)
+
+    def _apply_nonlinear(self):
+        for scc in self._sccs:
+            for name in scc:
+                self._transfer(name)
+                self._subsystems_allprocs[name]._apply_nonlinear()
+
+    def _show_ambiguity_msg(self, name, tup, abs_ins):
+        """
+        Raise an error about a promoted input whose connected inputs disagree.
+        Parameters
+        ----------
+        name : str
+            Promoted input name.
+        tup : tuple of str
+            Names of the metadata that disagree.
+        abs_ins : list of str
+            Absolute names of the connected inputs.
+        """
+        raise RuntimeError(
+            "{}: The following inputs, {}, promoted to '{}', are connected but their "
+            "metadata entries {} differ. Call <group>.set_input_defaults('{}', ...) to "
+            "remove the ambiguity.".format(self.msginfo, sorted(abs_ins), name,
+                                           list(tup), name))
+
     def promotes(self,
                  subsys_name,
                  any=None,
@@ -16,7 +496,18 @@ class Group(System):
                  src_indices=None,
                  flat_src_indices=None,
                  src_shape=None):
-        pass
+        if self._static_mode:
+            subsystems = self._static_subsystems_allprocs
+        else:
+            subsystems = self._subsystems_allprocs
+
+        try:
+            subsys = subsystems[subsys_name]
+        except KeyError:
+            raise RuntimeError("{}: subsystem '{}' does not exist.".format(
+                self.msginfo, subsys_name))
+
+        subsys._add_promotes(any, inputs, outputs, src_indices, flat_src_indices)
 
     def add_subsystem(self,
                       name,
@@ -27,11 +518,118 @@ class Group(System):
                       min_procs=1,
                       max_procs=None,
                       proc_weight=1.0):
-        self.name = subsys
+        if self._static_mode:
+            subsystems = self._static_subsystems_allprocs
+            proc_info = self._static_proc_info
+        else:
+            subsystems = self._subsystems_allprocs
+            proc_info = self._proc_info
+
+        if name in subsystems:
+            raise RuntimeError("{}: Subsystem name '{}' is already used.".format(
+                self.msginfo, name))
+
+        subsys.name = name
+        subsys._var_promotes = {'any': [], 'input': [], 'output': []}
+        subsys._var_promotes_src_indices = {}
+        subsys._add_promotes(promotes, promotes_inputs, promotes_outputs)
+
+        subsystems[name] = subsys
+        proc_info[name] = (min_procs, max_procs, proc_weight)
+
+        return subsys
 
     def connect(self,
                 src_name,
                 tgt_name,
                 src_indices=None,
                 flat_src_indices=None):
-        pass
+        if isinstance(tgt_name, (list, tuple)):
+            for name in tgt_name:
+                self.connect(src_name, name, src_indices, flat_src_indices)
+            return
+
+        if self._static_mode:
+            manual_connections = self._static_manual_connections
+        else:
+            manual_connections = self._manual_connections
+
+        if tgt_name in manual_connections:
+            raise RuntimeError(
+                "{}: Input '{}' is already connected to '{}'.".format(
+                    self.msginfo, tgt_name, manual_connections[tgt_name][0]))
+
+        manual_connections[tgt_name] = (src_name, src_indices, flat_src_indices)
+
+
+def _compile_transfers(conns, in_slices, out_slices):
+    """
+    Compile connections into gather indices of the flat input and output vectors of a group.
+    Parameters
+    ----------
+    conns : list of tuple
+        (abs_in, abs_out, src_indices, scale, offset) of each connection.
+    in_slices : dict
+        Location of each input in the group input vector.
+    out_slices : dict
+        Location of each output in the group output vector.
+    Returns
+    -------
+    dict
+        'in_idx' and 'out_idx', the input entries and the output entries they are copied from,
+        'scale' and 'offset' of the unit conversion of each entry (None if not needed),
+        'out_uniq', the distinct output entries and the position of each entry among them
+        (None if all are distinct), and 'in_var' and 'out_var', the start and size of the
+        variable of each entry and the position of the entry in it.
+    """
+    in_idx = []
+    out_idx = []
+    scales = []
+    offsets = []
+    in_var = ([], [], [])
+    out_var = ([], [], [])
+    for abs_in, abs_out, src_indices, scale, offset in conns:
+        in_slc = in_slices[abs_in]
+        out_slc = out_slices[abs_out]
+        size = in_slc.stop - in_slc.start
+        pos = np.arange(size, dtype=int)
+        src_pos = pos if src_indices is None else np.asarray(src_indices, dtype=int).ravel()
+
+        in_idx.append(in_slc.start + pos)
+        out_idx.append(out_slc.start + src_pos)
+        scales.append(np.full(size, scale))
+        offsets.append(np.full(size, offset))
+        for var, slc, p in ((in_var, in_slc, pos), (out_var, out_slc, src_pos)):
+            var[0].append(np.full(size, slc.start, dtype=int))
+            var[1].append(np.full(size, slc.stop - slc.start, dtype=int))
+            var[2].append(p)
+
+    in_idx = np.concatenate(in_idx)
+    out_idx = np.concatenate(out_idx)
+    scale = np.concatenate(scales)
+    offset = np.concatenate(offsets)
+    in_var = tuple(np.concatenate(a) for a in in_var)
+    out_var = tuple(np.concatenate(a) for a in out_var)
+
+    # a contiguous run of inputs is written through a slice instead of fancy indexing
+    order = np.argsort(in_idx, kind='stable')
+    in_idx = in_idx[order]
+    if in_idx.size and in_idx[-1] - in_idx[0] + 1 == in_idx.size:
+        in_dst = slice(int(in_idx[0]), int(in_idx[-1]) + 1)
+    else:
+        in_dst = in_idx
+
+    out_idx = out_idx[order]
+    out_uniq, out_inv = np.unique(out_idx, return_inverse=True)
+    if out_uniq.size == out_idx.size:
+        out_uniq, out_inv = out_idx, None
+
+    return {
+        'in_idx': in_dst,
+        'out_idx': out_idx,
+        'scale': None if np.all(scale == 1.0) else scale[order],
+        'offset': None if np.all(offset == 0.0) else offset[order],
+        'out_uniq': (out_uniq, out_inv),
+        'in_var': tuple(a[order] for a in in_var),
+        'out_var': tuple(a[order] for a in out_var),
+    }
@@ -1,4 +1,9 @@
+import numpy as np
+from scipy.sparse import coo_matrix, csc_matrix, issparse
+from scipy.sparse.linalg import splu
+
 import om_lite.api as om
+from om_lite.core.vector import Vector
 
 # from atomics.api import PDEProblem, AtomicsGroup
 
@@ -14,12 +19,17 @@ from atomics.field_output_comp import FieldOutputsComp
 
 class HyperElasticModel(object):
     def setup(self, num_dof_density, density_function_space, pde_problem):
-        self.inputs = {}
-        self.outputs = {}
+        # every component views the same flat input/output buffers (promotes all)
+        self.inputs = Vector('input')
+        self.outputs = Vector('output')
         self.partials = {}
-        self.residuals = {}
+        self.residuals = Vector('residual')
         self.ex_components_list = []  # does not include IndepVarComp
 
+        # objective first, then constraints; all share one adjoint factorization
+        self.response_names = ['compliance', 'avg_density']
+        self._state_lu = None
+
         self.x = om.IndepVarComp()
         self.x.outputs = self.outputs
         self.x.add_output(
@@ -29,10 +39,11 @@ class HyperElasticModel(object):
             # val=x_val,
             # val=np.random.random(num_dof_density) * 0.86,
         )
+        self.x.setup()
 
         self.density_filter = GeneralFilterComp(
             density_function_space=density_function_space)
-        self.ex_components_list.append(density_filter)
+        self.ex_components_list.append(self.density_filter)
         # density_filter.setup()
 
         # group = AtomicsGroup(pde_problem=pde_problem)
@@ -42,7 +53,7 @@ class HyperElasticModel(object):
             pde_problem=pde_problem,
             scalar_output_name='avg_density',
         )
-        self.ex_components_list.append(c)
+        self.ex_components_list.append(self.c)
         # c.setup()
 
         self.y = FieldOutputsComp(
@@ -56,7 +67,7 @@ class HyperElasticModel(object):
             pde_problem=pde_problem,
             scalar_output_name='compliance',
         )
-        self.ex_components_list.append(f)
+        self.ex_components_list.append(self.f)
         # f.setup()
 
         # Setup (Note: Promotes all)
@@ -69,15 +80,146 @@ class HyperElasticModel(object):
         self.y.inputs = self.inputs
         self.y.outputs = self.outputs
         self.y.partials = self.partials
+        self.y.residuals = self.residuals
         self.y.setup()
 
-    def run(self, x_val=None, y_val=None, psi=None, tol=None):
-        # self.x.set_value()
-        # self.res.warm_start(y)
+        self.inputs._allocate()
+        self.outputs._allocate()
+        self.residuals._allocate()
+
+        # inputs promoted to the same name as an output are connected to it
+        in_idx = []
+        out_idx = []
+        for name in self.inputs:
+            if name in self.outputs:
+                in_slice = self.inputs._slices[name]
+                out_slice = self.outputs._slices[name]
+                in_idx.append(np.arange(in_slice.start, in_slice.stop))
+                out_idx.append(np.arange(out_slice.start, out_slice.stop))
+        self._in_idx = np.concatenate(in_idx) if in_idx else np.zeros(0, dtype=int)
+        self._out_idx = np.concatenate(out_idx) if out_idx else np.zeros(0, dtype=int)
+
+    def _transfer(self):
+        self.inputs.asarray()[self._in_idx] = self.outputs.asarray()[self._out_idx]
+
+    def _get_sparse_partial(self, of, wrt):
+        """
+        Return a declared partial as a sparse matrix, or None if it was not declared.
+        """
+        partials = self.partials
+        if (of, wrt) not in partials:
+            return None
+
+        shape = (self.outputs[of].size,
+                 self.outputs[wrt].size if wrt in self.outputs else self.inputs[wrt].size)
+        if (of, wrt, 'coo') in partials:
+            rows, cols = partials[of, wrt, 'coo']
+            return coo_matrix((np.ravel(partials[of, wrt]), (rows, cols)),
+                              shape=shape).tocsc()
+
+        val = partials[of, wrt]
+        if issparse(val):
+            return val.tocsc()
+        return csc_matrix(np.reshape(val, shape))
+
+    def _factorize_state_jacobian(self):
+        """
+        Sparse LU of pR/py, computed once per linearization and reused by all adjoint solves.
+        """
+        self._state_lu = splu(
+            self._get_sparse_partial('displacements', 'displacements'))
+
+    def solve_adjoint(self, response_names=None):
+        """
+        Return the total derivatives of the responses wrt density_unfiltered.
+        Parameters
+        ----------
+        response_names : list of str or None
+            Responses to differentiate, defaults to self.response_names.
+        Returns
+        -------
+        dict
+            Maps each response name to its (df_dx, psi) pair, psi is None for responses that
+            do not depend on the displacements.
+        ndarray
+            pR/px, the residual partials chained through the density filter (sparse).
+        """
+        if response_names is None:
+            response_names = self.response_names
+
+        # pR_px = partials['R', 'x1'] @ partials['x1', 'x']
+        dfilter = self._get_sparse_partial('density', 'density_unfiltered')
+        pR_px1 = self._get_sparse_partial('displacements', 'density')
+        pR_px = pR_px1 @ dfilter
+
+        # one multi-RHS adjoint solve for every response that depends on the state
+        coupled = []
+        rhs = []
+        for name in response_names:
+            pf_py = self._get_sparse_partial(name, 'displacements')
+            if pf_py is not None:
+                coupled.append(name)
+                rhs.append(pf_py.toarray())
+
+        psis = {}
+        if coupled:
+            # psi = np.linalg.solve(partials['R', 'y'].T, partials['f', 'y'].T)
+            psi = self._state_lu.solve(np.vstack(rhs).T, trans='T')
+            for i, name in enumerate(coupled):
+                psis[name] = psi[:, i]
+
+        totals = {}
+        for name in response_names:
+            # df_dx = (partials['f', 'x1'] - psi @ partials['R', 'x1']) @ partials['x1', 'x']
+            pf_px1 = self._get_sparse_partial(name, 'density')
+            if pf_px1 is None:
+                # the response only depends on the density through the state
+                df_dx1 = np.zeros(pR_px1.shape[1])
+            else:
+                df_dx1 = pf_px1.toarray().ravel()
+            psi = psis.get(name)
+            if psi is not None:
+                df_dx1 = df_dx1 - pR_px1.T @ psi
+            totals[name] = (dfilter.T @ df_dx1, psi)
+
+        return totals, pR_px
 
+    def run(self, x_val=None, y_val=None, psi=None, tol=None):
+        """
+        Evaluate the model and the partials needed by the caller's adjoint total.
+        df_dx and dc_dx are the explicit partials chained through the density filter, the total
+        derivative of the compliance being df_dx - psi @ pR_px. Use solve_adjoint for the
+        totals themselves.
+        Returns
+        -------
+        ndarray
+            The compliance.
+        ndarray
+            Explicit partial of the compliance wrt density_unfiltered, shape (1, n).
+        ndarray
+            The average density.
+        ndarray
+            Derivative of the average density wrt density_unfiltered, shape (1, n).
+        ndarray
+            Adjoint vector of the compliance.
+        ndarray
+            pR/px, the residual partials chained through the density filter (dense).
+        """
+        inputs = self.inputs
+        outputs = self.outputs
+        partials = self.partials
+
+        if x_val is not None:
+            outputs['density_unfiltered'] = x_val
+        if y_val is not None:
+            # warm start of the state
+            outputs['displacements'] = y_val
+
+        self._transfer()
         self.density_filter.compute(inputs, outputs)
         self.density_filter.compute_partials(inputs, outputs, partials)
 
+        self._transfer()
         self.c.compute(inputs, outputs)
         self.c.compute_partials(inputs, outputs, partials)
 
@@ -87,28 +229,20 @@ class HyperElasticModel(object):
             # solve_nonlinear is different from OM
             self.y.solve_nonlinear(inputs, outputs, tol)
 
-        y.linearize(inputs, outputs, partials)
+        self.y.linearize(inputs, outputs, partials)
+        self._factorize_state_jacobian()
 
-        f.compute(inputs, outputs)
-        f.compute_partials(inputs, outputs, partials)
+        self._transfer()
+        self.f.compute(inputs, outputs)
+        self.f.compute_partials(inputs, outputs, partials)
 
-        # Adjoint vector
-        # psi = np.linalg.solve(partials['R', 'y'].T, partials['f', 'y'].T)
-        psi = np.linalg.solve(partials['displacements', 'displacements'].T,
-                              partials['compliance', 'displacements'])
+        totals, pR_px = self.solve_adjoint()
+        psi = totals['compliance'][1]
 
-        # df_dx1 = psi @ partials['R', 'x1']
-        df_dx1 = psi @ partials['displacements', 'density']
-
-        # Chain rule
-        # dc_dx = partials['c', 'x1'] @ partials['x1', 'x']
-        dc_dx = partials['avg_density',
-                         'density'] @ partials['density', 'density_unfiltered']
-        # df_dx = partials['f', 'x1'] @ partials['x1', 'x']
-        df_dx = partials['compliance',
-                         'density'] @ partials['density', 'density_unfiltered']
-        # pR_px = partials['R', 'x1'] @ partials['x1', 'x']
-        pR_px = partials['displacements',
-                         'density'] @ partials['density', 'density_unfiltered']
+        # df_dx = partials['f', 'x1'] @ partials['x1', 'x'], without the adjoint term
+        dfilter = self._get_sparse_partial('density', 'density_unfiltered')
+        df_dx = (self._get_sparse_partial('compliance', 'density') @ dfilter).toarray()
+        dc_dx = (self._get_sparse_partial('avg_density', 'density') @ dfilter).toarray()
 
-        return f, df_dx, c, dc_dx, psi, pR_px
+        return (outputs['compliance'], df_dx, outputs['avg_density'], dc_dx, psi,
+                pR_px.toarray())
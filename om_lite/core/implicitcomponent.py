@@ -7,20 +7,93 @@ class ImplicitComponent(Component):
         self.initialize()
         self.options.update(kwargs)
 
-    def apply_nonlinear(self):
-        pass
+    def _solve_nonlinear(self):
+        if self._nonlinear_solver is not None:
+            self._nonlinear_solver.solve()
+        else:
+            self.solve_nonlinear(self.inputs, self.outputs)
 
-    def solve_nonlinear(self):
-        pass
+    def _solve_nonlinear_batch(self, vectors, npts):
+        if self.options['supports_batch'] and self._nonlinear_solver is None:
+            self.solve_nonlinear(vectors['input'], vectors['output'])
+        else:
+            super()._solve_nonlinear_batch(vectors, npts)
+
+    def _apply_nonlinear(self):
+        self.apply_nonlinear(self.inputs, self.outputs, self.residuals)
+
+    def _linearize(self, sub_do_ln=True):
+        self.linearize(self.inputs, self.outputs, self.partials)
+        self._compute_approx_partials()
+        if self._assembled_jac is not None:
+            self._assembled_jac._update(self)
+
+        super()._linearize(sub_do_ln)
 
-    def guess_nonlinear(self):
+    def apply_nonlinear(self, inputs, outputs, residuals):
         pass
 
-    def apply_linear(self):
+    def solve_nonlinear(self, inputs, outputs):
         pass
 
-    def solve_linear(self):
+    def guess_nonlinear(self, inputs, outputs, residuals):
         pass
 
-    def linearize(self):
-        pass
\ No newline at end of file
+    def _run_approx(self, inputs, outputs, residuals):
+        vals = residuals.asarray()
+        saved = vals.copy()
+        self.apply_nonlinear(inputs, outputs, residuals)
+        results = vals.copy()
+        vals[:] = saved
+        return results
+
+    def _apply_linear(self, mode):
+        if mode == 'fwd':
+            self._dresiduals.asarray()[:] = 0.0
+        self.apply_linear(self.inputs, self.outputs, self._dinputs, self._doutputs,
+                          self._dresiduals, mode)
+
+    def apply_linear(self, inputs, outputs, d_inputs, d_outputs, d_residuals, mode):
+        """
+        Compute a product with the partials of the residuals.
+        In 'fwd' mode d_residuals += dR/di d_inputs + dR/do d_outputs, in 'rev' mode the
+        transposed partials times d_residuals are added to d_inputs and d_outputs. The default
+        uses the partials from linearize. Override it to avoid forming them.
+        Parameters
+        ----------
+        inputs : Vector
+            Unscaled input values.
+        outputs : Vector
+            Unscaled output values.
+        d_inputs : Vector
+            Input derivatives.
+        d_outputs : Vector
+            Output derivatives.
+        d_residuals : Vector
+            Residual derivatives.
+        mode : str
+            'fwd' or 'rev'.
+        """
+        self._apply_partials(d_inputs, d_outputs, d_residuals, mode)
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        """
+        Apply the inverse of dR/do, used when this component is a block of a preconditioner.
+        In 'fwd' mode d_outputs is set from d_residuals, in 'rev' mode d_residuals is set from
+        d_outputs. The default is the identity.
+        Parameters
+        ----------
+        d_outputs : Vector
+            Output derivatives.
+        d_residuals : Vector
+            Residual derivatives.
+        mode : str
+            'fwd' or 'rev'.
+        """
+        if mode == 'fwd':
+            d_outputs.asarray()[:] = d_residuals.asarray()
+        else:
+            d_residuals.asarray()[:] = d_outputs.asarray()
+
+    def linearize(self, inputs, outputs, partials):
+        pass
@@ -3,11 +3,35 @@ from om_lite.core.explicitcomponent import ExplicitComponent
 
 class IndepVarComp(ExplicitComponent):
     def __init__(self, name=None, val=1.0, **kwargs):
-        super().__init__(**kwargs)
+        # outputs declared outside of setup, replayed by every setup
+        self._indep_external = []
+
+        super().__init__()
+
+        if name is not None:
+            self.add_output(name, val, **kwargs)
 
     def initialize(self):
         pass
 
+    def setup(self):
+        for name, val, kwargs in self._indep_external:
+            super().add_output(name, val, **kwargs)
+
+    def compute(self, inputs, outputs):
+        pass
+
+    def _solve_nonlinear_incremental(self, changed, dirty, skipped):
+        # only the outputs that were set changed
+        changed.update(dirty.intersection(self._outputs._abs2meta))
+
+    def _solve_nonlinear_batch(self, vectors, npts):
+        # the batched outputs already hold the values of every point
+        pass
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
     def add_output(self,
                    name,
                    val=1.0,
@@ -24,4 +48,15 @@ class IndepVarComp(ExplicitComponent):
                    shape_by_conn=False,
                    copy_shape=None,
                    distributed=None):
-        pass
\ No newline at end of file
+        kwargs = {
+            'shape': shape,
+            'units': units,
+            'res_units': res_units,
+            'desc': desc,
+            'lower': lower,
+            'upper': upper,
+        }
+        if self._static_mode:
+            self._indep_external.append((name, val, kwargs))
+        else:
+            return super().add_output(name, val, **kwargs)
@@ -0,0 +1,239 @@
+"""Define the AssembledJacobian class."""
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
+from om_lite.core.units import _connection_factors
+
+
+class AssembledJacobian(object):
+    """
+    Sparse Jacobian of all model residuals with respect to all model outputs.
+    Every explicit output o = f(i) is treated as the residual o - f(i), and a partial with respect
+    to an input is placed in the column of the output connected to that input. The sparsity
+    pattern is computed once from the declared partials, along with the location in the matrix
+    data array of every entry of every (of, wrt) block, so an update only scatters new values.
+    Attributes
+    ----------
+    _system : System
+        The model this Jacobian belongs to.
+    _matrix_type : str
+        'csc' or 'csr'.
+    _shape : tuple
+        Shape of the matrix, (number of outputs, number of outputs).
+    _subjacs : dict
+        For each component pathname, a list of (of, wrt, start, end, factor) tuples giving the
+        location of the block values in the unsorted COO data and the factor they are multiplied
+        by, the sign of the residual times the unit conversion scale of a connected input.
+    _coo2data : ndarray of int
+        Position in the matrix data array of each COO entry.
+    _coo_data : ndarray or None
+        COO values, only kept when several COO entries sum into one matrix entry.
+    _mtx : csc_matrix or csr_matrix
+        The assembled matrix. Its data array is updated in place.
+    _dirty : bool
+        True if _coo_data has changed since it was last summed into the matrix.
+    """
+
+    def __init__(self, system, matrix_type='csc'):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        system : System
+            The model this Jacobian belongs to.
+        matrix_type : str
+            'csc' or 'csr'.
+        """
+        self._system = system
+        self._matrix_type = matrix_type
+        self._subjacs = {}
+        self._coo_data = None
+        self._mtx = None
+        self._dirty = False
+
+        self._build()
+
+    def _get_block_pattern(self, comp, of, wrt):
+        """
+        Return the global rows and columns of one declared partial.
+        A partial with respect to an input without a source has no column in the matrix.
+        Parameters
+        ----------
+        comp : Component
+            Component declaring the partial.
+        of : str
+            Relative name of the output.
+        wrt : str
+            Relative name of the input or output.
+        Returns
+        -------
+        ndarray of int
+            Global rows.
+        ndarray of int
+            Global columns.
+        float
+            Factor of the partial, the unit conversion scale of the connection of an input.
+            All three are None for an input without a source.
+        """
+        system = self._system
+        out_slices = system._outputs._slices
+        prefix = comp.pathname + '.' if comp.pathname else ''
+        of_meta = comp._var_rel2meta[of]
+        wrt_meta = comp._var_rel2meta[wrt]
+
+        if (of, wrt, 'coo') in comp.partials:
+            rows, cols = comp.partials[of, wrt, 'coo']
+            rows = np.asarray(rows, dtype=int)
+            cols = np.asarray(cols, dtype=int)
+        else:
+            nrows, ncols = of_meta['size'], wrt_meta['size']
+            rows = np.repeat(np.arange(nrows, dtype=int), ncols)
+            cols = np.tile(np.arange(ncols, dtype=int), nrows)
+
+        rows = rows + out_slices[prefix + of].start
+        scale = 1.0
+
+        abs_wrt = prefix + wrt
+        if wrt in comp._var_rel_names['output']:
+            cols = cols + out_slices[abs_wrt].start
+        else:
+            src = system._conn_global_abs_in2out.get(abs_wrt)
+            if src is None:
+                return None, None, None
+            if wrt_meta['has_src_indices']:
+                cols = wrt_meta['src_indices'][cols]
+            cols = cols + out_slices[src].start
+            # d input / d source is the scale of the unit conversion of the connection
+            scale = _connection_factors(system._var_allprocs_abs2meta['output'][src]['units'],
+                                        wrt_meta['units'])[0]
+
+        return rows, cols, scale
+
+    def _build(self):
+        """
+        Compute the sparsity pattern and the COO to matrix index map.
+        """
+        from om_lite.core.explicitcomponent import ExplicitComponent
+        from om_lite.core.component import Component
+
+        system = self._system
+        out_slices = system._outputs._slices
+        n = system._outputs.asarray().size
+        self._shape = (n, n)
+
+        all_rows = []
+        all_cols = []
+        const_vals = []
+        start = 0
+
+        for comp in system.system_iter(include_self=True, typ=Component):
+            explicit = isinstance(comp, ExplicitComponent)
+            blocks = self._subjacs[comp.pathname] = []
+            prefix = comp.pathname + '.' if comp.pathname else ''
+
+            if explicit:
+                # the identity part of the residual o - f(i)
+                for name in comp._var_rel_names['output']:
+                    slc = out_slices[prefix + name]
+                    diag = np.arange(slc.start, slc.stop, dtype=int)
+                    all_rows.append(diag)
+                    all_cols.append(diag)
+                    const_vals.append((start, start + diag.size))
+                    start += diag.size
+
+            for key in comp.partials:
+                if len(key) != 2:
+                    continue
+                of, wrt = key
+                rows, cols, scale = self._get_block_pattern(comp, of, wrt)
+                if rows is None:
+                    continue
+                all_rows.append(rows)
+                all_cols.append(cols)
+                blocks.append((of, wrt, start, start + rows.size,
+                               -scale if explicit else scale))
+                start += rows.size
+
+        rows = np.concatenate(all_rows) if all_rows else np.zeros(0, dtype=int)
+        cols = np.concatenate(all_cols) if all_cols else np.zeros(0, dtype=int)
+
+        if self._matrix_type == 'csc':
+            keys = cols * n + rows
+        else:
+            keys = rows * n + cols
+
+        uniq, self._coo2data = np.unique(keys, return_inverse=True)
+        nnz = uniq.size
+        major = uniq // n
+        minor = uniq % n
+        indptr = np.zeros(n + 1, dtype=int)
+        np.cumsum(np.bincount(major, minlength=n), out=indptr[1:])
+
+        data = np.zeros(nnz)
+        if self._matrix_type == 'csc':
+            self._mtx = csc_matrix((data, minor, indptr), shape=self._shape)
+        else:
+            self._mtx = csr_matrix((data, minor, indptr), shape=self._shape)
+
+        if nnz < keys.size:
+            self._coo_data = np.zeros(keys.size)
+
+        for s, e in const_vals:
+            self._set_coo(s, e, 1.0)
+
+        for comp in system.system_iter(include_self=True, typ=Component):
+            self._update(comp)
+
+    def _set_coo(self, start, end, vals):
+        if self._coo_data is None:
+            self._mtx.data[self._coo2data[start:end]] = vals
+        else:
+            self._coo_data[start:end] = vals
+
+    def _update(self, comp):
+        """
+        Copy the current partials of a component into the matrix.
+        Parameters
+        ----------
+        comp : Component
+            Component whose compute_partials or linearize has just run.
+        """
+        partials = comp.partials
+        for of, wrt, start, end, factor in self._subjacs[comp.pathname]:
+            vals = np.ravel(partials[of, wrt])
+            self._set_coo(start, end, vals if factor == 1.0 else factor * vals)
+
+        self._dirty = self._coo_data is not None
+
+    def get_matrix(self):
+        """
+        Return the assembled matrix.
+        Returns
+        -------
+        csc_matrix or csr_matrix
+            The Jacobian, its data array is updated in place by _update.
+        """
+        if self._dirty:
+            self._mtx.data[:] = np.bincount(self._coo2data, weights=self._coo_data,
+                                            minlength=self._mtx.data.size)
+            self._dirty = False
+        return self._mtx
+
+    def _matvec(self, vec, transpose=False):
+        """
+        Multiply a vector by the Jacobian or its transpose.
+        Parameters
+        ----------
+        vec : ndarray
+            Flat vector of the size of the output vector.
+        transpose : bool
+            If True, multiply by the transpose.
+        Returns
+        -------
+        ndarray
+            The product.
+        """
+        mtx = self.get_matrix()
+        if transpose:
+            return mtx.T.dot(vec)
+        return mtx.dot(vec)
@@ -0,0 +1,302 @@
+"""Define the linear solvers."""
+import numpy as np
+from scipy.sparse.linalg import LinearOperator, cg, gmres, spilu, splu
+
+from om_lite.core.solver import LinearSolver
+
+
+class DirectSolver(LinearSolver):
+    """
+    Sparse LU factorization of the assembled Jacobian of the owning system.
+    The factorization is computed once per linearization and reused for every right-hand side,
+    in both 'fwd' and 'rev' mode.
+    Attributes
+    ----------
+    _lu : SuperLU or None
+        The factorization of the system block of the assembled Jacobian.
+    """
+
+    SOLVER = 'LN: Direct'
+
+    _requires_assembled_jac = True
+
+    def __init__(self, **kwargs):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        **kwargs : dict
+            Options of the solver.
+        """
+        super().__init__(**kwargs)
+        self._lu = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lu'] = None
+        return state
+
+    def _linearize(self):
+        """
+        Factorize the system block of the assembled Jacobian.
+        """
+        try:
+            self._lu = splu(self._get_block_matrix())
+        except RuntimeError as err:
+            raise RuntimeError("{}: Singular entry found in the Jacobian ({}).".format(
+                self.msginfo, err))
+
+    def solve(self, rhs, mode='fwd', x0=None):
+        """
+        Solve the linear system of the owning system.
+        Parameters
+        ----------
+        rhs : ndarray
+            Right-hand side, of the size of the system output vector.
+        mode : str
+            'fwd' or 'rev'.
+        x0 : ndarray or None
+            Unused, the solve is direct.
+        Returns
+        -------
+        ndarray
+            The solution.
+        """
+        if self._lu is None:
+            self._linearize()
+        return self._lu.solve(np.asarray(rhs, dtype=float),
+                              trans='T' if mode == 'rev' else 'N')
+
+    def _solve_block(self, rhs, mode='fwd', x0=None):
+        # SuperLU applies the factorization to all columns in one call
+        return self.solve(rhs, mode)
+
+
+class ILUSolver(LinearSolver):
+    """
+    Incomplete LU factorization of the assembled Jacobian of the owning system.
+    Only approximately solves the linear system, it is meant as the preconditioner of a Krylov
+    solver. The factorization is computed once per linearization.
+    Attributes
+    ----------
+    _ilu : SuperLU or None
+        The incomplete factorization of the system block of the assembled Jacobian.
+    """
+
+    SOLVER = 'LN: ILU'
+
+    _requires_assembled_jac = True
+
+    def __init__(self, **kwargs):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        **kwargs : dict
+            Options of the solver.
+        """
+        super().__init__(**kwargs)
+        self._ilu = None
+
+    def _declare_options(self):
+        self.options.declare('drop_tol', default=1e-4, lower=0.0,
+                             desc='Relative tolerance below which entries are dropped.')
+        self.options.declare('fill_factor', default=10.0, lower=1.0,
+                             desc='Maximum ratio of nonzeros in the factors to the Jacobian.')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_ilu'] = None
+        return state
+
+    def _linearize(self):
+        """
+        Compute the incomplete factorization of the system block of the assembled Jacobian.
+        """
+        try:
+            self._ilu = spilu(self._get_block_matrix(), drop_tol=self.options['drop_tol'],
+                              fill_factor=self.options['fill_factor'])
+        except RuntimeError as err:
+            raise RuntimeError("{}: Singular entry found in the Jacobian ({}).".format(
+                self.msginfo, err))
+
+    def solve(self, rhs, mode='fwd', x0=None):
+        if self._ilu is None:
+            self._linearize()
+        return self._ilu.solve(np.asarray(rhs, dtype=float),
+                               trans='T' if mode == 'rev' else 'N')
+
+    def _solve_block(self, rhs, mode='fwd', x0=None):
+        return self.solve(rhs, mode)
+
+
+class LinearBlockJac(LinearSolver):
+    """
+    Block Jacobi iteration over the subsystems of a group.
+    Each subsystem block is solved with the linear solver of the subsystem, with solve_linear
+    for an implicit component without one, and is taken as the identity otherwise (as it is for
+    explicit components). With the default maxiter of 1 this only applies the inverse of the
+    block diagonal once, which makes it a preconditioner for a Krylov solver where some
+    subsystems have a DirectSolver.
+    Attributes
+    ----------
+    _sub_slices : dict
+        Location of the outputs of each subsystem in the output vector of the group.
+    """
+
+    SOLVER = 'LN: LNBJ'
+
+    def _declare_options(self):
+        self.options['maxiter'] = 1
+
+    def _setup_solvers(self, system, depth):
+        super()._setup_solvers(system, depth)
+
+        slices = system._outputs._slices
+        self._sub_slices = {}
+        start = 0
+        for name, subsys in system._subsystems_allprocs.items():
+            size = subsys._outputs.asarray().size
+            if size:
+                start = slices[next(iter(subsys._outputs._slices))].start
+            self._sub_slices[name] = slice(start, start + size)
+            start += size
+
+    def _solve_blocks(self, rhs, mode):
+        """
+        Apply the inverse of the block diagonal of the Jacobian.
+        Parameters
+        ----------
+        rhs : ndarray
+            Right-hand side, of the size of the system output vector.
+        mode : str
+            'fwd' or 'rev'.
+        Returns
+        -------
+        ndarray
+            The solution of the block diagonal system.
+        """
+        from om_lite.core.implicitcomponent import ImplicitComponent
+
+        sol = np.array(rhs, dtype=float)
+        for name, subsys in self._system._subsystems_allprocs.items():
+            slc = self._sub_slices[name]
+            if subsys._linear_solver is not None:
+                sol[slc] = subsys._linear_solver.solve(rhs[slc], mode)
+            elif isinstance(subsys, ImplicitComponent):
+                d_outputs, d_residuals = subsys._doutputs, subsys._dresiduals
+                if mode == 'fwd':
+                    d_residuals.asarray()[:] = rhs[slc]
+                    subsys.solve_linear(d_outputs, d_residuals, mode)
+                    sol[slc] = d_outputs.asarray()
+                else:
+                    d_outputs.asarray()[:] = rhs[slc]
+                    subsys.solve_linear(d_outputs, d_residuals, mode)
+                    sol[slc] = d_residuals.asarray()
+        return sol
+
+    def solve(self, rhs, mode='fwd', x0=None):
+        rhs = np.asarray(rhs, dtype=float)
+        maxiter = self.options['maxiter']
+        if x0 is None or maxiter <= 1:
+            sol = self._solve_blocks(rhs, mode)
+        else:
+            sol = x0 + self._solve_blocks(rhs - self._apply_jac(x0, mode), mode)
+
+        if maxiter <= 1:
+            return sol
+
+        norm0 = np.linalg.norm(rhs) or 1.0
+        self._iter_count = 1
+        while True:
+            res = rhs - self._apply_jac(sol, mode)
+            norm = np.linalg.norm(res)
+            self._print_iter(self._iter_count, norm, norm0)
+            if (norm < self.options['atol'] or norm / norm0 < self.options['rtol'] or
+                    self._iter_count >= maxiter):
+                break
+            sol += self._solve_blocks(res, mode)
+            self._iter_count += 1
+
+        self._check_convergence(norm, norm0)
+        return sol
+
+
+class ScipyKrylov(LinearSolver):
+    """
+    Matrix-free GMRES or CG from scipy.sparse.linalg.
+    Products with the Jacobian come from the apply_linear / compute_jacvec_product of the
+    components, so the model Jacobian is never assembled unless the preconditioner needs it.
+    CG is only valid when the Jacobian of the system is symmetric positive definite.
+    Attributes
+    ----------
+    precon : LinearSolver or None
+        Preconditioner, its solve approximates the inverse of the Jacobian. Typically an
+        ILUSolver, or a LinearBlockJac over subsystems that have a DirectSolver.
+    """
+
+    SOLVER = 'LN: SCIPY'
+
+    def __init__(self, **kwargs):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        **kwargs : dict
+            Options of the solver.
+        """
+        super().__init__(**kwargs)
+        self.precon = None
+
+    def _declare_options(self):
+        self.options['maxiter'] = 1000
+        self.options.declare('solver', default='gmres', values=['gmres', 'cg'],
+                             desc='Krylov method.')
+        self.options.declare('restart', types=int, default=20, lower=1,
+                             desc='Number of GMRES iterations between restarts.')
+
+    @property
+    def _requires_assembled_jac(self):
+        return self.precon is not None and self.precon._requires_assembled_jac
+
+    def _setup_solvers(self, system, depth):
+        super()._setup_solvers(system, depth)
+        if self.precon is not None:
+            self.precon._setup_solvers(system, depth + 1)
+
+    def _linearize(self):
+        if self.precon is not None:
+            self.precon._linearize()
+
+    def solve(self, rhs, mode='fwd', x0=None):
+        rhs = np.asarray(rhs, dtype=float)
+        n = rhs.size
+        norm0 = np.linalg.norm(rhs)
+        if norm0 == 0.0:
+            return np.zeros(n)
+        if x0 is not None:
+            x0 = np.asarray(x0, dtype=float)
+
+        op = LinearOperator((n, n), matvec=lambda x: self._apply_jac(x, mode), dtype=float)
+        precon = None
+        if self.precon is not None:
+            precon = LinearOperator((n, n), matvec=lambda x: self.precon.solve(x, mode),
+                                    dtype=float)
+
+        self._iter_count = 0
+
+        def callback(_):
+            self._iter_count += 1
+
+        kwargs = {'x0': x0, 'rtol': self.options['rtol'], 'atol': self.options['atol'],
+                  'maxiter': self.options['maxiter'], 'M': precon, 'callback': callback}
+        if self.options['solver'] == 'gmres':
+            sol, _ = gmres(op, rhs, restart=self.options['restart'],
+                           callback_type='pr_norm', **kwargs)
+        else:
+            sol, _ = cg(op, rhs, **kwargs)
+
+        norm = np.linalg.norm(rhs - self._apply_jac(sol, mode))
+        self._print_iter(self._iter_count, norm, norm0)
+        self._check_convergence(norm, norm0)
+        return sol
@@ -0,0 +1,316 @@
+"""Define the nonlinear solvers."""
+import numpy as np
+
+from om_lite.core.implicitcomponent import ImplicitComponent
+from om_lite.core.solver import NonlinearSolver
+
+
+class NonlinearBlockGS(NonlinearSolver):
+    """
+    Nonlinear block Gauss-Seidel, runs the subsystems in order until their outputs stop changing.
+    Used by Group for each cycle of its dependency graph when no nonlinear solver is set.
+    """
+
+    SOLVER = 'NL: NLBGS'
+
+    def solve(self, subsystems=None):
+        """
+        Converge the outputs of the owning group.
+        Parameters
+        ----------
+        subsystems : list of str or None
+            Names of the subsystems to iterate over, in order. Defaults to all subsystems of
+            the group in execution order.
+        """
+        system = self._system
+        if subsystems is None:
+            subsystems = [name for scc in system._sccs for name in scc]
+
+        members = [system._subsystems_allprocs[name] for name in subsystems]
+        outputs = [sub._outputs.asarray() for sub in members]
+        prev = [vals.copy() for vals in outputs]
+
+        maxiter = self.options['maxiter']
+        atol = self.options['atol']
+        rtol = self.options['rtol']
+
+        norm0 = None
+        self._iter_count = 0
+        while self._iter_count < maxiter:
+            for name, sub in zip(subsystems, members):
+                system._transfer(name)
+                sub.run_solve_nonlinear()
+            self._iter_count += 1
+
+            norm = np.sqrt(sum(np.sum((vals - old) ** 2)
+                               for vals, old in zip(outputs, prev)))
+            if norm0 is None:
+                norm0 = norm if norm != 0.0 else 1.0
+            self._print_iter(self._iter_count, norm, norm0)
+            self._record_iteration(norm, norm0)
+
+            if norm < atol or norm / norm0 < rtol:
+                return
+
+            for vals, old in zip(outputs, prev):
+                old[:] = vals
+
+        self._check_convergence(norm, norm0)
+
+
+class BoundsEnforceLS(NonlinearSolver):
+    """
+    Line search that only keeps the Newton step within the lower/upper bounds of the outputs.
+    Attributes
+    ----------
+    _lower : ndarray
+        Lower bounds of the system outputs, -inf where there is none.
+    _upper : ndarray
+        Upper bounds of the system outputs, inf where there is none.
+    """
+
+    SOLVER = 'LS: BCHK'
+
+    def _declare_options(self):
+        self.options.declare('bound_enforcement', default='vector', values=['vector', 'wall'],
+                             desc="If 'vector', the whole step is scaled back to the first "
+                             "bound it hits. If 'wall', only the entries past a bound are "
+                             "projected onto it.")
+
+    def _setup_solvers(self, system, depth):
+        super()._setup_solvers(system, depth)
+
+        model = system._problem_meta['model_ref']()
+        out_meta = model._var_allprocs_abs2meta['output']
+        n = system._outputs.asarray().size
+        self._lower = np.full(n, -np.inf)
+        self._upper = np.full(n, np.inf)
+
+        for abs_name, slc in system._outputs._slices.items():
+            meta = out_meta[abs_name]
+            if meta['lower'] is not None:
+                self._lower[slc] = np.ravel(meta['lower'])
+            if meta['upper'] is not None:
+                self._upper[slc] = np.ravel(meta['upper'])
+
+        self._has_bounds = bool(np.any(np.isfinite(self._lower)) or
+                                np.any(np.isfinite(self._upper)))
+
+    def _enforce_bounds(self, x, step):
+        """
+        Limit a step so that x + step stays within bounds.
+        Parameters
+        ----------
+        x : ndarray
+            Outputs before the step, within bounds.
+        step : ndarray
+            Newton step, modified in place.
+        """
+        if not self._has_bounds:
+            return
+
+        new_x = x + step
+        if self.options['bound_enforcement'] == 'wall':
+            np.clip(new_x, self._lower, self._upper, out=new_x)
+            step[:] = new_x - x
+            return
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac_low = np.where(new_x < self._lower, (self._lower - x) / step, 1.0)
+            frac_up = np.where(new_x > self._upper, (self._upper - x) / step, 1.0)
+        alpha = min(1.0, np.min(frac_low, initial=1.0), np.min(frac_up, initial=1.0))
+        step *= max(alpha, 0.0)
+
+    def solve(self, x, step, norm):
+        """
+        Take the step, limited by the bounds.
+        Parameters
+        ----------
+        x : ndarray
+            Outputs of the system, updated in place.
+        step : ndarray
+            Newton step.
+        norm : float
+            Residual norm before the step.
+        Returns
+        -------
+        float
+            Residual norm after the step.
+        """
+        self._enforce_bounds(x, step)
+        x += step
+        return self._run_apply()
+
+    def _run_apply(self):
+        system = self._system
+        system._apply_nonlinear()
+        return system._residuals.get_norm()
+
+
+class ArmijoGoldsteinLS(BoundsEnforceLS):
+    """
+    Backtracking line search accepting the first step that satisfies the Armijo condition.
+    The step is first limited by the output bounds, then halved (by 'rho') until
+    norm(R(x + alpha * step)) <= (1 - c * alpha) * norm(R(x)), for at most 'maxiter' tries.
+    """
+
+    SOLVER = 'LS: AG'
+
+    def _declare_options(self):
+        super()._declare_options()
+        self.options['maxiter'] = 5
+        self.options.declare('c', default=0.1, lower=0.0, upper=1.0,
+                             desc='Slope parameter of the Armijo condition.')
+        self.options.declare('rho', default=0.5, lower=0.0, upper=1.0,
+                             desc='Contraction factor of the step.')
+        self.options.declare('alpha', default=1.0, lower=0.0,
+                             desc='Initial step length.')
+
+    def solve(self, x, step, norm):
+        self._enforce_bounds(x, step)
+        x0 = x.copy()
+
+        alpha = self.options['alpha']
+        c = self.options['c']
+        rho = self.options['rho']
+
+        x[:] = x0 + alpha * step
+        new_norm = self._run_apply()
+        self._iter_count = 0
+        while self._iter_count < self.options['maxiter'] and new_norm > (1.0 - c * alpha) * norm:
+            alpha *= rho
+            x[:] = x0 + alpha * step
+            new_norm = self._run_apply()
+            self._iter_count += 1
+            self._print_iter(self._iter_count, new_norm, norm)
+
+        return new_norm
+
+
+class NewtonSolver(NonlinearSolver):
+    """
+    Newton's method on the outputs of a system, with an optionally lagged Jacobian.
+    Each iteration evaluates the residuals with apply_nonlinear, solves J dx = -R with the
+    linear solver, and hands the step to the line search. The Jacobian is only recomputed
+    (linearize plus, for a DirectSolver, a new factorization) every 'jac_update_freq'
+    iterations. A value of 0 gives modified Newton, where it is computed once per solve.
+    It is also refreshed early when an iteration with a stale Jacobian reduces the
+    residual norm by less than 'jac_refresh_ratio'.
+    Attributes
+    ----------
+    linear_solver : LinearSolver or None
+        Linear solver for the Newton steps. The system's linear solver, or a DirectSolver, is
+        used if None.
+    linesearch : NonlinearSolver or None
+        Line search, BoundsEnforceLS by default.
+    norm_history : list of float
+        Residual norms of the last solve, starting with the initial one.
+    """
+
+    SOLVER = 'NL: Newton'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.linear_solver = None
+        self.linesearch = BoundsEnforceLS()
+        self.norm_history = []
+        self._jac_is_current = False
+
+    def _declare_options(self):
+        self.options.declare('jac_update_freq', types=int, default=1, lower=0,
+                             desc='Recompute the Jacobian every this many iterations, '
+                             '0 to compute it only at the first iteration of each solve.')
+        self.options.declare('jac_refresh_ratio', default=0.5, lower=0.0, upper=1.0,
+                             desc='Recompute a lagged Jacobian at the next iteration when the '
+                             'residual norm decreased by less than this ratio.')
+        self.options.declare('reuse_jac', types=bool, default=False,
+                             desc='If True, start each solve with the Jacobian of the '
+                             'previous one instead of recomputing it.')
+
+    def _setup_solvers(self, system, depth):
+        super()._setup_solvers(system, depth)
+
+        if self.linear_solver is None:
+            if system._linear_solver is not None:
+                self._linear_solver = system._linear_solver
+            else:
+                from om_lite.core.linear_solvers import DirectSolver
+                self._linear_solver = DirectSolver()
+                self._linear_solver._setup_solvers(system, depth)
+        else:
+            self._linear_solver = self.linear_solver
+            self.linear_solver._setup_solvers(system, depth)
+
+        if self.linesearch is not None:
+            self.linesearch._setup_solvers(system, depth)
+
+        self._jac_is_current = False
+
+    def _linearize(self):
+        """
+        Recompute the partials of the system and update the linear solver.
+        """
+        self._system._linearize(sub_do_ln=False)
+        self._linear_solver._linearize()
+        self._jac_is_current = True
+
+    def solve(self):
+        """
+        Converge the outputs of the owning system.
+        """
+        system = self._system
+        outputs = system._outputs.asarray()
+        residuals = system._residuals.asarray()
+
+        for comp in system.system_iter(include_self=True, recurse=True, typ=ImplicitComponent):
+            comp.guess_nonlinear(comp.inputs, comp.outputs, comp.residuals)
+
+        maxiter = self.options['maxiter']
+        atol = self.options['atol']
+        rtol = self.options['rtol']
+        update_freq = self.options['jac_update_freq']
+        refresh_ratio = self.options['jac_refresh_ratio']
+
+        system._apply_nonlinear()
+        norm = norm0 = np.linalg.norm(residuals)
+        self.norm_history = [norm]
+        if norm0 == 0.0:
+            norm0 = 1.0
+        self._print_iter(0, norm, norm0)
+
+        self._iter_count = 0
+        lagged = False
+        if not self.options['reuse_jac']:
+            self._jac_is_current = False
+
+        while self._iter_count < maxiter and norm > atol and norm / norm0 > rtol:
+            if not self._jac_is_current or (update_freq > 0 and
+                                            self._iter_count % update_freq == 0) \
+                    or (lagged and self._iter_count > 0):
+                self._linearize()
+            lagged = False
+
+            step = self._linear_solver.solve(-residuals, 'fwd')
+
+            old_norm = norm
+            if self.linesearch is None:
+                outputs += step
+                system._apply_nonlinear()
+                norm = np.linalg.norm(residuals)
+            else:
+                norm = self.linesearch.solve(outputs, step, norm)
+
+            self._iter_count += 1
+            self.norm_history.append(norm)
+            self._print_iter(self._iter_count, norm, norm0)
+            self._record_iteration(norm, norm0)
+
+            # a lagged Jacobian that stops paying off is recomputed at the next iteration
+            if update_freq != 1 and norm > refresh_ratio * old_norm:
+                lagged = True
+
+        if norm <= atol or norm / norm0 <= rtol:
+            if self.options['iprint'] > 0:
+                print('{} Converged in {} iterations'.format(self.SOLVER, self._iter_count))
+        else:
+            self._check_convergence(norm, norm0)
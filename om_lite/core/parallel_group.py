@@ -0,0 +1,222 @@
+"""Define the ParallelGroup class."""
+import contextvars
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from om_lite.core.group import Group
+from om_lite.core.vector import Vector
+
+# model copy, its subsystems run here and root vectors of a worker process, set by _init_worker
+_worker_model = []
+_worker_subsystems = {}
+_worker_shared_memory = []
+
+
+def _init_worker(model, pathname, prob_meta, layout, shm_names):
+    """
+    Set up a copy of the model on the shared buffers, with the solvers and Jacobian of its own.
+    Parameters
+    ----------
+    model : Group
+        Copy of the model.
+    pathname : str
+        Pathname of the parallel group whose subsystems this worker runs.
+    prob_meta : dict
+        Problem metadata, but for the reference to the model.
+    layout : dict
+        For each vector kind, the list of (abs_name, shape) of its variables.
+    shm_names : dict
+        For each vector kind, the name of the shared memory block holding its buffer.
+    """
+    from multiprocessing.shared_memory import SharedMemory
+
+    prob_meta = dict(prob_meta, model_ref=weakref.ref(model))
+    for system in model.system_iter(include_self=True, recurse=True):
+        system._problem_meta = prob_meta
+
+    root_vectors = {}
+    for kind, variables in layout.items():
+        shm = SharedMemory(name=shm_names[kind])
+        _worker_shared_memory.append(shm)
+        vec = Vector(kind)
+        dvec = Vector(kind)
+        for abs_name, shape in variables:
+            # no initial values, the buffers hold the current state of the parent
+            vec._add_var(abs_name, None, shape)
+            dvec._add_var(abs_name, None, shape)
+        size = sum(int(np.prod(shape)) for _, shape in variables)
+        vec._allocate(np.ndarray((size, ), dtype=float, buffer=shm.buf))
+        dvec._allocate()
+        root_vectors[kind] = vec
+        root_vectors['d_' + kind] = dvec
+
+    model._setup_vectors(root_vectors)
+    model._setup_solvers()
+    model._setup_jacobians()
+
+    group = next(s for s in model.system_iter(include_self=True, recurse=True)
+                 if s.pathname == pathname)
+    _worker_model.append(model)
+    _worker_subsystems.update(group._subsystems_allprocs)
+
+
+def _run_worker_subsystem(name):
+    """
+    Run one subsystem in a worker process, its outputs land in the shared buffers.
+    Parameters
+    ----------
+    name : str
+        Name of the subsystem in its parallel group.
+    """
+    _worker_subsystems[name].run_solve_nonlinear()
+
+
+class ParallelGroup(Group):
+    """
+    Group that runs subsystems with no data dependency between them at the same time.
+    Subsystems are split into levels: a subsystem is in the level after the last level of the
+    subsystems it depends on, and all subsystems of one level run concurrently. The 'thread'
+    backend suits NumPy-heavy components that release the GIL. The 'process' backend runs
+    subsystems in worker processes holding their own copies of them, with the model vectors in
+    shared memory so that nothing but the subsystem name is sent per run. Within a level, the
+    subsystems with the largest proc_weight are started first.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._levels = []
+        self._executor = None
+
+    def initialize(self):
+        self.options.declare('parallel_backend', values=['thread', 'process'], default='thread',
+                             desc='Run independent subsystems in a thread pool or in a pool '
+                             'of worker processes.')
+        self.options.declare('num_workers', types=int, default=os.cpu_count() or 1, lower=1,
+                             desc='Maximum number of threads or worker processes.')
+
+    def _setup_graph(self):
+        super()._setup_graph()
+
+        num_workers = self.options['num_workers']
+        for name, (min_procs, max_procs, proc_weight) in self._proc_info.items():
+            if max_procs is not None and min_procs > max_procs:
+                raise ValueError("{}: min_procs ({}) is greater than max_procs ({}) for "
+                                 "subsystem '{}'.".format(self.msginfo, min_procs,
+                                                          max_procs, name))
+            if min_procs > num_workers:
+                raise RuntimeError("{}: subsystem '{}' needs {} workers but num_workers is "
+                                   "{}.".format(self.msginfo, name, min_procs, num_workers))
+
+        # level of each strongly connected component, ordered by decreasing proc_weight
+        level_of = {}
+        levels = []
+        preds = {name: set() for name in self._subsystems_allprocs}
+        for src, tgts in self._subsystems_graph.items():
+            for tgt in tgts:
+                preds[tgt].add(src)
+
+        for scc in self._sccs:
+            members = set(scc)
+            level = 0
+            for name in scc:
+                for pred in preds[name] - members:
+                    level = max(level, level_of[pred] + 1)
+            for name in scc:
+                level_of[name] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(scc)
+
+        weight = {name: info[2] for name, info in self._proc_info.items()}
+        self._levels = [sorted(level, key=lambda scc: -sum(weight[n] for n in scc))
+                        for level in levels]
+
+        self._shutdown()
+
+    def _needs_shared_vectors(self):
+        return self.options['parallel_backend'] == 'process'
+
+    def _get_executor(self):
+        if self._executor is not None:
+            return self._executor
+
+        num_workers = self.options['num_workers']
+        if self.options['parallel_backend'] == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=num_workers)
+            return self._executor
+
+        model = self._problem_meta['model_ref']()
+        layout = {}
+        for kind, io in (('input', 'input'), ('output', 'output'), ('residual', 'output')):
+            layout[kind] = [(n, m['shape'])
+                            for n, m in model._var_allprocs_abs2meta[io].items()]
+        shm_names = {kind: shm.name for kind, shm in model._shared_memory.items()}
+        prob_meta = {key: self._problem_meta[key]
+                     for key in ('use_derivatives', 'force_alloc_complex', 'static_mode')}
+
+        # the whole model is sent, since the solvers and the assembled Jacobian of a
+        # subsystem are built from the model
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_init_worker,
+            initargs=(model, self.pathname, prob_meta, layout, shm_names))
+        return self._executor
+
+    def _shutdown(self):
+        """
+        Stop the worker threads or processes, if any.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _solve_nonlinear(self):
+        if self._nonlinear_solver is not None:
+            self._nonlinear_solver.solve()
+            return
+
+        subsystems = self._subsystems_allprocs
+        use_processes = self.options['parallel_backend'] == 'process'
+
+        for level in self._levels:
+            if len(level) == 1:
+                self._run_scc(level[0])
+                continue
+
+            executor = self._get_executor()
+            futures = []
+            cycles = []
+            for scc in level:
+                if len(scc) > 1:
+                    cycles.append(scc)
+                    continue
+
+                name = scc[0]
+                self._transfer(name)
+                if use_processes:
+                    futures.append(executor.submit(_run_worker_subsystem, name))
+                else:
+                    # run in a copy of this context, so profiled calls keep their parent
+                    futures.append(executor.submit(contextvars.copy_context().run,
+                                                   subsystems[name].run_solve_nonlinear))
+
+            # cycles need transfers between iterations, they are converged here meanwhile
+            for scc in cycles:
+                self._cycle_solver.solve(scc)
+
+            for future in futures:
+                future.result()
+
+    def _run_scc(self, scc):
+        if len(scc) == 1:
+            self._transfer(scc[0])
+            self._subsystems_allprocs[scc[0]].run_solve_nonlinear()
+        else:
+            self._cycle_solver.solve(scc)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['_executor'] = None
+        return state
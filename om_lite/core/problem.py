@@ -1,4 +1,53 @@
+import sys
+import weakref
+from enum import IntEnum
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+from om_lite.core.checkpoint import load_checkpoint, save_checkpoint
+from om_lite.core.component import Component
+from om_lite.core.driver import Driver
+from om_lite.core.explicitcomponent import ExplicitComponent
+from om_lite.core.group import Group
+from om_lite.core.indepvarcomp import IndepVarComp
+from om_lite.core.linear_solvers import DirectSolver
 from om_lite.core.options_dictionary import OptionsDictionary
+from om_lite.core.profiling import Profiler
+from om_lite.core.recording import _RecIteration, _RecordingManager, \
+    _declare_recording_options, _get_recorded_names, record_model_options
+from om_lite.core.system import System
+from om_lite.core.total_jac import _LinearSolutionCache, _TotalJacInfo
+from om_lite.core.units import _connection_factors, simplify_unit
+from om_lite.core.utils import (FakeComm, _UNDEFINED, _batch_index, _full_slice,
+                                _is_slicer_op, _slice_indices, name2abs_names)
+from om_lite.core.vector import Vector
+
+# default out_stream of check_partials, resolved to sys.stdout when called
+_DEFAULT_OUT_STREAM = object()
+
+# largest number of entries in one batch of perturbed points of check_partials
+_CHECK_BATCH_ENTRIES = 2 ** 22
+
+_DEFAULT_CHECK_STEPS = {'fd': 1e-6, 'cs': 1e-40}
+
+
+class _SetupStatus(IntEnum):
+    """
+    Class used to define different states of the setup status.
+    Attributes
+    ----------
+    PRE_SETUP : int
+        Before setup has been called.
+    POST_SETUP : int
+        After setup has been called, vectors are not allocated yet.
+    POST_FINAL_SETUP : int
+        After final_setup has been called, vectors are allocated.
+    """
+
+    PRE_SETUP = 0
+    POST_SETUP = 1
+    POST_FINAL_SETUP = 2
 
 
 class Problem(object):
@@ -9,6 +58,9 @@ class Problem(object):
                  name=None,
                  **options):
 
+        self._name = name
+        self.comm = FakeComm() if comm is None else comm
+
         if model is None:
             self.model = Group()
         elif isinstance(model, System):
@@ -28,6 +80,76 @@ class Problem(object):
                 ": The value provided for 'driver' is not a valid Driver.")
 
         self.options = OptionsDictionary()
+        self.options.declare('coloring_dir', types=str, default='coloring_files',
+                             desc='Directory containing coloring files (if any) for this '
+                             'Problem.')
+        self.options.declare('linear_solution_cache_mb', default=64.0, lower=0.0,
+                             desc='Memory bound, in MB, of the derivative linear solutions '
+                             'kept for the variables added with cache_linear_solution.')
+        self.options.declare('incremental', types=bool, default=False,
+                             desc='If True, run_model only re-runs the systems downstream of '
+                             'the variables changed with set_val since the last run_model. '
+                             'Values written straight into the model vectors are not seen.')
+        self.options.update(options)
+
+        self._metadata = None
+        self._lin_sol_cache = None
+        self._mode = None
+        self._orig_mode = None
+        self._run_counter = -1
+        self._initial_condition_cache = {}
+        self._recording_iter = _RecIteration()
+        self._rec_mgr = _RecordingManager()
+        self.recording_options = OptionsDictionary()
+        _declare_recording_options(self.recording_options, ['*'])
+
+        # sources changed by set_val since the last run_model, and whether the model outputs
+        # are those of that run
+        self._dirty_sources = set()
+        self._model_is_current = False
+        self._skipped_systems = []
+
+        # how to set and get each variable name, built by final_setup
+        self._name_table = {}
+
+        self._profiler = None
+
+    @property
+    def msginfo(self):
+        """
+        Return info to prepend to messages.
+        """
+        if self._name is None:
+            return type(self).__name__
+        return '{} {}'.format(type(self).__name__, self._name)
+
+    def _get_cached_val(self, name, get_remote=False):
+        """
+        Return the value of a variable before the vectors are allocated.
+        Parameters
+        ----------
+        name : str
+            Promoted or relative variable name in the root system's namespace.
+        get_remote : bool or None
+            Unused, all variables are local.
+        Returns
+        -------
+        object
+            The value of the variable, cached in _initial_condition_cache.
+        """
+        if name in self._initial_condition_cache:
+            return self._initial_condition_cache[name]
+
+        abs_names = name2abs_names(self.model, name)
+        if not abs_names:
+            return _UNDEFINED
+
+        val = self.model._abs_get_val(abs_names[0])
+        if val is not _UNDEFINED:
+            val = np.array(val)
+            self._initial_condition_cache[name] = val
+
+        return val
 
     def __getitem__(self, name):
         """
@@ -65,8 +187,12 @@ class Problem(object):
         Returns
         -------
         object
-            The value of the requested output/input variable.
+            The value of the requested output/input variable. A view of the model vectors is
+            read-only, values are changed with set_val so that incremental runs see them.
         """
+        if units is None and indices is None and name in self._name_table:
+            return self._get_resolved(self._name_table[name])
+
         if self._metadata['setup_status'] == _SetupStatus.POST_SETUP:
             val = self._get_cached_val(name, get_remote=get_remote)
             if val is not _UNDEFINED:
@@ -93,7 +219,7 @@ class Problem(object):
                     "other processes using `get_val(<name>, get_remote=True)`."
                 )
 
-        return val
+        return _read_only(val)
 
     def __setitem__(self, name, value):
         """
@@ -122,6 +248,10 @@ class Problem(object):
         indices : int or list of ints or tuple of ints or int ndarray or Iterable or None, optional
             Indices or slice to set to specified value.
         """
+        if units is None and indices is None and name in self._name_table:
+            self._set_resolved(self._name_table[name], value)
+            return
+
         model = self.model
         if self._metadata is not None:
             conns = model._conn_global_abs_in2out
@@ -299,6 +429,8 @@ class Problem(object):
             elif abs_name in model._discrete_inputs:  # could happen if model is a component
                 model._discrete_inputs[abs_name] = value
 
+            self._dirty_sources.add(src)
+
     def run_model(self, case_prefix=None, reset_iter_counts=True):
         """
         Run the model by calling the root system's solve_nonlinear.
@@ -333,7 +465,139 @@ class Problem(object):
         record_model_options(self, self._run_counter)
 
         self.model._clear_iprint()
-        self.model.run_solve_nonlinear()
+        self._skipped_systems = []
+        if self.options['incremental'] and self._model_is_current:
+            self.model._solve_nonlinear_incremental(set(self._dirty_sources),
+                                                    self._dirty_sources, self._skipped_systems)
+        else:
+            self.model.run_solve_nonlinear()
+        self._dirty_sources = set()
+        self._model_is_current = True
+
+    def get_skipped_systems(self):
+        """
+        Return the components that the last run_model did not re-run.
+        Only an incremental run_model skips components, see the 'incremental' option.
+        Returns
+        -------
+        list of str
+            Pathnames of the skipped components, in execution order.
+        """
+        return list(self._skipped_systems)
+
+    def run_model_batch(self, inputs, outputs=None):
+        """
+        Run the model at many points at once.
+        Every variable of the model gets a leading batch axis. Components with the
+        'supports_batch' option compute all points in one call, the others (and groups converged
+        by a solver) are run once per point. The model itself is left as it was.
+        Parameters
+        ----------
+        inputs : dict
+            Values of each point, keyed by promoted input or output name, with a leading batch
+            axis of the same length for all of them. Other variables keep their current value.
+        outputs : list of str or None
+            Promoted names of the variables to return, all model outputs if None.
+        Returns
+        -------
+        dict
+            Values of each point, keyed by name, with a leading batch axis.
+        """
+        if self._mode is None:
+            raise RuntimeError(
+                self.msginfo +
+                ": The `setup` method must be called before `run_model_batch`.")
+
+        self.final_setup()
+
+        model = self.model
+        values = {name: np.asarray(val, dtype=float) for name, val in inputs.items()}
+        npts = {val.shape[0] if val.ndim else None for val in values.values()}
+        if len(npts) != 1 or None in npts:
+            raise ValueError("{}: The values of run_model_batch need a leading batch axis of "
+                             "the same length.".format(self.msginfo))
+        npts = npts.pop()
+
+        vectors = {}
+        for kind, vec in (('input', model._inputs), ('output', model._outputs)):
+            batch_vec = Vector(kind)
+            for abs_name, meta in vec._abs2meta.items():
+                batch_vec._add_var(abs_name, None, (npts, ) + meta['shape'])
+            batch_vec._allocate()
+            batch_vec.asarray()[_batch_index(vec._slices, npts)] = vec.asarray()
+            vectors[kind] = batch_vec
+
+        for name, val in values.items():
+            src, src_indices, scale, offset = self._get_batch_source(name)
+            if scale != 1.0 or offset != 0.0:
+                val = (val + offset) * scale
+            size = model._var_allprocs_abs2meta['output'][src]['size'] \
+                if src_indices is None else src_indices.size
+            if val[0].size != size:
+                raise ValueError("{}: The values of '{}' have {} entries per point, not "
+                                 "{}.".format(self.msginfo, name, val[0].size, size))
+            batch_src = vectors['output']._abs_get_val(src).reshape(npts, -1)
+            if src_indices is None:
+                batch_src[:] = val.reshape(npts, -1)
+            else:
+                batch_src[:, src_indices] = val.reshape(npts, -1)
+
+        saved = {kind: vec.asarray().copy() for kind, vec in
+                 (('input', model._inputs), ('output', model._outputs))}
+        try:
+            model._solve_nonlinear_batch(vectors, npts)
+        finally:
+            model._inputs.asarray()[:] = saved['input']
+            model._outputs.asarray()[:] = saved['output']
+
+        if outputs is None:
+            outputs = [prom for prom, abs_names in model._var_allprocs_prom2abs_list[
+                'output'].items() if not abs_names[0].startswith('_auto_ivc.')]
+
+        results = {}
+        for name in outputs:
+            src, src_indices, scale, offset = self._get_batch_source(name)
+            val = vectors['output']._abs_get_val(src, flat=False)
+            if src_indices is not None:
+                val = val.reshape(npts, -1)[:, src_indices]
+            if scale != 1.0 or offset != 0.0:
+                val = val / scale - offset
+            results[name] = val.copy()
+        return results
+
+    def _get_batch_source(self, name):
+        """
+        Return the output holding the value of a variable.
+        Parameters
+        ----------
+        name : str
+            Promoted or relative variable name in the root system's namespace.
+        Returns
+        -------
+        str
+            Absolute name of the output.
+        ndarray of int or None
+            The src_indices of a connected input, if any.
+        float
+            Scale converting a value of the variable to the units of the output.
+        float
+            Offset converting a value of the variable to the units of the output.
+        """
+        model = self.model
+        abs_names = name2abs_names(model, name)
+        if not abs_names:
+            raise KeyError(f'{model.msginfo}: Variable "{name}" not found.')
+
+        abs_name = abs_names[0]
+        if abs_name in model._var_allprocs_abs2meta['output']:
+            return abs_name, None, 1.0, 0.0
+
+        meta = model._var_allprocs_abs2meta['input'][abs_name]
+        src = model._conn_global_abs_in2out[abs_name]
+        src_indices = meta['src_indices'] if meta['has_src_indices'] else None
+        scale, offset = _connection_factors(
+            meta['units'], model._var_allprocs_abs2meta['output'][src]['units'])
+        return src, src_indices, scale, offset
 
     def run_driver(self, case_prefix=None, reset_iter_counts=True):
         """
@@ -373,8 +637,301 @@ class Problem(object):
         record_model_options(self, self._run_counter)
 
         self.model._clear_iprint()
+        self._model_is_current = False
         return self.driver.run()
 
+    def final_setup(self):
+        """
+        Perform final setup phase on problem in preparation for run.
+        This allocates the model vectors and copies in any values set since setup.
+        """
+        if self._metadata['setup_status'] < _SetupStatus.POST_FINAL_SETUP:
+            if self._metadata['use_derivatives'] and self.model.linear_solver is None:
+                self.model.linear_solver = DirectSolver()
+            self.model._final_setup()
+            self._setup_name_table()
+            self.driver._setup_driver(self)
+            self._setup_recording()
+            if self._profiler is not None and self._profiler.active:
+                # setup may have replaced the systems and solvers
+                self._profiler.start(self.model)
+            self._lin_sol_cache = _LinearSolutionCache(
+                int(self.options['linear_solution_cache_mb'] * 2 ** 20))
+
+            self._metadata['setup_status'] = _SetupStatus.POST_FINAL_SETUP
+            self._model_is_current = False
+            self._set_initial_conditions()
+
+    def _setup_name_table(self):
+        """
+        Resolve every promoted and absolute variable name of the model once.
+        Each name maps to a record holding views of its source output and, for an input that is
+        the only one with its name, of the input itself, the src_indices of the input and the
+        scale and offset converting its units to those of the source. set_val and get_val
+        (without units or indices), set_vals and get_vals then skip the name lookups.
+        """
+        model = self.model
+        conns = model._conn_global_abs_in2out
+        in_meta = model._var_allprocs_abs2meta['input']
+        outputs = model._outputs
+        inputs = model._inputs
+        ginputs = getattr(model, '_group_inputs', {})
+        out_meta = model._var_allprocs_abs2meta['output']
+
+        def input_record(abs_name, set_input):
+            meta = in_meta[abs_name]
+            src = conns.get(abs_name)
+            if src is None:
+                # an unconnected input of a component model is its own source
+                return {
+                    'src': abs_name, 'src_view': inputs._abs_get_val(abs_name, flat=False),
+                    'src_flat': inputs._abs_get_val(abs_name), 'src_indices': None,
+                    'shape': meta['shape'], 'tgt_view': None, 'scale': 1.0, 'offset': 0.0,
+                }
+            scale, offset = _connection_factors(meta['units'], out_meta[src]['units'])
+            return {
+                'src': src,
+                'src_view': outputs._abs_get_val(src, flat=False),
+                'src_flat': outputs._abs_get_val(src),
+                'src_indices': meta['src_indices'] if meta['has_src_indices'] else None,
+                'shape': meta['shape'],
+                'tgt_view': inputs._abs_get_val(abs_name, flat=False) if set_input else None,
+                'scale': scale,
+                'offset': offset,
+            }
+
+        def output_record(abs_name):
+            return {
+                'src': abs_name, 'src_view': outputs._abs_get_val(abs_name, flat=False),
+                'src_flat': outputs._abs_get_val(abs_name), 'src_indices': None,
+                'shape': outputs._abs2meta[abs_name]['shape'], 'tgt_view': None, 'scale': 1.0,
+                'offset': 0.0,
+            }
+
+        # later entries win, matching the lookup order of name2abs_names
+        table = {}
+        for abs_name in in_meta:
+            table[abs_name] = input_record(abs_name, True)
+        for abs_name in model._var_allprocs_abs2meta['output']:
+            table[abs_name] = output_record(abs_name)
+        for prom, abs_names in model._var_allprocs_prom2abs_list['input'].items():
+            if len(abs_names) > 1 and prom in ginputs:
+                abs_name = ginputs[prom][0].get('use_tgt', abs_names[0])
+            else:
+                abs_name = abs_names[0]
+            table[prom] = input_record(abs_name, len(abs_names) == 1)
+        for prom, abs_names in model._var_allprocs_prom2abs_list['output'].items():
+            table[prom] = output_record(abs_names[0])
+
+        self._name_table = table
+
+    def _setup_recording(self):
+        """
+        Register the variables recorded by the problem, the driver and the solvers.
+        """
+        model = self.model
+        outputs = [prom for prom, abs_names in model._var_allprocs_prom2abs_list[
+            'output'].items() if not abs_names[0].startswith('_auto_ivc.')]
+
+        if self._rec_mgr:
+            self._rec_mgr.startup('problem', self,
+                                  _get_recorded_names(self, self.recording_options, outputs))
+        driver = self.driver
+        if driver._rec_mgr:
+            driver._rec_mgr.startup(driver.msginfo, self,
+                                    _get_recorded_names(self, driver.recording_options, outputs))
+        for system in model.system_iter(include_self=True, recurse=True):
+            solver = system._nonlinear_solver
+            if solver is not None and solver._rec_mgr:
+                solver._setup_rec_parents(model)
+                solver._rec_mgr.startup(
+                    solver._get_rec_source(), self,
+                    _get_recorded_names(self, solver.recording_options,
+                                        list(system._outputs._abs2meta)))
+
+    def add_recorder(self, recorder):
+        """
+        Record the design variables, responses and included outputs when record is called.
+        Parameters
+        ----------
+        recorder : BinaryRecorder
+            The recorder.
+        """
+        self._rec_mgr.append(recorder)
+
+    def record(self, case_name):
+        """
+        Record the current values of the variables selected by the recording options.
+        Parameters
+        ----------
+        case_name : str
+            Name of the case.
+        """
+        if self._metadata is None or \
+                self._metadata['setup_status'] < _SetupStatus.POST_FINAL_SETUP:
+            raise RuntimeError("{}: Problem.record cannot be called before "
+                               "`Problem.run_model()`, `Problem.run_driver()`, or "
+                               "`Problem.final_setup()`.".format(self.msginfo))
+        if self._rec_mgr:
+            self._rec_mgr.record_iteration(case_name)
+
+    def _set_resolved(self, record, value):
+        """
+        Set a variable through its name table record.
+        Parameters
+        ----------
+        record : dict
+            The record of the variable.
+        value : float or ndarray
+            Value in the units of the variable.
+        """
+        if record['scale'] != 1.0 or record['offset'] != 0.0:
+            src_value = record['scale'] * (np.asarray(value) + record['offset'])
+        else:
+            src_value = value
+
+        if record['src_indices'] is None:
+            record['src_view'][...] = src_value
+        else:
+            record['src_flat'][record['src_indices']] = np.ravel(src_value) \
+                if np.ndim(src_value) > 1 else src_value
+        if record['tgt_view'] is not None:
+            record['tgt_view'][...] = value
+        self._dirty_sources.add(record['src'])
+
+    def _get_resolved(self, record):
+        """
+        Get a variable through its name table record.
+        Parameters
+        ----------
+        record : dict
+            The record of the variable.
+        Returns
+        -------
+        ndarray
+            The value in the units of the variable, a read-only view of the source output if it
+            has no src_indices and needs no unit conversion.
+        """
+        if record['src_indices'] is None:
+            val = record['src_view']
+            if val.shape != record['shape']:
+                val = val.reshape(record['shape'])
+        else:
+            val = record['src_flat'][record['src_indices']].reshape(record['shape'])
+
+        if record['scale'] != 1.0 or record['offset'] != 0.0:
+            return val / record['scale'] - record['offset']
+        return _read_only(val) if record['src_indices'] is None else val
+
+    def set_vals(self, values):
+        """
+        Set many variables at once.
+        Parameters
+        ----------
+        values : dict
+            Values keyed by promoted or absolute name, in the units of each variable.
+        """
+        table = self._name_table
+        for name, value in values.items():
+            record = table.get(name)
+            if record is None:
+                self.set_val(name, value)
+            else:
+                self._set_resolved(record, value)
+
+    def get_vals(self, names):
+        """
+        Get many variables at once.
+        Parameters
+        ----------
+        names : list of str
+            Promoted or absolute names.
+        Returns
+        -------
+        dict
+            Value of each variable, keyed by name, in its own units.
+        """
+        table = self._name_table
+        vals = {}
+        for name in names:
+            record = table.get(name)
+            vals[name] = self.get_val(name) if record is None else self._get_resolved(record)
+        return vals
+
+    def start_profiling(self, trace_memory=False):
+        """
+        Time the methods of every system and solver of the model until stop_profiling.
+        Parameters
+        ----------
+        trace_memory : bool
+            If True, also measure the memory allocated by each call, which is much slower.
+        """
+        if self._profiler is None:
+            self._profiler = Profiler(trace_memory)
+        self._profiler.trace_memory = trace_memory
+        self._profiler._model = self.model
+        if self._metadata is not None and \
+                self._metadata['setup_status'] >= _SetupStatus.POST_FINAL_SETUP:
+            self._profiler.start(self.model)
+
+    def stop_profiling(self):
+        """
+        Stop timing the model methods. The collected statistics are kept.
+        """
+        if self._profiler is not None:
+            self._profiler.stop()
+
+    def get_profiler(self):
+        """
+        Return the profiler holding the statistics of start_profiling.
+        Returns
+        -------
+        Profiler or None
+            The profiler, None if profiling was never started.
+        """
+        return self._profiler
+
+    def save_checkpoint(self, filepath):
+        """
+        Save the model vectors, initial conditions and iteration counters to a file.
+        Parameters
+        ----------
+        filepath : str
+            Path of the checkpoint file.
+        """
+        save_checkpoint(self, filepath)
+
+    def load_checkpoint(self, filepath):
+        """
+        Restore a checkpoint saved from a problem with the same model structure.
+        Parameters
+        ----------
+        filepath : str
+            Path of the checkpoint file.
+        """
+        load_checkpoint(self, filepath)
+
+    def cleanup(self):
+        """
+        Stop any worker threads or processes, free shared memory and close the recorders.
+        """
+        self.model._release_shared_memory()
+        self._rec_mgr.shutdown()
+        self.driver._rec_mgr.shutdown()
+        for system in self.model.system_iter(include_self=True, recurse=True):
+            if system._nonlinear_solver is not None:
+                system._nonlinear_solver._rec_mgr.shutdown()
+
+    def _set_initial_conditions(self):
+        """
+        Set all initial conditions that have been saved in cache after setup.
+        """
+        for name, value in self._initial_condition_cache.items():
+            self.set_val(name, value)
+
+        # Clean up cache
+        self._initial_condition_cache = {}
+
     def compute_jacvec_product(self):
         pass
 
@@ -385,7 +942,7 @@ class Problem(object):
         mode='auto',
         force_alloc_complex=False,
         #   distributed_vector_class=PETScVector,
-        # local_vector_class=DefaultVector,
+        local_vector_class=Vector,
         derivatives=True):
 
         # # PETScVector is required for MPI
@@ -408,18 +965,18 @@ class Problem(object):
             raise ValueError(msg)
 
         self._mode = self._orig_mode = mode
+        self._name_table = {}
 
-        model_comm = self.driver._setup_comm(comm)
+        model = self.model
+        model_comm = self.driver._setup_comm(self.comm)
 
         # this metadata will be shared by all Systems/Solvers in the system tree
         self._metadata = {
             'coloring_dir':
             self.options['coloring_dir'],  # directory for coloring files
             'recording_iter':
-            _RecIteration(),  # manager of recorder iterations
+            self._recording_iter,  # manager of recorder iterations
             'local_vector_class': local_vector_class,
-            'distributed_vector_class': distributed_vector_class,
-            'solver_info': SolverInfo(),
             'use_derivatives': derivatives,
             'force_alloc_complex': force_alloc_complex,
             'vars_to_gather':
@@ -458,22 +1015,139 @@ class Problem(object):
 
         return self
 
-    def check_partials(
-            self,
-            #    out_stream=_DEFAULT_OUT_STREAM,
-            includes=None,
-            excludes=None,
-            compact_print=False,
-            abs_err_tol=1e-6,
-            rel_err_tol=1e-6,
-            method='fd',
-            step=None,
-            form='forward',
-            step_calc='abs',
-            force_dense=True,
-            show_only_incorrect=False):
+    def check_partials(self,
+                       out_stream=_DEFAULT_OUT_STREAM,
+                       includes=None,
+                       excludes=None,
+                       compact_print=False,
+                       abs_err_tol=1e-6,
+                       rel_err_tol=1e-6,
+                       method='fd',
+                       step=None,
+                       form='forward',
+                       step_calc='abs',
+                       force_dense=True,
+                       show_only_incorrect=False):
+        """
+        Compare the partials of every component with finite difference or complex step.
+        For each component and each of its inputs (and outputs for implicit components), all
+        columns of the partials are perturbed at once, as one batch of points. Components with
+        the 'supports_batch' option evaluate the whole batch in one call. Options given with
+        Component.set_check_partial_options take precedence over the ones given here.
+        Parameters
+        ----------
+        out_stream : file-like object or None
+            Where to print the report, None to print nothing. Defaults to sys.stdout.
+        includes : str or list of str or None
+            Glob patterns of the pathnames of the components to check, all if None.
+        excludes : str or list of str or None
+            Glob patterns of the pathnames of the components to skip.
+        compact_print : bool
+            If True, print one line per partial.
+        abs_err_tol : float
+            Absolute error above which a partial is flagged.
+        rel_err_tol : float
+            Relative error above which a partial is flagged.
+        method : str
+            'fd' or 'cs'. 'cs' needs setup(force_alloc_complex=True).
+        step : float or None
+            Step size, 1e-6 for 'fd' and 1e-40 for 'cs' if None.
+        form : str
+            'forward', 'backward' or 'central', for 'fd' only.
+        step_calc : str
+            'abs' for an absolute step, 'rel' for a step relative to the variable value.
+        force_dense : bool
+            Unused, partials are always compared as dense arrays.
+        show_only_incorrect : bool
+            If True, only print the partials that are flagged.
+        Returns
+        -------
+        dict
+            For each component pathname, a dict keyed by (of, wrt) holding the computed
+            ('J_fwd') and approximated ('J_fd') partials, the 'abs error', 'rel error' and
+            'magnitude' (computed, approximated) norms, and whether the check is 'directional'.
+        """
+        if self._metadata['setup_status'] < _SetupStatus.POST_FINAL_SETUP:
+            self.final_setup()
+
+        if out_stream is _DEFAULT_OUT_STREAM:
+            out_stream = sys.stdout
+        if isinstance(includes, str):
+            includes = [includes]
+        if isinstance(excludes, str):
+            excludes = [excludes]
 
-        pass
+        defaults = {'method': method, 'form': form, 'step': step, 'step_calc': step_calc,
+                    'directional': False}
+        rng = np.random.default_rng(0)
+        data = {}
+
+        for comp in self.model.system_iter(include_self=True, typ=Component):
+            path = comp.pathname
+            if isinstance(comp, IndepVarComp):
+                continue
+            if includes is not None and not any(fnmatchcase(path, p) for p in includes):
+                continue
+            if excludes is not None and any(fnmatchcase(path, p) for p in excludes):
+                continue
+
+            comp.run_linearize()
+
+            wrt_names = list(comp._var_rel_names['input'])
+            if not isinstance(comp, ExplicitComponent):
+                wrt_names += comp._var_rel_names['output']
+
+            prefix = path + '.' if path else ''
+            out_slices = comp._outputs._slices
+            comp_data = data[path] = {}
+
+            for wrt in wrt_names:
+                options = defaults.copy()
+                options.update({k: v for k, v in comp._get_check_partial_options(wrt).items()
+                                if v is not None})
+                if options['step'] is None:
+                    options['step'] = _DEFAULT_CHECK_STEPS[options['method']]
+                if options['method'] == 'cs' and not self._metadata['force_alloc_complex']:
+                    raise RuntimeError(
+                        "{}: To check the partials of {} with complex step, call "
+                        "setup with force_alloc_complex=True.".format(self.msginfo,
+                                                                      comp.msginfo))
+
+                direction = None
+                if options['directional']:
+                    direction = rng.uniform(-1.0, 1.0, comp._var_rel2meta[wrt]['size'])
+
+                J_approx = _approx_check_jac(comp, wrt, options, direction)
+
+                for of in comp._var_rel_names['output']:
+                    J_calc = _get_dense_partial(comp, of, wrt)
+                    J_fd = J_approx[out_slices[prefix + of]]
+                    if J_calc is None:
+                        # undeclared partials are only reported if they are not zero
+                        if not np.any(J_fd):
+                            continue
+                        J_calc = np.zeros((J_fd.shape[0], comp._var_rel2meta[wrt]['size']))
+                    if direction is not None:
+                        J_calc = J_calc.dot(direction)[:, np.newaxis]
+
+                    abs_err = np.linalg.norm(J_calc - J_fd)
+                    calc_mag = np.linalg.norm(J_calc)
+                    fd_mag = np.linalg.norm(J_fd)
+                    comp_data[of, wrt] = {
+                        'J_fwd': J_calc,
+                        'J_fd': J_fd,
+                        'abs error': abs_err,
+                        'rel error': abs_err / fd_mag if fd_mag > 0.0 else np.nan,
+                        'magnitude': (calc_mag, fd_mag),
+                        'directional': direction is not None,
+                        'method': options['method'],
+                    }
+
+        if out_stream is not None:
+            _print_partials_report(self.model, data, out_stream, compact_print, abs_err_tol,
+                                   rel_err_tol, show_only_incorrect)
+
+        return data
 
     def compute_totals(self,
                        of=None,
@@ -483,5 +1157,248 @@ class Problem(object):
                        driver_scaling=False,
                        use_abs_names=False,
                        get_remote=True):
+        """
+        Compute derivatives of desired quantities with respect to desired inputs.
+        Parameters
+        ----------
+        of : list of variable name str or None
+            Variables whose derivatives will be computed. Default is None, which
+            uses the driver's objectives and constraints.
+        wrt : list of variable name str or None
+            Variables with respect to which the derivatives will be computed.
+            Default is None, which uses the driver's desvars.
+        return_format : str
+            Format to return the derivatives. Can be 'dict', 'flat_dict', or 'array'.
+            Default is a 'flat_dict', which returns them in a dictionary whose keys are
+            tuples of form (of, wrt).
+        debug_print : bool
+            Set to True to print out the chosen mode and the number of linear solves.
+        driver_scaling : bool
+            Set to True to scale derivative values by the quantities specified when the desvars
+            and responses were added. Default if False, which is unscaled.
+        use_abs_names : bool
+            Set to True when passing in absolute names to skip some translation steps.
+        get_remote : bool
+            Unused, all variables are local.
+        Returns
+        -------
+        object
+            Derivatives in form requested by 'return_format'.
+        """
+        if self._metadata['setup_status'] < _SetupStatus.POST_FINAL_SETUP:
+            self.final_setup()
+
+        total_info = _TotalJacInfo(self, of, wrt, use_abs_names, return_format,
+                                   driver_scaling=driver_scaling)
+        if debug_print:
+            print("Computing totals in '{}' mode with {} linear solves.".format(
+                total_info.mode, total_info.nsolves))
+
+        return total_info.compute_totals()
+
+
+def _read_only(val):
+    """
+    Return a read-only view of an array that views other data, the value itself otherwise.
+    Parameters
+    ----------
+    val : object
+        The value.
+    Returns
+    -------
+    object
+        The value, read-only if it is a view.
+    """
+    if isinstance(val, np.ndarray) and not val.flags.owndata and val.flags.writeable:
+        val = val.view()
+        val.flags.writeable = False
+    return val
+
+
+def _get_dense_partial(comp, of, wrt):
+    """
+    Return a declared partial of a component as a dense array.
+    Parameters
+    ----------
+    comp : Component
+        The component owning the partial.
+    of : str
+        Relative name of the output.
+    wrt : str
+        Relative name of the input or output.
+    Returns
+    -------
+    ndarray or None
+        The partial, or None if it was not declared.
+    """
+    partials = comp.partials
+    if (of, wrt) not in partials:
+        return None
+
+    shape = (comp._var_rel2meta[of]['size'], comp._var_rel2meta[wrt]['size'])
+    val = np.asarray(partials[of, wrt], dtype=float)
+    if (of, wrt, 'coo') in partials:
+        rows, cols = partials[of, wrt, 'coo']
+        J = np.zeros(shape)
+        np.add.at(J, (rows, cols), np.broadcast_to(val.ravel(), rows.shape))
+        return J
+    if val.size == shape[0] * shape[1]:
+        return val.reshape(shape).copy()
+    return np.broadcast_to(val, shape).copy()
+
+
+def _approx_check_jac(comp, wrt, options, direction):
+    """
+    Approximate the partials of all outputs (or residuals) of a component wrt one variable.
+    Every perturbed column is one point of a batch given to the component, the batch being
+    split so that it holds at most _CHECK_BATCH_ENTRIES entries.
+    Parameters
+    ----------
+    comp : Component
+        The component.
+    wrt : str
+        Relative name of the input or output.
+    options : dict
+        'method', 'form', 'step' and 'step_calc' of the approximation.
+    direction : ndarray or None
+        If given, the derivative along this direction is approximated instead of the columns.
+    Returns
+    -------
+    ndarray
+        Approximated partials, (size of the output vector) x (size of wrt), or one column for a
+        directional derivative.
+    """
+    prefix = comp.pathname + '.' if comp.pathname else ''
+    inputs = comp._inputs.asarray()
+    x = np.concatenate((inputs, comp._outputs.asarray()))
+    if wrt in comp._var_rel_names['output']:
+        slc = comp._outputs._slices[prefix + wrt]
+        idxs = np.arange(inputs.size + slc.start, inputs.size + slc.stop)
+    else:
+        slc = comp._inputs._slices[prefix + wrt]
+        idxs = np.arange(slc.start, slc.stop)
+
+    step = options['step']
+    if direction is None:
+        steps = np.full(idxs.size, step)
+        if options['step_calc'] == 'rel':
+            scale = np.abs(x[idxs])
+            steps *= np.where(scale > 0.0, scale, 1.0)
+    else:
+        scale = np.linalg.norm(x[idxs]) if options['step_calc'] == 'rel' else 0.0
+        steps = np.array([step * (scale if scale > 0.0 else 1.0)])
+
+    if options['method'] == 'cs':
+        signs = (1j, )
+        x = x.astype(complex)
+    else:
+        signs = {'forward': (1.0, ), 'backward': (-1.0, ), 'central': (1.0, -1.0)}[
+            options['form']]
+    results0 = None
+    need_base = options['method'] == 'fd' and options['form'] != 'central'
+
+    ncols = steps.size
+    J = np.empty((x.size - inputs.size, ncols))
+    chunk = max(1, _CHECK_BATCH_ENTRIES // (x.size * len(signs)))
+
+    for start in range(0, ncols, chunk):
+        cols = np.arange(start, min(start + chunk, ncols))
+        npts = cols.size
+        points = np.repeat(x[np.newaxis, :], npts * len(signs), axis=0)
+        for k, sign in enumerate(signs):
+            block = points[k * npts:(k + 1) * npts]
+            if direction is None:
+                block[np.arange(npts), idxs[cols]] += sign * steps[cols]
+            else:
+                block[:, idxs] += sign * steps[0] * direction
+
+        if need_base:
+            # the unperturbed point is evaluated along with the first chunk
+            points = np.concatenate((x[np.newaxis, :], points))
+        results = comp._run_approx_batch(points)
+        if need_base:
+            results0 = results[0]
+            results = results[1:]
+            need_base = False
+
+        if options['method'] == 'cs':
+            delta = results.imag
+        elif options['form'] == 'forward':
+            delta = results - results0
+        elif options['form'] == 'backward':
+            delta = results0 - results
+        else:
+            delta = 0.5 * (results[:npts] - results[npts:])
+
+        J[:, cols] = (delta / steps[cols, np.newaxis]).T
+
+    return J
+
+
+def _print_partials_report(model, data, out_stream, compact_print, abs_err_tol, rel_err_tol,
+                           show_only_incorrect):
+    """
+    Print the results of check_partials.
+    Parameters
+    ----------
+    model : System
+        The model.
+    data : dict
+        Results of check_partials, by component pathname.
+    out_stream : file-like object
+        Where to print.
+    compact_print : bool
+        If True, print one line per partial.
+    abs_err_tol : float
+        Absolute error above which a partial is flagged.
+    rel_err_tol : float
+        Relative error above which a partial is flagged.
+    show_only_incorrect : bool
+        If True, only print the partials that are flagged.
+    """
+    for comp in model.system_iter(include_self=True, typ=Component):
+        comp_data = data.get(comp.pathname)
+        if comp_data is None:
+            continue
+
+        lines = []
+        for (of, wrt), info in comp_data.items():
+            flags = []
+            if info['abs error'] > abs_err_tol:
+                flags.append('>ABS_TOL')
+            if info['rel error'] > rel_err_tol:
+                flags.append('>REL_TOL')
+            if show_only_incorrect and not flags:
+                continue
+
+            calc_mag, fd_mag = info['magnitude']
+            check = info['method'] + (' (directional)' if info['directional'] else '')
+            if compact_print:
+                lines.append('{:<20} {:<20} {:>12.4e} {:>12.4e} {:>12.4e} {:>12.4e}  {}'.format(
+                    of, wrt, calc_mag, fd_mag, info['abs error'], info['rel error'],
+                    ' '.join(flags)))
+            else:
+                lines.extend([
+                    "  '{}' wrt '{}'".format(of, wrt),
+                    '    Forward Magnitude: {:.6e}'.format(calc_mag),
+                    '    {:>17}: {:.6e}'.format('Check Magnitude', fd_mag),
+                    '    Absolute Error (Jfor - Jcheck): {:.6e} {}'.format(
+                        info['abs error'], '>ABS_TOL' if '>ABS_TOL' in flags else ''),
+                    '    Relative Error (Jfor - Jcheck) / Jcheck: {:.6e} {}'.format(
+                        info['rel error'], '>REL_TOL' if '>REL_TOL' in flags else ''),
+                    '    Check method: {}'.format(check),
+                ])
+                if flags:
+                    lines.extend(['    Raw Forward Derivative (Jfor)', str(info['J_fwd']),
+                                  '    Raw Check Derivative (Jcheck)', str(info['J_fd'])])
+                lines.append('')
+
+        if not lines:
+            continue
 
-        pass
\ No newline at end of file
+        header = comp.msginfo
+        out_stream.write('-' * len(header) + '\n' + header + '\n' + '-' * len(header) + '\n')
+        if compact_print:
+            out_stream.write('{:<20} {:<20} {:>12} {:>12} {:>12} {:>12}\n'.format(
+                'of', 'wrt', 'calc mag', 'check mag', 'abs error', 'rel error'))
+        out_stream.write('\n'.join(lines) + '\n')
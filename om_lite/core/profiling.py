@@ -0,0 +1,252 @@
+"""Per-system profiling of the model methods."""
+import contextvars
+import sys
+import threading
+import time
+import tracemalloc
+
+# methods timed when they are defined, framework ones giving the inclusive time of each
+# system in the model tree
+_SYSTEM_METHODS = ('_solve_nonlinear', '_apply_nonlinear', '_linearize', '_apply_linear')
+_COMPONENT_METHODS = ('compute', 'compute_partials', 'compute_jacvec_product',
+                      'apply_nonlinear', 'solve_nonlinear', 'guess_nonlinear', 'linearize',
+                      'apply_linear', 'solve_linear')
+_GROUP_METHODS = ('_transfer', '_transfer_linear')
+_SOLVER_METHODS = ('solve', '_linearize')
+
+# label path of the timed call in progress. A function run by a worker thread in a copy of the
+# submitting context gets its calls filed under the call that submitted it.
+_label_path = contextvars.ContextVar('om_lite_label_path', default=())
+
+
+def _drop_timed(state):
+    """
+    Remove the timed wrappers from the state of a pickled system or solver.
+    Parameters
+    ----------
+    state : dict
+        The instance dictionary, modified in place.
+    Returns
+    -------
+    dict
+        The state.
+    """
+    for name in [name for name, val in state.items() if getattr(val, '_om_timed', False)]:
+        del state[name]
+    return state
+
+
+class Profiler(object):
+    """
+    Call counts, wall times and allocations of the methods of the systems and solvers.
+    Methods are timed by wrappers set as instance attributes of the systems and solvers when
+    profiling starts and removed when it stops, so a model that is not profiled runs its
+    methods unchanged.
+    Attributes
+    ----------
+    trace_memory : bool
+        If True, the net memory allocated by each call is measured with tracemalloc.
+    _stats : dict
+        [calls, inclusive ns, exclusive ns, allocated bytes] keyed by (pathname, method).
+    _stacks : dict
+        Exclusive ns keyed by the call stack, a tuple of 'pathname:method' labels.
+    _local : threading.local
+        Its 'stack' holds the calls in progress in one thread, [key, label path, start ns,
+        children ns, start memory].
+    _wrapped : list of (object, str)
+        Instances and method names currently wrapped.
+    _model : System or None
+        The model being profiled, None when profiling is stopped.
+    _started_tracing : bool
+        True if start began tracing the allocations, which stop then ends.
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        trace_memory : bool
+            If True, measure the net memory allocated by each call.
+        """
+        self.trace_memory = trace_memory
+        self._stats = {}
+        self._stacks = {}
+        self._local = threading.local()
+        self._wrapped = []
+        self._model = None
+        self._started_tracing = False
+
+    @property
+    def active(self):
+        """
+        True if the methods of a model are being timed.
+        """
+        return self._model is not None
+
+    def reset(self):
+        """
+        Clear the collected statistics.
+        """
+        self._stats = {}
+        self._stacks = {}
+
+    def _wrap(self, obj, pathname, name):
+        """
+        Replace a method of an instance by a timed version.
+        Parameters
+        ----------
+        obj : System or Solver
+            The instance.
+        pathname : str
+            Name of the instance in the statistics.
+        name : str
+            Name of the method.
+        """
+        if name in obj.__dict__:
+            return
+        func = getattr(obj, name, None)
+        if func is None:
+            return
+
+        key = (pathname, name)
+        label = '{}:{}'.format(pathname, name)
+        local = self._local
+        clock = time.perf_counter_ns
+        trace = self.trace_memory
+
+        def timed(*args, **kwargs):
+            stack = getattr(local, 'stack', None)
+            if stack is None:
+                stack = local.stack = []
+            path = _label_path.get() + (label, )
+            token = _label_path.set(path)
+            frame = [key, path, 0, 0, tracemalloc.get_traced_memory()[0] if trace else 0]
+            stack.append(frame)
+            frame[2] = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - frame[2]
+                stack.pop()
+                _label_path.reset(token)
+                if stack:
+                    stack[-1][3] += elapsed
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = [0, 0, 0, 0]
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += elapsed - frame[3]
+                if trace:
+                    stats[3] += max(tracemalloc.get_traced_memory()[0] - frame[4], 0)
+                self._stacks[frame[1]] = self._stacks.get(frame[1], 0) + elapsed - frame[3]
+
+        timed.__wrapped__ = func
+        timed._om_timed = True
+        setattr(obj, name, timed)
+        self._wrapped.append((obj, name))
+
+    def start(self, model):
+        """
+        Start timing the systems and solvers of a model.
+        Parameters
+        ----------
+        model : System
+            The model.
+        """
+        from om_lite.core.component import Component
+        from om_lite.core.group import Group
+
+        self.stop()
+        self._model = model
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        for system in model.system_iter(include_self=True, recurse=True):
+            pathname = system.pathname or '<model>'
+            names = _SYSTEM_METHODS
+            if isinstance(system, Component):
+                names += _COMPONENT_METHODS
+            elif isinstance(system, Group):
+                names += _GROUP_METHODS
+            for name in names:
+                self._wrap(system, pathname, name)
+
+            for solver in (system._nonlinear_solver, system._linear_solver,
+                           getattr(system._nonlinear_solver, 'linesearch', None)):
+                if solver is not None:
+                    for name in _SOLVER_METHODS:
+                        self._wrap(solver, '{}.{}'.format(pathname, solver.SOLVER), name)
+
+    def stop(self):
+        """
+        Restore the original methods, and end the tracing of allocations if start began it.
+        The statistics are kept.
+        """
+        for obj, name in self._wrapped:
+            obj.__dict__.pop(name, None)
+        self._wrapped = []
+        self._local = threading.local()
+        self._model = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def get_stats(self):
+        """
+        Return the statistics of each timed method.
+        Returns
+        -------
+        list of dict
+            'pathname', 'method', 'calls', 'inclusive' and 'exclusive' time in seconds and
+            'allocated', the net bytes still held after the calls including those of nested
+            calls, by decreasing exclusive time.
+        """
+        rows = [{'pathname': pathname, 'method': method, 'calls': calls,
+                 'inclusive': incl * 1e-9, 'exclusive': excl * 1e-9, 'allocated': alloc}
+                for (pathname, method), (calls, incl, excl, alloc) in self._stats.items()]
+        rows.sort(key=lambda row: -row['exclusive'])
+        return rows
+
+    def write_table(self, out_stream=None, limit=None):
+        """
+        Write the statistics as a flat table, slowest exclusive time first.
+        Parameters
+        ----------
+        out_stream : file-like or None
+            Where to write the table, sys.stdout if None.
+        limit : int or None
+            Maximum number of rows.
+        """
+        if out_stream is None:
+            out_stream = sys.stdout
+        rows = self.get_stats()[:limit]
+        total = sum(row['exclusive'] for row in self.get_stats())
+        width = max([len('{}:{}'.format(row['pathname'], row['method'])) for row in rows] +
+                    [len('Method')])
+        out_stream.write('{:<{w}}  {:>9}  {:>12}  {:>12}  {:>6}  {:>12}\n'.format(
+            'Method', 'Calls', 'Inclusive s', 'Exclusive s', '%', 'Alloc bytes', w=width))
+        for row in rows:
+            out_stream.write('{:<{w}}  {:>9}  {:>12.6f}  {:>12.6f}  {:>6.1f}  {:>12}\n'.format(
+                '{}:{}'.format(row['pathname'], row['method']), row['calls'],
+                row['inclusive'], row['exclusive'],
+                100.0 * row['exclusive'] / total if total else 0.0,
+                row['allocated'] if self.trace_memory else '-', w=width))
+
+    def write_folded(self, filepath):
+        """
+        Write the exclusive times in the folded stack format read by flame graph tools.
+        Each line is the ';' separated call stack followed by its exclusive time in
+        microseconds.
+        Parameters
+        ----------
+        filepath : str
+            Path of the file.
+        """
+        with open(filepath, 'w') as f:
+            for stack, excl in self._stacks.items():
+                usec = excl // 1000
+                if usec > 0:
+                    f.write('{} {}\n'.format(';'.join(stack), usec))
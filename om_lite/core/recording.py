@@ -0,0 +1,466 @@
+"""Case recording to an append-only binary file."""
+import atexit
+import json
+import queue
+import struct
+import threading
+import time
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+from om_lite.core.options_dictionary import OptionsDictionary
+
+# The file starts with _MAGIC, followed by records made of a _RECORD_HEADER (tag, schema id,
+# payload size) and the payload. A b'META' payload is the JSON description of a schema: the
+# source and the name and shape of each recorded variable. A b'CASE' payload is a _CASE_HEADER
+# (counter, timestamp, abs_err, rel_err, coordinate length, success), the coordinate padded to
+# _COORD_ALIGN bytes and the float64 values of the variables of its schema. Payloads are padded
+# to a multiple of 8 bytes, so the values of a case can be viewed in place without copying.
+_MAGIC = b'OMLREC01'
+_RECORD_HEADER = struct.Struct('<4sIQ')
+_CASE_HEADER = struct.Struct('<QdddIHxx')
+
+# put in the queue to stop the writer thread
+_STOP = object()
+
+
+# coordinates are padded to a multiple of this, so the cases of a source keep the same size
+# as their iteration count grows, and a variable history is evenly spaced in the file
+_COORD_ALIGN = 64
+
+
+def _padded(nbytes, align=8):
+    return -(-nbytes // align) * align
+
+
+class _RecIteration(object):
+    """
+    Keep track of the coordinates of the cases being recorded.
+    Attributes
+    ----------
+    stack : list of tuple
+        Stack of (name, iteration count) of the drivers being run.
+    prefix : str or None
+        Prefix added to the coordinates of recorded cases.
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.prefix = None
+
+    def get_coord(self, coord):
+        """
+        Return the full coordinate of a case recorded at the current iteration.
+        Parameters
+        ----------
+        coord : str
+            Coordinate of the case within the iterations being run.
+        Returns
+        -------
+        str
+            The iterations of the stack, then coord, then prefixed by the case prefix.
+        """
+        if self.stack:
+            coord = '|'.join(['{}|{}'.format(name, count) for name, count in self.stack] +
+                             [coord])
+        if self.prefix:
+            coord = '{}_{}'.format(self.prefix, coord)
+        return coord
+
+
+def record_model_options(problem, run_number):
+    """
+    Record the options of all systems and solvers of a problem.
+    Parameters
+    ----------
+    problem : Problem
+        The problem whose model options are recorded.
+    run_number : int
+        Number of times run_driver or run_model has been called.
+    """
+    pass
+
+
+class BinaryRecorder(object):
+    """
+    Recorder appending cases to a chunked binary file from a background thread.
+    Recording a case only copies the recorded values into one array and puts it in a bounded
+    queue. A writer thread serializes the cases and writes them in chunks of at least
+    chunk_size bytes, so the run is only slowed down when the queue is full.
+    Attributes
+    ----------
+    options : OptionsDictionary
+        Options of this recorder.
+    _filepath : str
+        Path of the file.
+    _file : file or None
+        The open file, None before startup and after shutdown.
+    _queue : Queue or None
+        Records waiting to be written.
+    _thread : Thread or None
+        The writer thread.
+    _schemas : list of dict
+        Source, names and shapes of each schema, the index being the schema id.
+    _counter : int
+        Number of cases recorded.
+    _error : Exception or None
+        Error raised by the writer thread, raised again in the recording thread.
+    """
+
+    def __init__(self, filepath, **kwargs):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        filepath : str
+            Path of the file, overwritten on the first startup.
+        **kwargs : dict
+            Options of the recorder.
+        """
+        self._filepath = filepath
+        self._file = None
+        self._queue = None
+        self._thread = None
+        self._schemas = []
+        self._counter = 0
+        self._error = None
+
+        self.options = OptionsDictionary()
+        self.options.declare('queue_size', types=int, default=64, lower=1,
+                             desc='Number of cases that can wait to be written before '
+                             'recording blocks.')
+        self.options.declare('chunk_size', types=int, default=2 ** 20, lower=0,
+                             desc='Number of bytes gathered before a write to the file.')
+        self.options.update(kwargs)
+
+    def startup(self):
+        """
+        Open the file and start the writer thread, if not already done.
+        The file is truncated on the first startup and appended to after a shutdown.
+        """
+        if self._thread is not None:
+            return
+
+        if self._schemas:
+            self._file = open(self._filepath, 'ab')
+        else:
+            self._file = open(self._filepath, 'wb')
+            self._file.write(_MAGIC)
+
+        self._queue = queue.Queue(self.options['queue_size'])
+        self._thread = threading.Thread(target=self._write_loop, name='BinaryRecorder',
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def _add_schema(self, source, names, shapes):
+        """
+        Declare the variables recorded together in the cases of one source.
+        Parameters
+        ----------
+        source : str
+            Name of the driver, solver or problem recording the cases.
+        names : list of str
+            Names of the recorded variables.
+        shapes : list of tuple
+            Shape of each variable.
+        Returns
+        -------
+        int
+            The schema id.
+        """
+        self.startup()
+        schema = {'source': source, 'names': list(names),
+                  'shapes': [list(shape) for shape in shapes]}
+        schema_id = len(self._schemas)
+        self._schemas.append(schema)
+        self._put((b'META', schema_id, json.dumps(schema).encode('utf-8')))
+        return schema_id
+
+    def record_iteration(self, schema_id, coord, data, abs_err=np.nan, rel_err=np.nan,
+                         success=True):
+        """
+        Queue one case for writing.
+        Parameters
+        ----------
+        schema_id : int
+            Schema of the case.
+        coord : str
+            Coordinate of the case.
+        data : ndarray
+            Flat float values of the variables of the schema, not modified afterwards.
+        abs_err : float
+            Absolute residual norm, for cases recorded by solvers.
+        rel_err : float
+            Relative residual norm, for cases recorded by solvers.
+        success : bool
+            False if the iteration failed.
+        """
+        header = _CASE_HEADER.pack(self._counter, time.time(), abs_err, rel_err,
+                                   len(coord.encode('utf-8')), success)
+        self._counter += 1
+        self._put((b'CASE', schema_id, (header, coord.encode('utf-8'), data)))
+
+    def _put(self, item):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def _write_loop(self):
+        """
+        Write the queued records to the file until _STOP is received.
+        """
+        chunk = bytearray()
+        chunk_size = self.options['chunk_size']
+        f = self._file
+        q = self._queue
+        while True:
+            item = q.get()
+            try:
+                if item is _STOP:
+                    f.write(chunk)
+                    f.flush()
+                    return
+
+                tag, schema_id, payload = item
+                if tag == b'META':
+                    chunk += _RECORD_HEADER.pack(tag, schema_id, len(payload))
+                    chunk += payload
+                    chunk += bytes(_padded(len(payload)) - len(payload))
+                else:
+                    header, coord, data = payload
+                    coord_size = _padded(len(coord), _COORD_ALIGN)
+                    chunk += _RECORD_HEADER.pack(
+                        tag, schema_id, len(header) + coord_size + data.nbytes)
+                    chunk += header
+                    chunk += coord
+                    chunk += bytes(coord_size - len(coord))
+                    if len(chunk) + data.nbytes >= chunk_size:
+                        # values filling the chunk go straight from the array to the file
+                        f.write(chunk)
+                        chunk.clear()
+                        f.write(memoryview(data))
+                    else:
+                        chunk += memoryview(data)
+
+                if len(chunk) >= chunk_size or q.empty():
+                    f.write(chunk)
+                    chunk.clear()
+            except Exception as err:
+                self._error = err
+            finally:
+                q.task_done()
+
+    def flush(self):
+        """
+        Wait until all queued cases are written to the file.
+        """
+        if self._thread is not None:
+            self._queue.join()
+            self._file.flush()
+        if self._error is not None:
+            raise self._error
+
+    def shutdown(self):
+        """
+        Write the queued cases, stop the writer thread and close the file.
+        """
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+        self._thread = self._queue = self._file = None
+        atexit.unregister(self.shutdown)
+        if self._error is not None:
+            raise self._error
+
+
+def _declare_recording_options(options, includes):
+    """
+    Declare the options selecting what a driver, solver or problem records.
+    Parameters
+    ----------
+    options : OptionsDictionary
+        The recording options.
+    includes : list of str
+        Default patterns of the recorded outputs.
+    """
+    options.declare('record_desvars', types=bool, default=True,
+                    desc='Set to True to record the design variables.')
+    options.declare('record_responses', types=bool, default=True,
+                    desc='Set to True to record the objectives and constraints.')
+    options.declare('includes', types=list, default=includes,
+                    desc='Patterns of the names of the other outputs to record.')
+    options.declare('excludes', types=list, default=[],
+                    desc='Patterns of the names of outputs not to record, applied to the '
+                    'includes.')
+
+
+class _RecordingManager(object):
+    """
+    The recorders of one driver, solver or problem and the variables they record.
+    Attributes
+    ----------
+    recorders : list of BinaryRecorder
+        The recorders.
+    _problem : Problem or None
+        The problem whose name table locates the recorded variables.
+    _records : list of dict
+        Name table record of each recorded variable.
+    _schema_ids : list of int
+        Schema of the cases in each recorder.
+    """
+
+    def __init__(self):
+        """
+        Initialize all attributes.
+        """
+        self.recorders = []
+        self._problem = None
+        self._records = []
+        self._schema_ids = []
+
+    def __bool__(self):
+        return bool(self.recorders)
+
+    def __getstate__(self):
+        """
+        Return the state sent to a worker process, which records nothing.
+        Returns
+        -------
+        dict
+            The picklable state.
+        """
+        return {'recorders': [], '_problem': None, '_records': [], '_schema_ids': []}
+
+    def append(self, recorder):
+        """
+        Add a recorder.
+        Parameters
+        ----------
+        recorder : BinaryRecorder
+            The recorder.
+        """
+        if recorder not in self.recorders:
+            self.recorders.append(recorder)
+
+    def startup(self, source, problem, names):
+        """
+        Register the recorded variables in every recorder.
+        Parameters
+        ----------
+        source : str
+            Name of the driver, solver or problem.
+        problem : Problem
+            The problem, after its name table is built.
+        names : list of str
+            Promoted or absolute names of the recorded variables.
+        """
+        self._problem = problem
+        table = problem._name_table
+        names = [name for name in dict.fromkeys(names) if name in table]
+        self._records = [table[name] for name in names]
+        shapes = [record['shape'] for record in self._records]
+        self._schema_ids = [rec._add_schema(source, names, shapes) for rec in self.recorders]
+
+    def record_iteration(self, coord, abs_err=np.nan, rel_err=np.nan, success=True):
+        """
+        Record the current values of the variables in every recorder.
+        Parameters
+        ----------
+        coord : str
+            Coordinate of the case, within the driver iterations being run.
+        abs_err : float
+            Absolute residual norm, for cases recorded by solvers.
+        rel_err : float
+            Relative residual norm, for cases recorded by solvers.
+        success : bool
+            False if the iteration failed.
+        """
+        coord = self._problem._recording_iter.get_coord(coord)
+
+        get = self._problem._get_resolved
+        if self._records:
+            data = np.concatenate([np.ravel(get(record)) for record in self._records])
+        else:
+            data = np.zeros(0)
+        for recorder, schema_id in zip(self.recorders, self._schema_ids):
+            recorder.record_iteration(schema_id, coord, data, abs_err, rel_err, success)
+
+    def add_schema(self, source, names, shapes):
+        """
+        Register variables recorded with record_data in every recorder.
+        Parameters
+        ----------
+        source : str
+            Name of the driver, solver or problem.
+        names : list of str
+            Names of the variables.
+        shapes : list of tuple
+            Shape of each variable.
+        Returns
+        -------
+        list of int
+            The schema id in each recorder.
+        """
+        return [rec._add_schema(source, names, shapes) for rec in self.recorders]
+
+    def record_data(self, coord, schema_ids, data, success=True):
+        """
+        Record flat values laid out by schemas registered with add_schema.
+        Parameters
+        ----------
+        coord : str
+            Coordinate of the case.
+        schema_ids : list of int
+            Schema of the case in each recorder.
+        data : ndarray
+            Flat values of the case.
+        success : bool
+            False if the case failed.
+        """
+        coord = self._problem._recording_iter.get_coord(coord)
+        for recorder, schema_id in zip(self.recorders, schema_ids):
+            recorder.record_iteration(schema_id, coord, data, success=success)
+
+    def shutdown(self):
+        """
+        Shut down every recorder.
+        """
+        for recorder in self.recorders:
+            recorder.shutdown()
+
+
+def _get_recorded_names(problem, options, candidates):
+    """
+    Return the names of the variables selected by recording options.
+    Parameters
+    ----------
+    problem : Problem
+        The problem.
+    options : OptionsDictionary
+        The recording options.
+    candidates : list of str
+        Names of the outputs the includes and excludes are matched against.
+    Returns
+    -------
+    list of str
+        The design variables and responses, if recorded, then the included outputs.
+    """
+    model = problem.model
+    names = []
+    if 'record_desvars' in options and options['record_desvars']:
+        names.extend(model.get_design_vars())
+    if 'record_responses' in options and options['record_responses']:
+        names.extend(model.get_responses())
+
+    includes = options['includes']
+    excludes = options['excludes']
+    for name in candidates:
+        if any(fnmatchcase(name, pat) for pat in includes) and \
+                not any(fnmatchcase(name, pat) for pat in excludes):
+            names.append(name)
+    return names
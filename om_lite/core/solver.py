@@ -0,0 +1,332 @@
+"""Define the base Solver, NonlinearSolver and LinearSolver classes."""
+import numpy as np
+
+from om_lite.core.options_dictionary import OptionsDictionary
+from om_lite.core.profiling import _drop_timed
+from om_lite.core.recording import _RecordingManager
+
+
+class AnalysisError(Exception):
+    """
+    Raised when a solver fails to converge and err_on_non_converge is set.
+    """
+
+    pass
+
+
+class Solver(object):
+    """
+    Base solver class.
+    Attributes
+    ----------
+    options : OptionsDictionary
+        Options of this solver.
+    recording_options : OptionsDictionary
+        Outputs of the system recorded at each iteration.
+    _system : System or None
+        The system that owns this solver.
+    _iter_count : int
+        Number of iterations of the current (or last) solve.
+    _rec_mgr : _RecordingManager
+        The recorders of this solver.
+    _rec_parents : list of Solver
+        The solvers whose iterations run this one, outermost first, in recorded coordinates.
+    """
+
+    SOLVER = 'base_solver'
+
+    def __init__(self, **kwargs):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        **kwargs : dict
+            Options of the solver.
+        """
+        self._system = None
+        self._iter_count = 0
+        self._rec_mgr = _RecordingManager()
+        self._rec_parents = []
+
+        self.options = OptionsDictionary()
+        self.options.declare('maxiter', types=int, default=10,
+                             desc='maximum number of iterations')
+        self.options.declare('atol', default=1e-10,
+                             desc='absolute error tolerance')
+        self.options.declare('rtol', default=1e-10,
+                             desc='relative error tolerance')
+        self.options.declare('iprint', types=int, default=1,
+                             desc='whether to print output')
+        self.options.declare('err_on_non_converge', types=bool, default=False,
+                             desc="When True, AnalysisError will be raised if we don't "
+                             "converge.")
+
+        self.recording_options = OptionsDictionary()
+        self.recording_options.declare('includes', types=list, default=['*'],
+                                       desc='Patterns of the absolute names of the outputs '
+                                       'of the system to record.')
+        self.recording_options.declare('excludes', types=list, default=[],
+                                       desc='Patterns of the absolute names of outputs not '
+                                       'to record, applied to the includes.')
+
+        self._declare_options()
+        self.options.update(kwargs)
+
+    def _declare_options(self):
+        pass
+
+    def add_recorder(self, recorder):
+        """
+        Record the outputs of the system at each iteration of this solver.
+        Parameters
+        ----------
+        recorder : BinaryRecorder
+            The recorder.
+        """
+        self._rec_mgr.append(recorder)
+
+    def _record_iteration(self, norm, norm0):
+        """
+        Record the current iteration, if there are recorders.
+        Parameters
+        ----------
+        norm : float
+            Absolute residual norm.
+        norm0 : float
+            Residual norm of the first iteration.
+        """
+        if self._rec_mgr:
+            coord = '|'.join(['{}|{}'.format(solver._get_rec_source(), solver._iter_count)
+                              for solver in self._rec_parents + [self]])
+            self._rec_mgr.record_iteration(coord, norm, norm / norm0 if norm0 != 0.0 else 1.0)
+
+    def _setup_rec_parents(self, model):
+        """
+        Find the solvers of the ancestors of the owning system that run this solver.
+        An ancestor group with a nonlinear solver runs all its descendants in its iterations,
+        one without runs them in the iterations of its cycle solver if they are in a cycle.
+        Parameters
+        ----------
+        model : System
+            The model.
+        """
+        self._rec_parents = parents = []
+        system = model
+        pathname = self._system.pathname
+        for name in pathname.split('.') if pathname else []:
+            if system._nonlinear_solver is not None:
+                parents.append(system._nonlinear_solver)
+            elif getattr(system, '_cycle_solver', None) is not None and \
+                    any(name in scc for scc in system._sccs if len(scc) > 1):
+                parents.append(system._cycle_solver)
+            system = system._subsystems_allprocs[name]
+
+    def _get_rec_source(self):
+        """
+        Return the name of this solver in recorded cases.
+        Returns
+        -------
+        str
+            Pathname of the system and type of the solver.
+        """
+        return '{}.{}'.format(self._system.pathname or 'root', self.SOLVER)
+
+    def __getstate__(self):
+        """
+        Return the state of this solver to be sent to a worker process.
+        Returns
+        -------
+        dict
+            The picklable state, without profiling wrappers.
+        """
+        return _drop_timed(self.__dict__.copy())
+
+    @property
+    def msginfo(self):
+        """
+        Our class name and the pathname of our system, for use in error messages.
+        """
+        if self._system is None:
+            return type(self).__name__
+        return '{} in {}'.format(type(self).__name__, self._system.msginfo)
+
+    def _setup_solvers(self, system, depth):
+        """
+        Assign the system and do any other setup needed before a solve.
+        Parameters
+        ----------
+        system : System
+            The system that owns this solver.
+        depth : int
+            Depth of the system in the model tree.
+        """
+        self._system = system
+        self._depth = depth
+
+    def _print_iter(self, iteration, norm, norm0):
+        """
+        Print the residual norm of one iteration.
+        Parameters
+        ----------
+        iteration : int
+            Iteration number.
+        norm : float
+            Absolute residual norm.
+        norm0 : float
+            Residual norm of the first iteration.
+        """
+        if self.options['iprint'] > 1:
+            pathname = self._system.pathname
+            prefix = '{}{} '.format(pathname + ': ' if pathname else '',
+                                    self.SOLVER)
+            print('{}{} ; {:.9g} {:.9g}'.format(prefix, iteration, norm,
+                                                norm / norm0 if norm0 != 0.0 else 1.0))
+
+    def _check_convergence(self, norm, norm0):
+        """
+        Handle a solve that ran out of iterations.
+        Parameters
+        ----------
+        norm : float
+            Absolute residual norm at the last iteration.
+        norm0 : float
+            Residual norm of the first iteration.
+        """
+        if norm > self.options['atol'] and norm / (norm0 or 1.0) > self.options['rtol']:
+            msg = "Solver '{}' on system '{}' failed to converge in {} iterations.".format(
+                self.SOLVER, self._system.pathname, self._iter_count)
+            if self.options['err_on_non_converge']:
+                raise AnalysisError(msg)
+            if self.options['iprint'] > -1:
+                print(msg)
+
+
+class NonlinearSolver(Solver):
+    """
+    Base class for nonlinear solvers.
+    """
+
+    def solve(self):
+        """
+        Converge the outputs of the owning system.
+        """
+        pass
+
+
+class LinearSolver(Solver):
+    """
+    Base class for linear solvers.
+    Linear solvers operate on flat arrays laid out like the output vector of their system.
+    In 'fwd' mode they solve J x = rhs, in 'rev' mode J^T x = rhs, where J is the Jacobian of
+    the system residuals with respect to the system outputs.
+    """
+
+    # True if the solver needs the model to assemble its Jacobian
+    _requires_assembled_jac = False
+
+    def _linearize(self):
+        """
+        Perform any required linearization operations such as matrix factorization.
+        """
+        pass
+
+    def solve(self, rhs, mode='fwd', x0=None):
+        """
+        Solve the linear system of the owning system.
+        Parameters
+        ----------
+        rhs : ndarray
+            Right-hand side, of the size of the system output vector.
+        mode : str
+            'fwd' or 'rev'.
+        x0 : ndarray or None
+            Initial guess, only used by iterative solvers.
+        Returns
+        -------
+        ndarray
+            The solution.
+        """
+        raise NotImplementedError("{} does not implement solve.".format(self.msginfo))
+
+    def _solve_block(self, rhs, mode='fwd', x0=None):
+        """
+        Solve the linear system of the owning system for several right-hand sides.
+        Solvers that can reuse work across right-hand sides, like a factorization, override
+        this, the default solves them one at a time.
+        Parameters
+        ----------
+        rhs : ndarray
+            Right-hand sides, one per column, (size of the system output vector) x k.
+        mode : str
+            'fwd' or 'rev'.
+        x0 : ndarray or None
+            Initial guesses, one per column, only used by iterative solvers.
+        Returns
+        -------
+        ndarray
+            The solutions, one per column.
+        """
+        sol = np.empty(rhs.shape)
+        for j in range(rhs.shape[1]):
+            sol[:, j] = self.solve(rhs[:, j], mode, None if x0 is None else x0[:, j])
+        return sol
+
+    def _apply_jac(self, vec, mode):
+        """
+        Multiply a vector by the Jacobian of the owning system without assembling it.
+        Parameters
+        ----------
+        vec : ndarray
+            Flat vector of the size of the system output vector.
+        mode : str
+            'fwd' to multiply by J, 'rev' to multiply by its transpose.
+        Returns
+        -------
+        ndarray
+            The product.
+        """
+        system = self._system
+        d_outputs = system._doutputs.asarray()
+        d_residuals = system._dresiduals.asarray()
+        system._dinputs.asarray()[:] = 0.0
+
+        if mode == 'fwd':
+            d_outputs[:] = vec
+            system._apply_linear('fwd')
+            return d_residuals.copy()
+
+        d_residuals[:] = vec
+        d_outputs[:] = 0.0
+        system._apply_linear('rev')
+        return d_outputs.copy()
+
+    def _get_block_slice(self):
+        """
+        Return the location of the system outputs in the model output vector.
+        Returns
+        -------
+        slice
+            The slice of the system block in the assembled Jacobian.
+        """
+        system = self._system
+        if system.pathname == '':
+            return slice(0, system._outputs.asarray().size)
+
+        slices = system._assembled_jac._system._outputs._slices
+        names = list(system._outputs._slices)
+        return slice(slices[names[0]].start, slices[names[-1]].stop)
+
+    def _get_block_matrix(self):
+        """
+        Return the block of the assembled Jacobian belonging to the system.
+        Returns
+        -------
+        csc_matrix
+            Partials of the system residuals with respect to the system outputs.
+        """
+        mtx = self._system._assembled_jac.get_matrix()
+        if self._system.pathname == '':
+            return mtx.tocsc()
+
+        slc = self._get_block_slice()
+        return mtx[slc, slc].tocsc()
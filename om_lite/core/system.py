@@ -1,12 +1,110 @@
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from om_lite.core.jacobian import AssembledJacobian
 from om_lite.core.options_dictionary import OptionsDictionary
+from om_lite.core.profiling import _drop_timed
+from om_lite.core.units import convert_units
+from om_lite.core.utils import _UNDEFINED, _batch_index, name2abs_names
+from om_lite.core.vector import Vector
+
+
+def _free_shared_memory(blocks):
+    """
+    Unlink and close shared memory blocks.
+    Parameters
+    ----------
+    blocks : list of SharedMemory
+        The blocks.
+    """
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
 
 
 class System(object):
     def __init__(self, **kwargs):
+        self.name = ''
+        self.pathname = ''
+        self.comm = None
         self.options = OptionsDictionary()
+        self.options.declare('assemble_jac', types=bool, default=False,
+                             desc='If True and this is the model, assemble the partials of all '
+                             'components into one sparse Jacobian at setup.')
+        self.options.declare('assembled_jac_type', values=['csc', 'csr'], default='csc',
+                             desc='Sparse format of the assembled Jacobian.')
+        self.iter_count = 0
+
+        self._problem_meta = None
+        self._mode = None
+
+        self._nonlinear_solver = None
+        self._linear_solver = None
+
+        self._subsystems_allprocs = {}
+
+        # promotes requested by the parent group
+        self._var_promotes = {'any': [], 'input': [], 'output': []}
+        self._var_promotes_src_indices = {}
+
+        # per-variable metadata, keyed by absolute name
+        self._var_allprocs_abs2meta = {'input': {}, 'output': {}}
+        self._var_abs2meta = self._var_allprocs_abs2meta
+        self._var_allprocs_prom2abs_list = {'input': {}, 'output': {}}
+        self._var_allprocs_abs2prom = {'input': {}, 'output': {}}
+        self._var_allprocs_discrete = {'input': {}, 'output': {}}
+        self._discrete_inputs = {}
+        self._discrete_outputs = {}
+
+        # all connections at or below this system, abs input name -> abs output name
+        self._conn_global_abs_in2out = {}
+
+        self._inputs = None
+        self._outputs = None
+        self._residuals = None
+
+        # derivative vectors used by matrix-free linear solvers
+        self._dinputs = None
+        self._doutputs = None
+        self._dresiduals = None
 
-    # def initialize(self):
-    #     pass
+        # model level AssembledJacobian, shared by all systems, or None
+        self._assembled_jac = None
+
+        # sources of the inputs of this system tree, used by incremental runs
+        self._input_sources = set()
+
+        # shared memory blocks holding the model vectors, by vector kind (model only), and
+        # the finalizer freeing them if the model is collected or the interpreter exits first
+        self._shared_memory = {}
+        self._shared_memory_finalizer = None
+
+        # design vars and responses added outside of setup are kept across setups
+        self._static_design_vars = {}
+        self._static_responses = {}
+        self._design_vars = {}
+        self._responses = {}
+
+    def initialize(self):
+        pass
+
+    @property
+    def msginfo(self):
+        """
+        Our instance pathname and class, for use in error messages.
+        """
+        if self.pathname == '':
+            return "<model> <class {}>".format(type(self).__name__)
+        return "'{}' <class {}>".format(self.pathname, type(self).__name__)
+
+    @property
+    def _static_mode(self):
+        """
+        True when called outside of Problem setup, e.g. while building the model.
+        """
+        return self._problem_meta is None or self._problem_meta['static_mode']
 
     @property
     def nonlinear_solver(self):
@@ -36,12 +134,626 @@ class System(object):
         """
         self._linear_solver = solver
 
-    @property
-    def nonlinear_solver(self):
+    def _add_promotes(self, any=None, inputs=None, outputs=None,
+                      src_indices=None, flat_src_indices=None):
         """
-        Get the nonlinear solver for this system.
+        Record variables of this system to be promoted by the parent group.
+        Parameters
+        ----------
+        any : list of str or tuple or None
+            Inputs and outputs to promote.
+        inputs : list of str or tuple or None
+            Inputs to promote.
+        outputs : list of str or tuple or None
+            Outputs to promote.
+        src_indices : int or list of ints or ndarray or None
+            Indices into the source of the promoted inputs.
+        flat_src_indices : bool or None
+            If True, src_indices index the flattened source.
         """
-        return self._nonlinear_solver
+        for io, names in (('any', any), ('input', inputs), ('output', outputs)):
+            if names is None:
+                continue
+            if isinstance(names, str):
+                raise TypeError(
+                    "{}: promotes must be an iterator of strings and/or tuples, not "
+                    "'{}'.".format(self.msginfo, names))
+            self._var_promotes[io].extend(names)
+
+            if src_indices is not None and io != 'output':
+                for name in names:
+                    self._var_promotes_src_indices[name] = (src_indices, flat_src_indices)
+
+    def system_iter(self, include_self=False, recurse=True, typ=None):
+        """
+        Yield the subsystems of this system, depth first.
+        Parameters
+        ----------
+        include_self : bool
+            If True, yield this system first.
+        recurse : bool
+            If True, also yield the subsystems of subsystems.
+        typ : type or None
+            If given, only yield systems of this type.
+        Yields
+        ------
+        System
+            A subsystem.
+        """
+        if include_self and (typ is None or isinstance(self, typ)):
+            yield self
+
+        for subsys in self._subsystems_allprocs.values():
+            if typ is None or isinstance(subsys, typ):
+                yield subsys
+            if recurse:
+                for sub in subsys.system_iter(recurse=True, typ=typ):
+                    yield sub
+
+    def _setup(self, comm, mode, prob_meta):
+        """
+        Perform setup of the system tree rooted at this (model) system.
+        Parameters
+        ----------
+        comm : FakeComm
+            The communicator of the problem.
+        mode : str
+            Derivative direction, 'fwd', 'rev' or 'auto'.
+        prob_meta : dict
+            Problem level metadata shared by all systems.
+        """
+        self._setup_procs('', comm, mode, prob_meta)
+        self._setup_var_data()
+        self._setup_connections()
+
+    def _setup_procs(self, pathname, comm, mode, prob_meta):
+        """
+        Set the pathname of this system, then call the user's setup.
+        Parameters
+        ----------
+        pathname : str
+            Global name of the system, including the path.
+        comm : FakeComm
+            The communicator of the problem.
+        mode : str
+            Derivative direction, 'fwd', 'rev' or 'auto'.
+        prob_meta : dict
+            Problem level metadata shared by all systems.
+        """
+        self.pathname = pathname
+        self.comm = comm
+        self._mode = mode
+        self._problem_meta = prob_meta
+        self.iter_count = 0
+
+        self._inputs = self._outputs = self._residuals = None
+        self._design_vars = {}
+        self._responses = {}
+
+    def _setup_var_data(self):
+        """
+        Compute the variable metadata and promoted name maps of this system.
+        """
+        self._var_allprocs_abs2meta = {'input': {}, 'output': {}}
+        self._var_abs2meta = self._var_allprocs_abs2meta
+        self._var_allprocs_prom2abs_list = {'input': {}, 'output': {}}
+        self._var_allprocs_abs2prom = {'input': {}, 'output': {}}
+
+    def _setup_connections(self):
+        """
+        Compute the connections of this system and its subsystems.
+        """
+        self._conn_global_abs_in2out = {}
+
+    def _final_setup(self):
+        """
+        Allocate the vectors of the system tree rooted at this (model) system.
+        """
+        self._release_shared_memory()
+        shared = any(s._needs_shared_vectors()
+                     for s in self.system_iter(include_self=True, recurse=True))
+
+        root_vectors = {}
+        for kind, io in (('input', 'input'), ('output', 'output'),
+                         ('residual', 'output')):
+            vec = Vector(kind)
+            for abs_name, meta in self._var_allprocs_abs2meta[io].items():
+                vec._add_var(abs_name, meta['val'], meta['shape'])
+
+            data = None
+            if shared:
+                # worker processes of a ParallelGroup write their outputs straight into these
+                size = sum(meta['size'] for meta in vec._abs2meta.values())
+                shm = SharedMemory(create=True, size=max(size, 1) * 8)
+                self._shared_memory[kind] = shm
+                data = np.ndarray((size, ), dtype=float, buffer=shm.buf)
+            vec._allocate(data)
+            root_vectors[kind] = vec
+
+        if shared:
+            self._shared_memory_finalizer = weakref.finalize(
+                self, _free_shared_memory, list(self._shared_memory.values()))
+
+        # derivative vectors for matrix-free linear solvers, always local to this process
+        for kind, io in (('input', 'input'), ('output', 'output'),
+                         ('residual', 'output')):
+            vec = Vector(kind)
+            for abs_name, meta in self._var_allprocs_abs2meta[io].items():
+                vec._add_var(abs_name, None, meta['shape'])
+            vec._allocate()
+            root_vectors['d_' + kind] = vec
+
+        self._setup_vectors(root_vectors)
+        self._setup_solvers()
+
+        conns = self._conn_global_abs_in2out
+        for system in self.system_iter(include_self=True, recurse=True):
+            system._input_sources = {conns[abs_in] for abs_in in
+                                     system._var_allprocs_abs2meta['input'] if abs_in in conns}
+        self._setup_jacobians()
+
+    def _needs_shared_vectors(self):
+        """
+        Return True if this system needs the model vectors to be in shared memory.
+        Returns
+        -------
+        bool
+            True if worker processes need access to the model vectors.
+        """
+        return False
+
+    def _release_shared_memory(self):
+        """
+        Free the shared memory blocks holding the model vectors, if any.
+        """
+        for subsys in self.system_iter(include_self=True, recurse=True):
+            if hasattr(subsys, '_shutdown'):
+                subsys._shutdown()
+
+        if self._shared_memory_finalizer is not None:
+            self._shared_memory_finalizer()
+            self._shared_memory_finalizer = None
+        self._shared_memory = {}
+
+    def __getstate__(self):
+        """
+        Return the state of this system to be sent to a worker process.
+        Problem metadata, vectors and the assembled Jacobian are rebuilt on the other side.
+        Returns
+        -------
+        dict
+            The picklable state.
+        """
+        state = self.__dict__.copy()
+        for name in ('_problem_meta', '_assembled_jac', '_inputs', '_outputs', '_residuals',
+                     '_dinputs', '_doutputs', '_dresiduals', 'inputs', 'outputs', 'residuals'):
+            if name in state:
+                state[name] = None
+        state['_shared_memory'] = {}
+        state['_shared_memory_finalizer'] = None
+        return _drop_timed(state)
+
+    def _setup_jacobians(self):
+        """
+        Create the assembled Jacobian if it was requested through the model options.
+        """
+        jac = None
+        if self.options['assemble_jac'] or self._requires_assembled_jac():
+            jac = AssembledJacobian(self, self.options['assembled_jac_type'])
+
+        for system in self.system_iter(include_self=True, recurse=True):
+            system._assembled_jac = jac
+
+    def _setup_vectors(self, root_vectors):
+        """
+        Create views of the root vectors for this system and its subsystems.
+        Parameters
+        ----------
+        root_vectors : dict of Vector
+            The model level 'input', 'output' and 'residual' vectors, and optionally the
+            'd_input', 'd_output' and 'd_residual' vectors used by linear solvers.
+        """
+        vectors = {}
+        for kind, vec in root_vectors.items():
+            vectors[kind] = vec if self.pathname == '' else vec._get_subvector(self.pathname)
+
+        self._inputs = vectors['input']
+        self._outputs = vectors['output']
+        self._residuals = vectors['residual']
+        self._dinputs = vectors.get('d_input')
+        self._doutputs = vectors.get('d_output')
+        self._dresiduals = vectors.get('d_residual')
+
+        for subsys in self._subsystems_allprocs.values():
+            subsys._setup_vectors(root_vectors)
+
+    def run_solve_nonlinear(self):
+        """
+        Compute the outputs of this system.
+        """
+        self._solve_nonlinear()
+
+    def _solve_nonlinear(self):
+        pass
+
+    def _needs_rerun(self, changed, dirty):
+        """
+        Check if an incremental run has to run this system.
+        Parameters
+        ----------
+        changed : set of str
+            Outputs changed since the last run, by set_val or by the systems run so far.
+        dirty : set of str
+            Outputs changed by set_val since the last run.
+        Returns
+        -------
+        bool
+            True if one of the inputs or outputs of this system changed.
+        """
+        return not (changed.isdisjoint(self._input_sources) and
+                    dirty.isdisjoint(self._outputs._abs2meta))
+
+    def _solve_nonlinear_incremental(self, changed, dirty, skipped):
+        """
+        Compute the outputs of this system, only re-running what depends on changed variables.
+        The default runs the whole system.
+        Parameters
+        ----------
+        changed : set of str
+            Outputs changed since the last run, by set_val or by the systems run so far. The
+            outputs of this system are added to it.
+        dirty : set of str
+            Outputs changed by set_val since the last run.
+        skipped : list of str
+            Pathnames of the skipped components, appended to.
+        """
+        self.run_solve_nonlinear()
+        changed.update(self._outputs._abs2meta)
+
+    def _solve_nonlinear_batch(self, vectors, npts):
+        """
+        Compute the outputs of this system at every point of a batch.
+        The default runs the system once per point on its own vectors, which are left holding
+        the last point.
+        Parameters
+        ----------
+        vectors : dict of Vector
+            Batched 'input' and 'output' vectors of this system, whose variables have a leading
+            batch axis.
+        npts : int
+            Number of points in the batch.
+        """
+        inputs = self._inputs.asarray()
+        outputs = self._outputs.asarray()
+        in_idxs = _batch_index(self._inputs._slices, npts)
+        out_idxs = _batch_index(self._outputs._slices, npts)
+        batch_outputs = vectors['output'].asarray()
+
+        in_points = vectors['input'].asarray()[in_idxs]
+        out_points = batch_outputs[out_idxs]
+        for i in range(npts):
+            inputs[:] = in_points[i]
+            outputs[:] = out_points[i]
+            self.run_solve_nonlinear()
+            out_points[i] = outputs
+        batch_outputs[out_idxs] = out_points
+
+    def run_linearize(self):
+        """
+        Compute the partials of all components in this system.
+        """
+        self._linearize()
+
+    def _linearize(self, sub_do_ln=True):
+        """
+        Compute the partials of this system and factorize its linear solver.
+        Parameters
+        ----------
+        sub_do_ln : bool
+            If False, the linear solver of this system is not linearized, e.g. because the
+            caller uses its own.
+        """
+        if sub_do_ln and self._linear_solver is not None:
+            self._linear_solver._linearize()
+
+    def _apply_linear(self, mode):
+        """
+        Multiply the linear vectors by the Jacobian of this system.
+        In 'fwd' mode d_residuals = J d_outputs, in 'rev' mode J^T d_residuals is added to
+        d_outputs. J only couples the outputs of this system, so d_inputs must be zero on entry
+        (and d_outputs too in 'rev' mode).
+        Parameters
+        ----------
+        mode : str
+            'fwd' or 'rev'.
+        """
+        pass
+
+    def run_apply_nonlinear(self):
+        """
+        Compute the residuals of this system.
+        """
+        self._apply_nonlinear()
+
+    def _apply_nonlinear(self):
+        pass
+
+    def _reset_iter_counts(self):
+        """
+        Recursively reset iteration counter for all systems.
+        """
+        for subsys in self.system_iter(include_self=True, recurse=True):
+            subsys.iter_count = 0
+
+    def _clear_iprint(self):
+        """
+        Clear out the iprint stack from the solvers.
+        """
+        pass
+
+    def _abs_get_val(self, abs_name, kind=None, from_src=True):
+        """
+        Get the value of a variable by its absolute name.
+        Parameters
+        ----------
+        abs_name : str
+            Absolute name of the variable.
+        kind : str or None
+            'input' or 'output', looked up if None.
+        from_src : bool
+            If True, return the value of the source of a connected input.
+        Returns
+        -------
+        ndarray or _UNDEFINED
+            The value, or _UNDEFINED if the variable is not found.
+        """
+        if kind is None:
+            kind = 'output' if abs_name in self._var_allprocs_abs2meta[
+                'output'] else 'input'
+
+        if kind == 'input' and from_src and abs_name in self._conn_global_abs_in2out:
+            src = self._conn_global_abs_in2out[abs_name]
+            meta = self._var_allprocs_abs2meta['input'][abs_name]
+            val = self._abs_get_val(src, 'output')
+            if val is _UNDEFINED:
+                return val
+            if meta['has_src_indices']:
+                val = val.ravel()[meta['src_indices']]
+            val = convert_units(val, self._var_allprocs_abs2meta['output'][src]['units'],
+                                meta['units'])
+            return val.reshape(meta['shape'])
+
+        meta = self._var_allprocs_abs2meta[kind].get(abs_name)
+        if meta is None:
+            return _UNDEFINED
+
+        vec = self._outputs if kind == 'output' else self._inputs
+        if vec is None:
+            return meta['val'].reshape(meta['shape'])
+
+        return vec._abs_get_val(abs_name, flat=False)
+
+    def get_val(self, name, units=None, indices=None, get_remote=False,
+                from_src=True):
+        """
+        Get an output/input variable.
+        Parameters
+        ----------
+        name : str
+            Promoted or relative variable name in this system's namespace.
+        units : str, optional
+            Units to convert to before return.
+        indices : int or list of ints or tuple of ints or int ndarray or Iterable or None, optional
+            Indices or slice to return.
+        get_remote : bool or None
+            Unused, all variables are local.
+        from_src : bool
+            If True, return the value of the source of a connected input.
+        Returns
+        -------
+        object
+            The value of the requested output/input variable.
+        """
+        abs_names = name2abs_names(self, name)
+        if not abs_names:
+            raise KeyError('{}: Variable name "{}" not found.'.format(
+                self.msginfo, name))
+
+        val = self._abs_get_val(abs_names[0], from_src=from_src)
+
+        if indices is not None:
+            val = val[indices]
+        if units is not None:
+            val = self.convert2units(name, val, units)
+
+        return val
+
+    def convert2units(self, name, val, units):
+        """
+        Convert the given value to the specified units.
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        val : float or ndarray of float
+            The value of the variable.
+        units : str
+            The units to convert to.
+        Returns
+        -------
+        float or ndarray of float
+            The value converted to the specified units.
+        """
+        return self.convert_units(name, val, self._get_var_units(name), units)
+
+    def convert_from_units(self, name, val, units):
+        """
+        Convert the given value from the specified units to those of the named variable.
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        val : float or ndarray of float
+            The value of the variable.
+        units : str
+            The units to convert from.
+        Returns
+        -------
+        float or ndarray of float
+            The value converted to the units of the named variable.
+        """
+        return self.convert_units(name, val, units, self._get_var_units(name))
+
+    def convert_units(self, name, val, units_from, units_to):
+        """
+        Convert the given value from one set of units to another.
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        val : float or ndarray of float
+            The value of the variable.
+        units_from : str or None
+            The units to convert from, no conversion is done if None.
+        units_to : str or None
+            The units to convert to, no conversion is done if None.
+        Returns
+        -------
+        float or ndarray of float
+            The value converted to the specified units.
+        """
+        try:
+            return convert_units(val, units_from, units_to)
+        except TypeError:
+            raise TypeError("{}: Can't convert '{}' from '{}' to '{}'.".format(
+                self.msginfo, name, units_from, units_to))
+
+    def _get_var_units(self, name):
+        """
+        Return the units of a variable.
+        Parameters
+        ----------
+        name : str
+            Promoted or relative variable name in this system's namespace.
+        Returns
+        -------
+        str or None
+            The units of the variable.
+        """
+        abs_names = name2abs_names(self, name)
+        if not abs_names:
+            raise KeyError('{}: Variable name "{}" not found.'.format(
+                self.msginfo, name))
+        abs_name = abs_names[0]
+        io = 'output' if abs_name in self._var_allprocs_abs2meta['output'] else 'input'
+        return self._var_allprocs_abs2meta[io][abs_name]['units']
+
+    def _setup_solvers(self, depth=0):
+        """
+        Set up the solvers of this system and its subsystems.
+        Parameters
+        ----------
+        depth : int
+            Depth of this system in the model tree.
+        """
+        if self._nonlinear_solver is not None:
+            self._nonlinear_solver._setup_solvers(self, depth)
+        if self._linear_solver is not None:
+            self._linear_solver._setup_solvers(self, depth)
+
+        for subsys in self._subsystems_allprocs.values():
+            subsys._setup_solvers(depth + 1)
+
+    def _requires_assembled_jac(self):
+        """
+        Return True if a solver in this system tree needs the assembled Jacobian.
+        Returns
+        -------
+        bool
+            True if an assembled Jacobian is needed.
+        """
+        for system in self.system_iter(include_self=True, recurse=True):
+            solvers = [system._linear_solver]
+            if system._nonlinear_solver is not None:
+                solvers.append(getattr(system._nonlinear_solver, '_linear_solver', None))
+            for solver in solvers:
+                if solver is not None and solver._requires_assembled_jac:
+                    return True
+        return False
+
+    def _get_scale_factors(self, ref, ref0, adder, scaler):
+        """
+        Combine ref/ref0 or adder/scaler into a single (adder, scaler) pair.
+        Parameters
+        ----------
+        ref : float or ndarray or None
+            Value of the variable that scales to 1.0.
+        ref0 : float or ndarray or None
+            Value of the variable that scales to 0.0.
+        adder : float or ndarray or None
+            Value to add to the variable before scaling.
+        scaler : float or ndarray or None
+            Value to multiply the variable by after adding adder.
+        Returns
+        -------
+        float or ndarray
+            Total adder.
+        float or ndarray
+            Total scaler.
+        """
+        if ref is not None or ref0 is not None:
+            if adder is not None or scaler is not None:
+                raise ValueError("{}: Inputs ref/ref0 are mutually exclusive with "
+                                 "scaler/adder".format(self.msginfo))
+            ref = 1.0 if ref is None else ref
+            ref0 = 0.0 if ref0 is None else ref0
+            adder = -ref0
+            scaler = 1.0 / (np.asarray(ref, dtype=float) - ref0)
+        adder = 0.0 if adder is None else adder
+        scaler = 1.0 if scaler is None else scaler
+        return adder, scaler
+
+    def _add_response_meta(self, responses, name, meta):
+        if self._static_mode:
+            responses = getattr(self, '_static' + responses)
+        else:
+            responses = getattr(self, responses)
+
+        if name in responses:
+            raise RuntimeError("{}: '{}' has already been added.".format(
+                self.msginfo, name))
+
+        if meta.get('indices') is not None:
+            meta['indices'] = np.atleast_1d(np.asarray(meta['indices'], dtype=int))
+        responses[name] = meta
+
+    def add_design_var(self,
+                       name,
+                       lower=None,
+                       upper=None,
+                       ref=None,
+                       ref0=None,
+                       indices=None,
+                       adder=None,
+                       scaler=None,
+                       units=None,
+                       parallel_deriv_color=None,
+                       vectorize_derivs=False,
+                       cache_linear_solution=False):
+        adder, scaler = self._get_scale_factors(ref, ref0, adder, scaler)
+        self._add_response_meta(
+            '_design_vars', name, {
+                'name': name,
+                'lower': lower,
+                'upper': upper,
+                'adder': adder,
+                'scaler': scaler,
+                'indices': indices,
+                'units': units,
+                'parallel_deriv_color': parallel_deriv_color,
+                'vectorize_derivs': vectorize_derivs,
+                'cache_linear_solution': cache_linear_solution,
+            })
 
     def add_constraint(self,
                        name,
@@ -58,7 +770,23 @@ class System(object):
                        parallel_deriv_color=None,
                        vectorize_derivs=False,
                        cache_linear_solution=False):
-        pass
+        adder, scaler = self._get_scale_factors(ref, ref0, adder, scaler)
+        self._add_response_meta(
+            '_responses', name, {
+                'name': name,
+                'type': 'con',
+                'lower': lower,
+                'upper': upper,
+                'equals': equals,
+                'adder': adder,
+                'scaler': scaler,
+                'units': units,
+                'indices': indices,
+                'linear': linear,
+                'parallel_deriv_color': parallel_deriv_color,
+                'vectorize_derivs': vectorize_derivs,
+                'cache_linear_solution': cache_linear_solution,
+            })
 
     def add_objective(self,
                       name,
@@ -71,4 +799,97 @@ class System(object):
                       parallel_deriv_color=None,
                       vectorize_derivs=False,
                       cache_linear_solution=False):
-        pass
\ No newline at end of file
+        adder, scaler = self._get_scale_factors(ref, ref0, adder, scaler)
+        self._add_response_meta(
+            '_responses', name, {
+                'name': name,
+                'type': 'obj',
+                'adder': adder,
+                'scaler': scaler,
+                'units': units,
+                'indices': None if index is None else [index],
+                'linear': False,
+                'parallel_deriv_color': parallel_deriv_color,
+                'vectorize_derivs': vectorize_derivs,
+                'cache_linear_solution': cache_linear_solution,
+            })
+
+    def _get_source(self, name):
+        """
+        Return the absolute name of the output that provides the value of a variable.
+        Parameters
+        ----------
+        name : str
+            Promoted or relative name in this system's namespace.
+        Returns
+        -------
+        str
+            Absolute name of the source output.
+        """
+        abs_names = name2abs_names(self, name)
+        if not abs_names:
+            raise KeyError('{}: Variable name "{}" not found.'.format(self.msginfo, name))
+
+        abs_name = abs_names[0]
+        if abs_name in self._var_allprocs_abs2meta['output']:
+            return abs_name
+
+        model = self._problem_meta['model_ref']()
+        return model._conn_global_abs_in2out[abs_name]
+
+    def _get_var_meta_list(self, attr):
+        """
+        Collect design variables or responses of this system tree, keyed by model name.
+        Parameters
+        ----------
+        attr : str
+            '_design_vars' or '_responses'.
+        Returns
+        -------
+        dict
+            Metadata, with the 'source' and 'size' of each entry filled in.
+        """
+        out = {}
+        model = self._problem_meta['model_ref']()
+        out_meta = model._var_allprocs_abs2meta['output']
+
+        for system in self.system_iter(include_self=True, recurse=True):
+            entries = dict(getattr(system, '_static' + attr))
+            entries.update(getattr(system, attr))
+            for name, meta in entries.items():
+                meta = dict(meta)
+                meta['source'] = src = system._get_source(name)
+                if system is model:
+                    key = name
+                else:
+                    abs_names = name2abs_names(system, name)
+                    io = 'output' if abs_names[0] in out_meta else 'input'
+                    key = model._var_allprocs_abs2prom[io][abs_names[0]]
+                if meta['indices'] is None:
+                    meta['size'] = out_meta[src]['size']
+                else:
+                    meta['size'] = meta['indices'].size
+                out[key] = meta
+
+        return out
+
+    def get_design_vars(self):
+        """
+        Get the design variables of this system tree, keyed by promoted name in the model.
+        Returns
+        -------
+        dict
+            Design variable metadata.
+        """
+        return self._get_var_meta_list('_design_vars')
+
+    def get_responses(self):
+        """
+        Get the objectives and constraints of this system tree, keyed by promoted name in the
+        model.
+        Returns
+        -------
+        dict
+            Response metadata.
+        """
+        return self._get_var_meta_list('_responses')
@@ -0,0 +1,118 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Quadratic(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare('method', default='fd')
+        self.options.declare('form', default=None)
+        self.options.declare('step', default=None)
+        self.options.declare('step_calc', default=None)
+        self.num_computes = 0
+
+    def setup(self):
+        self.add_input('x', np.array([0.5, 1.0, -2.0, 3.0]))
+        self.add_output('y', np.ones(4))
+        arange = np.arange(4)
+        opts = self.options
+        self.declare_partials('y', 'x', rows=arange, cols=arange, method=opts['method'],
+                              form=opts['form'], step=opts['step'],
+                              step_calc=opts['step_calc'])
+
+    def compute(self, inputs, outputs):
+        self.num_computes += 1
+        outputs['y'] = inputs['x'] ** 2
+
+
+class _Mixed(om.ExplicitComponent):
+    def initialize(self):
+        self.num_computes = 0
+
+    def setup(self):
+        self.add_input('x', np.array([0.5, 1.0, 2.0]))
+        self.add_input('a', 3.0)
+        self.add_output('y', np.ones(3))
+        self.add_output('z', 1.0)
+        arange = np.arange(3)
+        self.declare_partials('y', 'x', rows=arange, cols=arange, method='fd', step=1e-7)
+        self.declare_partials('y', 'a')
+        self.declare_partials('z', 'x')
+        self.declare_partials('z', 'a', method='cs')
+
+    def compute(self, inputs, outputs):
+        self.num_computes += 1
+        outputs['y'] = inputs['a'] * inputs['x'] ** 2
+        outputs['z'] = inputs['a'] * np.sum(inputs['x'])
+
+    def compute_partials(self, inputs, outputs, partials):
+        partials['y', 'a'] = inputs['x'] ** 2
+        partials['z', 'x'] = inputs['a'] * np.ones((1, 3))
+
+
+def _approx_problem(comp):
+    prob = om.Problem()
+    prob.model.add_subsystem('comp', comp)
+    prob.setup(force_alloc_complex=True)
+    prob.run_model()
+    comp.num_computes = 0
+    return prob
+
+
+class TestColoredApproximations(unittest.TestCase):
+
+    def test_diagonal_forms(self):
+        # forward and backward differences of x**2 are off by exactly the step
+        x = np.array([0.5, 1.0, -2.0, 3.0])
+        h = 1e-3
+        for form, expected, ncomputes in (('forward', 2.0 * x + h, 2),
+                                          ('backward', 2.0 * x - h, 2),
+                                          ('central', 2.0 * x, 2)):
+            comp = _Quadratic(form=form, step=h)
+            _approx_problem(comp)
+            comp.run_linearize()
+
+            # one color for the whole diagonal, plus the unperturbed point if needed
+            self.assertEqual(comp.num_computes, ncomputes)
+            assert_allclose(comp.partials['y', 'x'], expected, rtol=1e-9)
+
+    def test_diagonal_cs(self):
+        comp = _Quadratic(method='cs')
+        _approx_problem(comp)
+        comp.run_linearize()
+
+        self.assertEqual(comp.num_computes, 1)
+        assert_allclose(comp.partials['y', 'x'], [1.0, 2.0, -4.0, 6.0], rtol=1e-15)
+
+    def test_relative_step(self):
+        x = np.array([0.5, 1.0, -2.0, 3.0])
+        comp = _Quadratic(step=1e-3, step_calc='rel')
+        _approx_problem(comp)
+        comp.run_linearize()
+
+        assert_allclose(comp.partials['y', 'x'], 2.0 * x + 1e-3 * np.abs(x), rtol=1e-9)
+
+    def test_mixed_exact_and_approx(self):
+        comp = _Mixed()
+        prob = _approx_problem(comp)
+        comp.run_linearize()
+
+        # z depends on every x, so the diagonal of y wrt x needs a color per column
+        self.assertEqual(comp.num_computes, 1 + 3 + 1)
+        x = np.array([0.5, 1.0, 2.0])
+        partials = comp.partials
+        assert_allclose(partials['y', 'x'], 6.0 * x, rtol=1e-6)
+        assert_allclose(np.ravel(partials['y', 'a']), x ** 2, rtol=1e-15)
+        assert_allclose(partials['z', 'x'], 3.0 * np.ones((1, 3)), rtol=1e-15)
+        assert_allclose(partials['z', 'a'], [[3.5]], rtol=1e-15)
+
+        totals = prob.compute_totals(['comp.y', 'comp.z'], ['comp.x', 'comp.a'])
+        assert_allclose(totals['comp.y', 'comp.x'], np.diag(6.0 * x), rtol=1e-6)
+        assert_allclose(totals['comp.z', 'comp.a'], [[3.5]], rtol=1e-15)
+
+
+if __name__ == '__main__':
+    unittest.main()
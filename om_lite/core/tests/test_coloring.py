@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Linear(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', np.ones(2))
+        self.add_output('y', np.ones(2))
+        arange = np.arange(2)
+        self.declare_partials('y', 'x', rows=arange, cols=arange, val=3.0)
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = 3.0 * inputs['x']
+
+    def compute_partials(self, inputs, outputs, partials):
+        # constant partials, given at declaration
+        pass
+
+
+class TestTotalColoring(unittest.TestCase):
+
+    def test_constant_partials_restored(self):
+        prob = om.Problem()
+        model = prob.model
+        model.add_subsystem('ivc', om.IndepVarComp('x', np.ones(2)))
+        model.add_subsystem('lin', _Linear())
+        model.connect('ivc.x', 'lin.x')
+        model.add_design_var('ivc.x')
+        model.add_constraint('lin.y', upper=10.0)
+        prob.driver.declare_coloring()
+        prob.options['coloring_dir'] = self._tmpdir()
+        prob.setup(mode='fwd')
+        prob.run_model()
+
+        # the sparsity is found with random partials, the declared ones must be put back
+        for _ in range(2):
+            totals = prob.compute_totals()
+            assert_allclose(totals['lin.y', 'ivc.x'], 3.0 * np.eye(2), rtol=1e-12)
+        self.assertIsNotNone(prob.driver._coloring_info['coloring'])
+
+    def _tmpdir(self):
+        import tempfile
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return tmp.name
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _ScalarPartial(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('w', np.ones(2))
+        self.add_output('z', 0.0)
+        self.declare_partials('z', 'w')
+
+    def compute(self, inputs, outputs):
+        outputs['z'] = 3.0 * np.sum(inputs['w'])
+
+    def compute_partials(self, inputs, outputs, partials):
+        # one value for the whole (1, 2) block
+        partials['z', 'w'] = 3.0
+
+
+class TestApplyPartials(unittest.TestCase):
+
+    def test_scalar_dense_partial(self):
+        for solver in (om.ScipyKrylov, om.DirectSolver):
+            for mode in ('fwd', 'rev'):
+                prob = om.Problem()
+                model = prob.model
+                model.add_subsystem('ivc', om.IndepVarComp('w', np.ones(2)))
+                model.add_subsystem('comp', _ScalarPartial())
+                model.connect('ivc.w', 'comp.w')
+                model.linear_solver = solver()
+                prob.setup(mode=mode)
+                prob.run_model()
+                totals = prob.compute_totals(['comp.z'], ['ivc.w'])
+                assert_allclose(totals['comp.z', 'ivc.w'], [[3.0, 3.0]])
+
+
+class _Double(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', np.ones(2))
+        self.add_output('y', np.ones(2))
+        self.declare_partials('y', 'x')
+        self.num_partials = 0
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = 2.0 * inputs['x']
+
+    def compute_partials(self, inputs, outputs, partials):
+        self.num_partials += 1
+        partials['y', 'x'] = 2.0 * np.eye(2)
+
+
+class TestComputeCache(unittest.TestCase):
+
+    def test_linearize_reuses_compute_lookup(self):
+        prob = om.Problem()
+        model = prob.model
+        model.add_subsystem('ivc', om.IndepVarComp('x', np.ones(2)))
+        comp = model.add_subsystem('comp', _Double(cache_size=4, cache_partials=True))
+        model.connect('ivc.x', 'comp.x')
+        prob.setup()
+
+        prob.run_model()
+        cache = comp._compute_cache
+        prob.compute_totals(['comp.y'], ['ivc.x'])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        prob.run_model()
+        totals = prob.compute_totals(['comp.y'], ['ivc.x'])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(comp.num_partials, 1)
+        assert_allclose(totals['comp.y', 'ivc.x'], 2.0 * np.eye(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
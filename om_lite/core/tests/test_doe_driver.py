@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Double(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', 1.0)
+        self.add_output('y', 1.0)
+        self.declare_partials('y', 'x', val=2.0)
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = 2.0 * inputs['x']
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+class _FailingDouble(_Double):
+    def compute(self, inputs, outputs):
+        if inputs['x'] == 3.0:
+            raise ValueError('no case at x=3')
+        super().compute(inputs, outputs)
+
+
+def _double_problem(xs=range(1, 6), comp_class=_Double, **options):
+    cases = [[('ivc.x', float(x))] for x in xs]
+    prob = om.Problem(driver=om.DOEDriver(om.ListGenerator(cases), **options))
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('x', 0.0))
+    model.add_subsystem('comp', comp_class())
+    model.connect('ivc.x', 'comp.x')
+    model.add_design_var('ivc.x')
+    model.add_objective('comp.y')
+    return prob
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.filepath = os.path.join(tmp.name, 'doe.ckpt')
+
+    def _load(self):
+        prob = _double_problem()
+        prob.setup()
+        prob.final_setup()
+        prob.load_checkpoint(self.filepath)
+        return prob
+
+    def test_serial(self):
+        prob = _double_problem(checkpoint_file=self.filepath, checkpoint_freq=2)
+        prob.setup()
+        prob.run_driver()
+        self.assertEqual(prob.driver.iter_count, 5)
+
+        # saved after the fourth case, holding its state
+        prob = self._load()
+        self.assertEqual(prob.driver.iter_count, 4)
+        assert_allclose(prob.get_val('ivc.x'), 4.0)
+        assert_allclose(prob.get_val('comp.y'), 8.0)
+
+    def test_parallel(self):
+        prob = _double_problem(checkpoint_file=self.filepath, checkpoint_freq=2,
+                               num_workers=2, chunk_size=3)
+        prob.setup()
+        prob.run_driver()
+        self.assertEqual(prob.driver.iter_count, 5)
+        assert_allclose(prob.driver.results['outputs']['comp.y'].ravel(),
+                        2.0 * np.arange(1, 6))
+
+        # saved after the second chunk, passing the fourth case
+        prob = self._load()
+        self.assertEqual(prob.driver.iter_count, 5)
+
+
+class TestFailedCases(unittest.TestCase):
+
+    def test_failure_and_order(self):
+        xs = [5.0, 3.0, 1.0, 4.0, 2.0]
+        for options in ({}, {'num_workers': 2, 'chunk_size': 1}):
+            prob = _double_problem(xs, _FailingDouble, **options)
+            prob.setup()
+            prob.run_model()
+            failed = prob.run_driver()
+
+            results = prob.driver.results
+            self.assertTrue(failed)
+            self.assertEqual(prob.driver.iter_count, 5)
+            assert_allclose(results['inputs']['ivc.x'].ravel(), xs)
+            assert_allclose(results['outputs']['comp.y'].ravel(),
+                            [10.0, np.nan, 2.0, 8.0, 4.0])
+            np.testing.assert_array_equal(results['success'],
+                                          [True, False, True, True, True])
+            self.assertEqual(list(results['errors']), [1])
+            self.assertIn('ValueError: no case at x=3', results['errors'][1])
+
+            # the model is left at the state the cases started from
+            assert_allclose(prob.get_val('ivc.x'), 0.0)
+            assert_allclose(prob.get_val('comp.y'), 0.0)
+
+    def test_no_failure(self):
+        for options in ({}, {'num_workers': 2}):
+            prob = _double_problem(**options)
+            prob.setup()
+            self.assertFalse(prob.run_driver())
+            results = prob.driver.results
+            self.assertTrue(results['success'].all())
+            self.assertEqual(results['errors'], {})
+            assert_allclose(results['outputs']['comp.y'].ravel(), 2.0 * np.arange(1, 6))
+
+
+if __name__ == '__main__':
+    unittest.main()
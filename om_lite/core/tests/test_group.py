@@ -0,0 +1,156 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Square(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', np.ones(3))
+        self.add_output('y', np.ones(3), units='cm')
+        arange = np.arange(3)
+        self.declare_partials('y', 'x', rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = inputs['x'] ** 2
+
+    def compute_partials(self, inputs, outputs, partials):
+        partials['y', 'x'] = 2.0 * inputs['x']
+
+
+class _Sum(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('y', np.ones(3), units='m')
+        self.add_output('f', 0.0)
+        self.declare_partials('f', 'y', val=np.ones((1, 3)))
+
+    def compute(self, inputs, outputs):
+        outputs['f'] = np.sum(inputs['y'])
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+def _chain_problem(linear_solver):
+    prob = om.Problem()
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('x', np.array([1.0, 2.0, 3.0])))
+    sub = model.add_subsystem('sub', om.Group())
+    sub.add_subsystem('sq', _Square())
+    model.add_subsystem('sum', _Sum())
+    model.connect('ivc.x', 'sub.sq.x')
+    model.connect('sub.sq.y', 'sum.y')
+    model.linear_solver = linear_solver
+    return prob
+
+
+class TestTransferLinear(unittest.TestCase):
+
+    def _check(self, linear_solver, mode):
+        prob = _chain_problem(linear_solver)
+        prob.setup(mode=mode)
+        prob.run_model()
+        totals = prob.compute_totals(['sum.f'], ['ivc.x'])
+        assert_allclose(totals['sum.f', 'ivc.x'], [[0.02, 0.04, 0.06]], rtol=1e-8)
+
+    def test_krylov_rev(self):
+        # matrix-free reverse transfers gather the input derivatives through a slice
+        self._check(om.ScipyKrylov(), 'rev')
+
+    def test_krylov_fwd(self):
+        self._check(om.ScipyKrylov(), 'fwd')
+
+    def test_direct_rev(self):
+        self._check(om.DirectSolver(), 'rev')
+
+    def test_block_jac_rev(self):
+        solver = om.ScipyKrylov()
+        solver.precon = om.LinearBlockJac()
+        self._check(solver, 'rev')
+
+
+class _Affine(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', 1.0)
+        self.add_output('y', 1.0)
+        self.declare_partials('y', 'x', val=2.0)
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = 2.0 * inputs['x'] + 1.0
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+class TestConnections(unittest.TestCase):
+
+    def test_connect_within_subgroup_from_ancestor(self):
+        prob = om.Problem()
+        model = prob.model
+        model.add_subsystem('ivc', om.IndepVarComp('x', 2.0))
+        g = model.add_subsystem('g', om.Group())
+        # added in reverse order, the subgroup must still run a before b
+        g.add_subsystem('b', _Affine())
+        g.add_subsystem('a', _Affine())
+        model.connect('ivc.x', 'g.a.x')
+        model.connect('g.a.y', 'g.b.x')
+        prob.setup()
+        prob.run_model()
+
+        self.assertEqual(prob.get_val('g.a.y'), 5.0)
+        self.assertEqual(prob.get_val('g.b.y'), 11.0)
+        self.assertEqual(g.get_cycles(), [])
+        totals = prob.compute_totals(['g.b.y'], ['ivc.x'])
+        assert_allclose(totals['g.b.y', 'ivc.x'], [[4.0]])
+
+
+class _Triple(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', np.ones(3))
+        self.add_output('y', np.ones(3))
+        self.declare_partials('y', 'x', val=3.0 * np.eye(3))
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = 3.0 * inputs['x']
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+class TestSrcIndices(unittest.TestCase):
+
+    def _check(self, src_indices, flat_src_indices=None):
+        prob = om.Problem()
+        model = prob.model
+        model.add_subsystem('ivc', om.IndepVarComp('x', np.arange(6.0).reshape(2, 3)))
+        model.add_subsystem('c', _Triple())
+        model.connect('ivc.x', 'c.x', src_indices=src_indices,
+                      flat_src_indices=flat_src_indices)
+        prob.setup()
+        prob.run_model()
+
+        # entries (0, 2), (1, 0) and (1, 2), at flat positions 2, 3 and 5
+        assert_allclose(prob.get_val('c.y'), [6.0, 9.0, 15.0])
+        expected = np.zeros((3, 6))
+        expected[[0, 1, 2], [2, 3, 5]] = 3.0
+        totals = prob.compute_totals(['c.y'], ['ivc.x'])
+        assert_allclose(totals['c.y', 'ivc.x'], expected)
+
+    def test_tuple(self):
+        self._check(([0, 1, 1], [2, 0, -1]))
+
+    def test_index_rows(self):
+        self._check([[0, 2], [1, 0], [1, 2]])
+
+    def test_flat(self):
+        self._check([2, 3, 5], flat_src_indices=True)
+
+    def test_bad_size(self):
+        with self.assertRaises(ValueError):
+            self._check(([0, 1], [2, 0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
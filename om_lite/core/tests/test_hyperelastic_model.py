@@ -0,0 +1,83 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+
+def _import_hyperelastic_model():
+    # atomics is only needed by HyperElasticModel.setup, which the tests replace
+    stubs = {}
+    for name, attrs in (('atomics', ()),
+                        ('atomics.api', ('PDEProblem',)),
+                        ('atomics.general_filter_comp', ('GeneralFilterComp',)),
+                        ('atomics.scalar_output_comp', ('ScalarOutputsComp',)),
+                        ('atomics.field_output_comp', ('FieldOutputsComp',))):
+        module = stubs[name] = types.ModuleType(name)
+        for attr in attrs:
+            setattr(module, attr, type(attr, (object,), {}))
+
+    with mock.patch.dict(sys.modules, stubs):
+        sys.modules.pop('om_lite.core.hyperelastic_model', None)
+        from om_lite.core import hyperelastic_model
+    return hyperelastic_model
+
+
+hyperelastic_model = _import_hyperelastic_model()
+
+
+class _StubModel(hyperelastic_model.HyperElasticModel):
+    """
+    Model with the partials of the atomics components replaced by fixed random matrices.
+    """
+
+    def setup(self, n=4, m=3):
+        rng = np.random.default_rng(3)
+        self.outputs = {'density_unfiltered': np.ones(n), 'density': np.ones(n),
+                        'displacements': np.ones(m), 'compliance': np.ones(1),
+                        'avg_density': np.ones(1), 'stress': np.ones(1)}
+        self.inputs = {}
+        self.response_names = ['compliance', 'avg_density']
+        self.partials = {
+            ('density', 'density_unfiltered'): rng.random((n, n)),
+            ('displacements', 'density'): rng.random((m, n)),
+            ('displacements', 'displacements'): rng.random((m, m)) + m * np.eye(m),
+            ('compliance', 'displacements'): rng.random((1, m)),
+            ('compliance', 'density'): rng.random((1, n)),
+            ('avg_density', 'density'): np.full((1, n), 1.0 / n),
+            # no ('stress', 'density') partial, the stress only depends on it through the state
+            ('stress', 'displacements'): rng.random((1, m)),
+        }
+        self._factorize_state_jacobian()
+
+
+class TestSolveAdjoint(unittest.TestCase):
+
+    def test_totals(self):
+        model = _StubModel()
+        model.setup()
+        totals, pR_px = model.solve_adjoint(['compliance', 'avg_density', 'stress'])
+
+        partials = model.partials
+        dfilter = partials['density', 'density_unfiltered']
+        pR_px1 = partials['displacements', 'density']
+        pR_py = partials['displacements', 'displacements']
+        assert_allclose(pR_px.toarray(), pR_px1 @ dfilter, rtol=1e-12)
+
+        for name, pf_px1 in (('compliance', partials['compliance', 'density']),
+                             ('avg_density', partials['avg_density', 'density']),
+                             ('stress', np.zeros((1, 4)))):
+            df_dx, psi = totals[name]
+            if (name, 'displacements') in partials:
+                expected_psi = np.linalg.solve(pR_py.T, partials[name, 'displacements'].ravel())
+                assert_allclose(psi, expected_psi, rtol=1e-12)
+                pf_px1 = pf_px1 - expected_psi @ pR_px1
+            else:
+                self.assertIsNone(psi)
+            assert_allclose(df_dx, (pf_px1 @ dfilter).ravel(), rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+_M = np.array([[1.0, 2.0], [3.0, 4.0]])
+_N = np.array([[1.0, -1.0], [0.5, 2.0]])
+
+
+class _Lin(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('u', np.ones(2), units='cm')
+        self.add_input('v', 1.0)
+        self.add_output('w', np.ones(2))
+        self.declare_partials('w', 'u', val=_M)
+        self.declare_partials('w', 'v', rows=[0, 1], cols=[0, 0], val=[5.0, 6.0])
+
+    def compute(self, inputs, outputs):
+        outputs['w'] = _M @ inputs['u'] + np.array([5.0, 6.0]) * inputs['v']
+
+    def compute_partials(self, inputs, outputs, partials):
+        # constant partials, given at declaration
+        pass
+
+
+class _Imp(om.ImplicitComponent):
+    def setup(self):
+        self.add_input('w', np.ones(2))
+        self.add_output('r', np.ones(2))
+        self.declare_partials('r', 'r', rows=[0, 1], cols=[0, 1], val=[7.0, 8.0])
+        self.declare_partials('r', 'w', val=_N)
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals['r'] = np.array([7.0, 8.0]) * outputs['r'] + _N @ inputs['w']
+
+
+class TestAssembledJacobian(unittest.TestCase):
+
+    def test_against_dense_partials(self):
+        for jac_type in ('csc', 'csr'):
+            prob = om.Problem()
+            model = prob.model
+            ivc = model.add_subsystem('ivc', om.IndepVarComp('x', np.array([1.0, 2.0, 3.0]),
+                                                             units='m'))
+            ivc.add_output('s', 0.5)
+            model.add_subsystem('lin', _Lin())
+            model.add_subsystem('imp', _Imp())
+            model.connect('ivc.x', 'lin.u', src_indices=[2, 0])
+            model.connect('ivc.s', 'lin.v')
+            model.connect('lin.w', 'imp.w')
+            model.options['assemble_jac'] = True
+            model.options['assembled_jac_type'] = jac_type
+            prob.setup()
+            prob.final_setup()
+            model.run_linearize()
+
+            slices = model._outputs._slices
+            expected = np.eye(model._outputs.asarray().size)
+            x, s = slices['ivc.x'], slices['ivc.s']
+            w, r = slices['lin.w'], slices['imp.r']
+            # an input in cm of a source in m, fed from x[2] and x[0]
+            expected[w, x.start + 2] -= 100.0 * _M[:, 0]
+            expected[w, x.start + 0] -= 100.0 * _M[:, 1]
+            expected[w, s.start] -= [5.0, 6.0]
+            expected[r, r] = np.diag([7.0, 8.0])
+            expected[r, w] = _N
+
+            mtx = model._assembled_jac.get_matrix()
+            self.assertEqual(mtx.format, jac_type)
+            assert_allclose(mtx.toarray(), expected, rtol=1e-15)
+
+            vec = np.arange(1.0, expected.shape[0] + 1)
+            jac = model._assembled_jac
+            assert_allclose(jac._matvec(vec), expected @ vec, rtol=1e-14)
+            assert_allclose(jac._matvec(vec, transpose=True), expected.T @ vec, rtol=1e-14)
+
+    def test_component_model(self):
+        # the input of a component model has no source, its partials have no column
+        prob = om.Problem(model=_Imp())
+        prob.model.options['assemble_jac'] = True
+        prob.setup()
+        prob.final_setup()
+        prob.model.run_linearize()
+
+        assert_allclose(prob.model._assembled_jac.get_matrix().toarray(),
+                        np.diag([7.0, 8.0]), rtol=1e-15)
+        totals = prob.compute_totals(['r'], ['r'])
+        assert_allclose(totals['r', 'r'], np.diag([1.0 / 7.0, 1.0 / 8.0]), rtol=1e-15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Quad(om.ImplicitComponent):
+    def initialize(self):
+        self.options.declare('y0', default=np.array([2.5, 1.5]))
+        self.options.declare('upper', default=None)
+        self.num_linearize = 0
+        self.max_y = -np.inf
+
+    def setup(self):
+        self.add_input('a', np.array([4.0, 4.0]))
+        self.add_output('y', self.options['y0'], upper=self.options['upper'])
+        arange = np.arange(2)
+        self.declare_partials('y', 'a', rows=arange, cols=arange, val=-1.0)
+        self.declare_partials('y', 'y', rows=arange, cols=arange)
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        self.max_y = max(self.max_y, np.max(outputs['y']))
+        residuals['y'] = outputs['y'] ** 2 - inputs['a']
+
+    def linearize(self, inputs, outputs, partials):
+        self.num_linearize += 1
+        partials['y', 'y'] = 2.0 * outputs['y']
+
+
+class _Atan(om.ImplicitComponent):
+    def setup(self):
+        self.add_output('y', 3.0)
+        self.declare_partials('y', 'y')
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals['y'] = np.arctan(outputs['y'])
+
+    def linearize(self, inputs, outputs, partials):
+        partials['y', 'y'] = 1.0 / (1.0 + outputs['y'] ** 2)
+
+
+def _newton_problem(comp, linesearch='default', **options):
+    prob = om.Problem()
+    prob.model.add_subsystem('comp', comp)
+    newton = prob.model.nonlinear_solver = om.NewtonSolver(iprint=-1, **options)
+    if linesearch != 'default':
+        newton.linesearch = linesearch
+    prob.setup()
+    return prob
+
+
+class TestNewton(unittest.TestCase):
+
+    def test_quadratic_convergence(self):
+        comp = _Quad()
+        prob = _newton_problem(comp, maxiter=20)
+        prob.run_model()
+
+        newton = prob.model.nonlinear_solver
+        assert_allclose(prob.get_val('comp.y'), [2.0, 2.0], rtol=1e-12)
+        self.assertEqual(newton._iter_count, 4)
+        self.assertEqual(comp.num_linearize, 4)
+        history = newton.norm_history
+        for prev, norm in zip(history[1:-1], history[2:]):
+            self.assertLess(norm, prev ** 2)
+
+    def test_modified_newton(self):
+        comp = _Quad()
+        prob = _newton_problem(comp, maxiter=50, jac_update_freq=0, jac_refresh_ratio=1.0)
+        prob.run_model()
+
+        assert_allclose(prob.get_val('comp.y'), [2.0, 2.0], rtol=1e-10)
+        self.assertEqual(comp.num_linearize, 1)
+        self.assertGreater(prob.model.nonlinear_solver._iter_count, 4)
+
+    def test_jac_update_freq(self):
+        comp = _Quad()
+        prob = _newton_problem(comp, maxiter=50, jac_update_freq=2, jac_refresh_ratio=1.0)
+        prob.run_model()
+
+        iters = prob.model.nonlinear_solver._iter_count
+        assert_allclose(prob.get_val('comp.y'), [2.0, 2.0], rtol=1e-10)
+        self.assertEqual(comp.num_linearize, (iters + 1) // 2)
+
+    def test_lagged_jac_refresh(self):
+        # a ratio of zero counts every lagged iteration as stalled, giving full Newton
+        comp = _Quad()
+        prob = _newton_problem(comp, maxiter=50, jac_update_freq=0, jac_refresh_ratio=0.0)
+        prob.run_model()
+
+        assert_allclose(prob.get_val('comp.y'), [2.0, 2.0], rtol=1e-12)
+        self.assertEqual(comp.num_linearize, prob.model.nonlinear_solver._iter_count)
+
+    def test_reuse_jac(self):
+        for reuse_jac, expected in ((False, 1), (True, 0)):
+            comp = _Quad()
+            prob = _newton_problem(comp, maxiter=50, jac_update_freq=0, jac_refresh_ratio=1.0,
+                                   reuse_jac=reuse_jac)
+            prob.run_model()
+            self.assertEqual(comp.num_linearize, 1)
+
+            prob.set_val('comp.a', [4.41, 4.41])
+            prob.run_model()
+            assert_allclose(prob.get_val('comp.y'), [2.1, 2.1], rtol=1e-10)
+            self.assertEqual(comp.num_linearize - 1, expected)
+
+
+class TestLineSearch(unittest.TestCase):
+
+    def test_bounds_vector(self):
+        # the first entry would step from 0.1 to 20.05, so the whole step is scaled back
+        comp = _Quad(y0=np.array([0.1, 1.0]), upper=3.0)
+        prob = _newton_problem(comp, maxiter=1)
+        prob.run_model()
+
+        alpha = 2.9 / 19.95
+        assert_allclose(prob.get_val('comp.y'), [3.0, 1.0 + 1.5 * alpha], rtol=1e-12)
+
+    def test_bounds_wall(self):
+        comp = _Quad(y0=np.array([0.1, 1.0]), upper=3.0)
+        prob = _newton_problem(comp, maxiter=1)
+        prob.model.nonlinear_solver.linesearch.options['bound_enforcement'] = 'wall'
+        prob.run_model()
+
+        assert_allclose(prob.get_val('comp.y'), [3.0, 2.5], rtol=1e-12)
+
+    def test_bounds_respected_to_convergence(self):
+        for mode in ('vector', 'wall'):
+            comp = _Quad(y0=np.array([0.1, 1.0]), upper=3.0)
+            prob = _newton_problem(comp, maxiter=20)
+            prob.model.nonlinear_solver.linesearch.options['bound_enforcement'] = mode
+            prob.run_model()
+
+            assert_allclose(prob.get_val('comp.y'), [2.0, 2.0], rtol=1e-10)
+            self.assertEqual(comp.max_y, 3.0)
+
+    def test_armijo(self):
+        # full Newton steps on arctan diverge from |y| > 1.39
+        prob = _newton_problem(_Atan(), linesearch=None, maxiter=3)
+        prob.run_model()
+        self.assertGreater(abs(prob.get_val('comp.y')[0]), 1e3)
+
+        prob = _newton_problem(_Atan(), linesearch=om.ArmijoGoldsteinLS(), maxiter=10)
+        prob.run_model()
+        assert_allclose(prob.get_val('comp.y'), [0.0], atol=1e-10)
+
+        # the first step backtracks twice, to a quarter of the Newton step
+        prob = _newton_problem(_Atan(), linesearch=om.ArmijoGoldsteinLS(), maxiter=1)
+        prob.run_model()
+        assert_allclose(prob.get_val('comp.y'), [3.0 - 0.25 * 10.0 * np.arctan(3.0)],
+                        rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
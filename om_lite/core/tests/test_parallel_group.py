@@ -0,0 +1,74 @@
+import gc
+import multiprocessing
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from unittest import mock
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Sqrt(om.ImplicitComponent):
+    def setup(self):
+        self.add_input('a', 2.0)
+        self.add_output('y', 1.0)
+        self.declare_partials('y', 'y')
+        self.declare_partials('y', 'a', val=-1.0)
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals['y'] = outputs['y'] ** 2 - inputs['a']
+
+    def linearize(self, inputs, outputs, partials):
+        partials['y', 'y'] = 2.0 * outputs['y']
+
+
+def _sqrt_problem():
+    prob = om.Problem()
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('a', np.array([4.0, 9.0])))
+    par = model.add_subsystem('par', om.ParallelGroup(parallel_backend='process',
+                                                      num_workers=2))
+    for k in range(2):
+        sub = par.add_subsystem('s{}'.format(k), om.Group())
+        sub.add_subsystem('sqrt', _Sqrt())
+        sub.nonlinear_solver = om.NewtonSolver(iprint=-1, maxiter=20)
+        sub.linear_solver = om.DirectSolver()
+        model.connect('ivc.a', 'par.s{}.sqrt.a'.format(k), src_indices=[k])
+    return prob
+
+
+class TestProcessBackend(unittest.TestCase):
+
+    def test_newton_direct_in_spawned_worker(self):
+        # spawned workers get pickled copies, without the state inherited through fork
+        spawn = partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        prob = _sqrt_problem()
+        with mock.patch('om_lite.core.parallel_group.ProcessPoolExecutor', spawn):
+            prob.setup()
+            prob.run_model()
+        try:
+            assert_allclose(prob.get_val('par.s0.sqrt.y'), 2.0)
+            assert_allclose(prob.get_val('par.s1.sqrt.y'), 3.0)
+        finally:
+            prob.cleanup()
+
+    def test_shared_memory_freed_with_model(self):
+        prob = _sqrt_problem()
+        prob.setup()
+        prob.final_setup()
+        names = [shm.name for shm in prob.model._shared_memory.values()]
+        self.assertEqual(len(names), 3)
+
+        del prob
+        gc.collect()
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                SharedMemory(name=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,452 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+
+
+class _Square(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare('wrong', types=bool, default=False)
+        self.num_computes = 0
+
+    def setup(self):
+        self.add_input('x', np.array([1.0, 2.0, 3.0]))
+        self.add_input('a', 2.0)
+        self.add_output('y', np.ones(3))
+        arange = np.arange(3)
+        self.declare_partials('y', 'x', rows=arange, cols=arange)
+        self.declare_partials('y', 'a')
+
+    def compute(self, inputs, outputs):
+        # broadcasts over the leading axis of a batch too
+        self.num_computes += 1
+        outputs['y'] = inputs['a'] * inputs['x'] ** 2
+
+    def compute_partials(self, inputs, outputs, partials):
+        partials['y', 'x'] = 2.0 * inputs['a'] * inputs['x']
+        partials['y', 'a'] = inputs['x'] ** 2
+        if self.options['wrong']:
+            partials['y', 'a'] = 2.0 * inputs['x']
+
+
+class _Root(om.ImplicitComponent):
+    def setup(self):
+        self.add_input('a', 4.0)
+        self.add_output('y', 2.0)
+        self.declare_partials('y', 'a', val=-1.0)
+        self.declare_partials('y', 'y')
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals['y'] = outputs['y'] ** 2 - inputs['a']
+
+    def linearize(self, inputs, outputs, partials):
+        partials['y', 'y'] = 2.0 * outputs['y']
+
+
+def _check_problem(force_alloc_complex=True, **options):
+    prob = om.Problem()
+    comp = prob.model.add_subsystem('comp', _Square(**options))
+    prob.model.add_subsystem('root', _Root())
+    prob.setup(force_alloc_complex=force_alloc_complex)
+    prob.run_model()
+    return prob, comp
+
+
+class TestCheckPartials(unittest.TestCase):
+
+    def test_fd_and_cs(self):
+        prob, _ = _check_problem()
+        for method, tol in (('fd', 1e-5), ('cs', 1e-12)):
+            data = prob.check_partials(out_stream=None, method=method)
+            self.assertEqual(set(data['comp']), {('y', 'x'), ('y', 'a')})
+            self.assertEqual(set(data['root']), {('y', 'y'), ('y', 'a')})
+            for comp_data in data.values():
+                for entry in comp_data.values():
+                    self.assertEqual(entry['method'], method)
+                    assert_allclose(entry['J_fd'], entry['J_fwd'], atol=tol)
+                    self.assertLess(entry['abs error'], tol)
+
+    def test_wrong_partial_flagged(self):
+        prob, _ = _check_problem(wrong=True)
+        data = prob.check_partials(out_stream=None, method='cs')
+        assert_allclose(data['comp']['y', 'a']['J_fd'], [[1.0], [4.0], [9.0]])
+        self.assertGreater(data['comp']['y', 'a']['rel error'], 0.1)
+        self.assertLess(data['comp']['y', 'x']['abs error'], 1e-12)
+
+    def test_cs_needs_complex_vectors(self):
+        prob, _ = _check_problem(force_alloc_complex=False)
+        with self.assertRaises(RuntimeError):
+            prob.check_partials(out_stream=None, method='cs')
+
+        prob, comp = _check_problem(force_alloc_complex=False)
+        comp.set_check_partial_options('a', method='cs')
+        with self.assertRaises(RuntimeError):
+            prob.check_partials(out_stream=None)
+
+    def test_forms_and_step(self):
+        # d(a x^2)/dx is off by a * step in forward and backward form, exact in central
+        x = np.array([1.0, 2.0, 3.0])
+        for form, shift in (('forward', 0.1), ('backward', -0.1), ('central', 0.0)):
+            prob, _ = _check_problem()
+            data = prob.check_partials(out_stream=None, form=form, step=0.1)
+            assert_allclose(data['comp']['y', 'x']['J_fd'], np.diag(2.0 * (2.0 * x + shift)))
+
+        prob, _ = _check_problem()
+        data = prob.check_partials(out_stream=None, step=0.1, step_calc='rel')
+        assert_allclose(data['comp']['y', 'x']['J_fd'], np.diag(2.0 * 2.1 * x))
+
+    def test_per_input_options(self):
+        x = np.array([1.0, 2.0, 3.0])
+        prob, comp = _check_problem()
+        comp.set_check_partial_options('x', form='central', step=0.5)
+        comp.set_check_partial_options('a', method='cs')
+        data = prob.check_partials(out_stream=None, form='forward', step=0.1)['comp']
+        self.assertEqual(data['y', 'x']['method'], 'fd')
+        assert_allclose(data['y', 'x']['J_fd'], np.diag(4.0 * x))
+        self.assertEqual(data['y', 'a']['method'], 'cs')
+        assert_allclose(data['y', 'a']['J_fd'], x[:, np.newaxis] ** 2, rtol=1e-14)
+
+    def test_directional(self):
+        prob, comp = _check_problem()
+        comp.set_check_partial_options('x', method='cs', directional=True)
+        data = prob.check_partials(out_stream=None)['comp']
+        entry = data['y', 'x']
+        self.assertTrue(entry['directional'])
+        self.assertEqual(entry['J_fd'].shape, (3, 1))
+        self.assertEqual(entry['J_fwd'].shape, (3, 1))
+        assert_allclose(entry['J_fd'], entry['J_fwd'], rtol=1e-12)
+        self.assertFalse(data['y', 'a']['directional'])
+
+    def test_batch(self):
+        for method, form in (('fd', 'forward'), ('fd', 'central'), ('cs', 'forward')):
+            prob, comp = _check_problem(supports_batch=True)
+            comp.num_computes = 0
+            data = prob.check_partials(out_stream=None, method=method, form=form)['comp']
+            # all perturbations of one input are a single batch
+            self.assertEqual(comp.num_computes, 2)
+
+            prob, loop_comp = _check_problem()
+            loop_comp.num_computes = 0
+            expected = prob.check_partials(out_stream=None, method=method, form=form)['comp']
+            self.assertGreater(loop_comp.num_computes, 2)
+            for key, entry in expected.items():
+                assert_allclose(data[key]['J_fd'], entry['J_fd'], rtol=1e-12)
+
+
+class _Half(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('u', 0.0)
+        self.add_input('b', 0.0)
+        self.add_output('v', 0.0)
+        self.declare_partials('v', 'u', val=0.5)
+        self.declare_partials('v', 'b', val=1.0)
+
+    def compute(self, inputs, outputs):
+        outputs['v'] = 0.5 * inputs['u'] + inputs['b']
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+class _Length(om.ExplicitComponent):
+    def initialize(self):
+        self.num_computes = 0
+
+    def setup(self):
+        self.add_input('l', np.ones(3), units='cm')
+        self.add_input('y1', 0.0)
+        self.add_output('w', 0.0)
+        self.declare_partials('w', 'l', val=np.ones((1, 3)))
+        self.declare_partials('w', 'y1', val=1.0)
+
+    def compute(self, inputs, outputs):
+        self.num_computes += 1
+        outputs['w'] = np.sum(inputs['l']) + inputs['y1']
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+def _batch_problem():
+    prob = om.Problem()
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('x', np.array([1.0, 2.0, 3.0]), units='m'))
+    model.add_subsystem('sq', _Square(supports_batch=True))
+    model.add_subsystem('len', _Length())
+    model.add_subsystem('pick', _Half())
+    cycle = model.add_subsystem('cycle', om.Group())
+    cycle.add_subsystem('h1', _Half())
+    cycle.add_subsystem('h2', _Half())
+    cycle.connect('h1.v', 'h2.u')
+    cycle.connect('h2.v', 'h1.u')
+    model.connect('ivc.x', 'sq.x')
+    model.connect('ivc.x', 'len.l')
+    model.connect('sq.y', 'len.y1', src_indices=[1])
+    model.connect('sq.y', 'cycle.h1.b', src_indices=[0])
+    model.connect('ivc.x', 'pick.u', src_indices=[2])
+    prob.setup()
+    prob.run_model()
+    return prob
+
+
+class TestRunModelBatch(unittest.TestCase):
+
+    def test_matches_run_model(self):
+        xs = np.array([[1.0, 2.0, 3.0], [2.0, 4.0, 6.0], [0.5, 1.0, 0.0]])
+        avals = np.array([[2.0], [3.0], [-1.0]])
+        prob = _batch_problem()
+        sq = prob.model._subsystems_allprocs['sq']
+        length = prob.model._subsystems_allprocs['len']
+        sq.num_computes = length.num_computes = 0
+        results = prob.run_model_batch({'ivc.x': xs, 'sq.a': avals})
+
+        # the batch component runs once, the other one and the cycle once per point
+        self.assertEqual(sq.num_computes, 1)
+        self.assertEqual(length.num_computes, 3)
+        for i in range(3):
+            prob.set_val('ivc.x', xs[i])
+            prob.set_val('sq.a', avals[i])
+            prob.run_model()
+            for name in ('sq.y', 'len.w', 'cycle.h1.v', 'cycle.h2.v'):
+                assert_allclose(results[name][i], prob.get_val(name))
+        # h1.v = b + 0.5 * 0.5 * h1.v, with b = a x0^2
+        assert_allclose(results['cycle.h1.v'][:, 0], avals[:, 0] * xs[:, 0] ** 2 / 0.75)
+
+    def test_units_and_src_indices(self):
+        prob = _batch_problem()
+        results = prob.run_model_batch({'len.l': [[100.0, 200.0, 300.0], [200.0, 400.0, 600.0]]},
+                                       outputs=['ivc.x', 'len.l', 'len.y1', 'cycle.h1.b'])
+        assert_allclose(results['ivc.x'], [[1.0, 2.0, 3.0], [2.0, 4.0, 6.0]])
+        assert_allclose(results['len.l'], [[100.0, 200.0, 300.0], [200.0, 400.0, 600.0]])
+        assert_allclose(results['len.y1'][:, 0], [8.0, 32.0])
+        assert_allclose(results['cycle.h1.b'][:, 0], [2.0, 8.0])
+
+        # an input with src_indices sets only its entries of the source
+        results = prob.run_model_batch({'pick.u': [[5.0], [6.0]]}, outputs=['ivc.x', 'pick.v'])
+        assert_allclose(results['ivc.x'], [[1.0, 2.0, 5.0], [1.0, 2.0, 6.0]])
+        assert_allclose(results['pick.v'][:, 0], [2.5, 3.0])
+
+    def test_model_restored(self):
+        prob = _batch_problem()
+        model = prob.model
+        inputs = model._inputs.asarray().copy()
+        outputs = model._outputs.asarray().copy()
+        prob.run_model_batch({'ivc.x': np.ones((4, 3)), 'sq.a': np.zeros((4, 1))})
+        assert_allclose(model._inputs.asarray(), inputs)
+        assert_allclose(model._outputs.asarray(), outputs)
+        assert_allclose(prob.get_val('len.w'), 6.0 * 100.0 + 8.0)
+
+    def test_bad_batch(self):
+        prob = _batch_problem()
+        with self.assertRaises(ValueError):
+            prob.run_model_batch({'ivc.x': np.ones((2, 3)), 'sq.a': np.ones((3, 1))})
+        with self.assertRaises(ValueError):
+            prob.run_model_batch({'sq.a': 2.0})
+        with self.assertRaises(ValueError):
+            prob.run_model_batch({'ivc.x': np.ones((2, 2))})
+
+
+def _incremental_problem():
+    prob = om.Problem()
+    prob.options['incremental'] = True
+    model = prob.model
+    ivc = model.add_subsystem('ivc', om.IndepVarComp('x', 1.0))
+    ivc.add_output('a', 2.0)
+    for name in ('c1', 'c2', 'c3', 'free'):
+        model.add_subsystem(name, _Half())
+    cycle = model.add_subsystem('cycle', om.Group())
+    cycle.add_subsystem('h1', _Half())
+    cycle.add_subsystem('h2', _Half())
+    cycle.connect('h1.v', 'h2.u')
+    cycle.connect('h2.v', 'h1.u')
+    model.connect('ivc.x', 'c1.u')
+    model.connect('c1.v', 'c2.u')
+    model.connect('ivc.a', 'c3.u')
+    model.connect('c2.v', 'cycle.h1.b')
+    prob.setup()
+    prob.run_model()
+    return prob
+
+
+class TestIncremental(unittest.TestCase):
+
+    def test_skipped_systems(self):
+        prob = _incremental_problem()
+        self.assertEqual(prob.get_skipped_systems(), [])
+
+        prob.run_model()
+        self.assertEqual(prob.get_skipped_systems(),
+                         ['_auto_ivc', 'ivc', 'c1', 'c2', 'c3', 'free', 'cycle.h1', 'cycle.h2'])
+
+        prob.set_val('ivc.a', 3.0)
+        prob.run_model()
+        self.assertEqual(prob.get_skipped_systems(),
+                         ['_auto_ivc', 'c1', 'c2', 'free', 'cycle.h1', 'cycle.h2'])
+        assert_allclose(prob.get_val('c3.v'), 1.5)
+
+    def test_cycle(self):
+        prob = _incremental_problem()
+        prob.set_val('ivc.x', 3.0)
+        prob.run_model()
+        self.assertEqual(prob.get_skipped_systems(), ['_auto_ivc', 'c3', 'free'])
+        # h1.v = b + 0.25 h1.v with b = c2.v = 0.75
+        assert_allclose(prob.get_val('cycle.h1.v'), 1.0)
+
+    def test_auto_ivc(self):
+        prob = _incremental_problem()
+        prob.set_val('free.b', 3.0)
+        prob.run_model()
+        self.assertEqual(prob.get_skipped_systems(),
+                         ['ivc', 'c1', 'c2', 'c3', 'cycle.h1', 'cycle.h2'])
+        assert_allclose(prob.get_val('free.v'), 3.0)
+
+        prob.set_val('c2.b', 1.0)
+        prob.run_model()
+        self.assertEqual(prob.get_skipped_systems(), ['ivc', 'c1', 'c3', 'free'])
+        assert_allclose(prob.get_val('c2.v'), 1.25)
+        assert_allclose(prob.get_val('cycle.h1.v'), 1.25 / 0.75)
+
+    def test_get_val_is_read_only(self):
+        prob = _incremental_problem()
+        for name in ('ivc.x', 'c1.u', 'free.b'):
+            with self.assertRaises(ValueError):
+                prob.get_val(name)[...] = 7.0
+            with self.assertRaises(ValueError):
+                prob.get_vals([name])[name][...] = 7.0
+        with self.assertRaises(ValueError):
+            prob.get_val('ivc.x', indices=slice(0, 1))[...] = 7.0
+        prob.run_model()
+        assert_allclose(prob.get_val('c1.v'), 0.5)
+
+    def test_load_checkpoint(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        filepath = os.path.join(tmp.name, 'prob.ckpt')
+
+        prob = _incremental_problem()
+        prob.set_val('ivc.x', 3.0)
+        prob.run_model()
+        prob.save_checkpoint(filepath)
+
+        prob = _incremental_problem()
+        prob.load_checkpoint(filepath)
+        prob.run_model()
+        self.assertEqual(len(prob.get_skipped_systems()), 8)
+        assert_allclose(prob.get_val('cycle.h1.v'), 1.0)
+
+        prob.set_val('ivc.a', 4.0)
+        prob.run_model()
+        self.assertEqual(prob.get_skipped_systems(),
+                         ['_auto_ivc', 'c1', 'c2', 'free', 'cycle.h1', 'cycle.h2'])
+        assert_allclose(prob.get_val('c3.v'), 2.0)
+        assert_allclose(prob.get_val('c1.v'), 1.5)
+
+
+class _Pair(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('y', np.ones(2))
+        self.add_output('s', 0.0)
+        self.declare_partials('s', 'y', val=np.array([[1.0, 10.0]]))
+
+    def compute(self, inputs, outputs):
+        outputs['s'] = inputs['y'][0] + 10.0 * inputs['y'][1]
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+def _names_problem():
+    prob = om.Problem()
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('y', np.array([1.0, 2.0, 3.0]), units='m'),
+                        promotes=['y'])
+    model.add_subsystem('len', _Length(), promotes_inputs=[('l', 'y')])
+    model.add_subsystem('pair', _Pair(), promotes_inputs=['y'])
+    model.promotes('pair', inputs=['y'], src_indices=[0, 2])
+    model.add_subsystem('free', _Half())
+    prob.setup()
+    prob.run_model()
+    return prob
+
+
+class TestNameTable(unittest.TestCase):
+
+    def test_fast_and_fallback_paths(self):
+        # units or indices take the general path, the same values must come back
+        prob = _names_problem()
+        for name in ('y', 'ivc.y', 'len.l', 'pair.y', 'free.b', 'free.v'):
+            self.assertIn(name, prob._name_table)
+            assert_allclose(prob.get_val(name), prob.get_val(name, indices=slice(None)))
+
+        fast = _names_problem()
+        slow = _names_problem()
+        for name, val in (('y', [4.0, 5.0, 6.0]), ('len.l', [100.0, 200.0, 300.0]),
+                          ('pair.y', [7.0, 8.0]), ('free.b', 2.0)):
+            fast.set_val(name, val)
+            slow.set_val(name, val, indices=slice(None))
+            fast.run_model()
+            slow.run_model()
+            for other in ('y', 'len.w', 'pair.s', 'free.v'):
+                assert_allclose(fast.get_val(other), slow.get_val(other))
+
+    def test_set_vals_get_vals(self):
+        prob = _names_problem()
+        prob.set_vals({'len.l': [100.0, 200.0, 500.0], 'free.b': 4.0})
+        vals = prob.get_vals(['y', 'len.l', 'pair.y', 'free.b'])
+        assert_allclose(vals['y'], [1.0, 2.0, 5.0])
+        assert_allclose(vals['len.l'], [100.0, 200.0, 500.0])
+        assert_allclose(vals['pair.y'], [1.0, 5.0])
+        assert_allclose(vals['free.b'], 4.0)
+
+        prob.run_model()
+        assert_allclose(prob.get_vals(['len.w', 'pair.s', 'free.v'])['free.v'], 4.0)
+        assert_allclose(prob.get_val('pair.s'), 51.0)
+        with self.assertRaises(KeyError):
+            prob.set_vals({'nope': 1.0})
+
+    def test_units(self):
+        prob = _names_problem()
+        prob.set_val('y', 50.0, units='cm', indices=[1])
+        assert_allclose(prob.get_val('y'), [1.0, 0.5, 3.0])
+        assert_allclose(prob.get_val('len.l'), [100.0, 50.0, 300.0])
+        assert_allclose(prob.get_val('len.l', units='m'), [1.0, 0.5, 3.0])
+
+        prob.set_val('len.l', [0.1, 0.2, 0.3], units='m')
+        assert_allclose(prob.get_val('y'), [0.1, 0.2, 0.3])
+        assert_allclose(prob.get_val('y', units='mm'), [100.0, 200.0, 300.0])
+
+    def test_src_indices_on_promoted_input(self):
+        prob = _names_problem()
+        prob.set_vals({'pair.y': [5.0, 6.0]})
+        assert_allclose(prob.get_val('y'), [5.0, 2.0, 6.0])
+        assert_allclose(prob.get_val('pair.y'), [5.0, 6.0])
+        prob.run_model()
+        assert_allclose(prob.get_val('pair.s'), 65.0)
+        assert_allclose(prob.get_val('len.w'), 1300.0)
+
+    def test_views_are_read_only(self):
+        prob = _names_problem()
+        for name in ('y', 'ivc.y', 'free.b', 'free.v'):
+            self.assertFalse(prob.get_val(name).flags.writeable)
+            self.assertFalse(prob.get_vals([name])[name].flags.writeable)
+        # converted or gathered values are copies, editing them leaves the model alone
+        for name in ('len.l', 'pair.y'):
+            val = prob.get_val(name)
+            val[...] = 0.0
+        assert_allclose(prob.get_val('y'), [1.0, 2.0, 3.0])
+
+    def test_unconnected_input(self):
+        prob = _names_problem()
+        prob.set_val('free.b', 3.0)
+        prob.set_val('free.u', 2.0)
+        assert_allclose(prob.get_vals(['free.u'])['free.u'], 2.0)
+        prob.run_model()
+        assert_allclose(prob.get_val('free.v'), 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import tracemalloc
+import unittest
+
+import om_lite.api as om
+
+
+class _Triple(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', 1.0)
+        self.add_output('y', 1.0)
+        self.declare_partials('y', 'x', val=3.0)
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = 3.0 * inputs['x']
+
+    def compute_partials(self, inputs, outputs, partials):
+        pass
+
+
+def _problem():
+    prob = om.Problem()
+    prob.model.add_subsystem('ivc', om.IndepVarComp('x', 2.0))
+    prob.model.add_subsystem('comp', _Triple())
+    prob.model.connect('ivc.x', 'comp.x')
+    prob.setup()
+    prob.final_setup()
+    return prob
+
+
+class TestTraceMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        self.addCleanup(tracemalloc.stop)
+
+    def test_stop_ends_own_tracing(self):
+        prob = _problem()
+        prob.start_profiling(trace_memory=True)
+        self.assertTrue(tracemalloc.is_tracing())
+        prob.run_model()
+        prob.stop_profiling()
+        self.assertFalse(tracemalloc.is_tracing())
+
+        stats = {(row['pathname'], row['method']): row for row in
+                 prob.get_profiler().get_stats()}
+        self.assertEqual(stats['comp', 'compute']['calls'], 1)
+
+    def test_stop_keeps_outside_tracing(self):
+        tracemalloc.start()
+        prob = _problem()
+        prob.start_profiling(trace_memory=True)
+        prob.run_model()
+        prob.stop_profiling()
+        self.assertTrue(tracemalloc.is_tracing())
+
+
+class _Slow(_Triple):
+    def compute(self, inputs, outputs):
+        # releases the GIL, so the threads of the parallel group overlap
+        time.sleep(0.01)
+        super().compute(inputs, outputs)
+
+
+class TestThreads(unittest.TestCase):
+
+    def test_parallel_group_threads(self):
+        prob = om.Problem()
+        model = prob.model
+        model.add_subsystem('ivc', om.IndepVarComp('x', 2.0))
+        par = model.add_subsystem('par', om.ParallelGroup(parallel_backend='thread',
+                                                          num_workers=4))
+        for k in range(4):
+            par.add_subsystem('s{}'.format(k), _Slow())
+            model.connect('ivc.x', 'par.s{}.x'.format(k))
+        prob.setup()
+        prob.final_setup()
+        prob.start_profiling()
+        prob.run_model()
+        prob.stop_profiling()
+
+        stacks = prob.get_profiler()._stacks
+        top = ('<model>:_solve_nonlinear', 'par:_solve_nonlinear')
+        for k in range(4):
+            name = 'par.s{}'.format(k)
+            self.assertIn(top + (name + ':_solve_nonlinear', name + ':compute'), stacks)
+        for stack in stacks:
+            if stack[-1] == 'par:_transfer':
+                self.assertEqual(stack, top + ('par:_transfer', ))
+            elif stack[-1].startswith('par.') and stack[-1].endswith(':compute'):
+                self.assertEqual(stack[:2], top)
+                self.assertEqual(len(stack), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
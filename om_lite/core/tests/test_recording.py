@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import om_lite.api as om
+
+
+class _Sqrt(om.ImplicitComponent):
+    def setup(self):
+        self.add_input('a', 2.0)
+        self.add_output('y', 1.0)
+        self.declare_partials('y', 'y')
+        self.declare_partials('y', 'a', val=-1.0)
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals['y'] = outputs['y'] ** 2 - inputs['a']
+
+    def linearize(self, inputs, outputs, partials):
+        partials['y', 'y'] = 2.0 * outputs['y']
+
+
+def _sqrt_problem(driver=None):
+    prob = om.Problem(driver=driver)
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('a', 2.0))
+    sub = model.add_subsystem('sub', om.Group())
+    sub.add_subsystem('sqrt', _Sqrt())
+    model.connect('ivc.a', 'sub.sqrt.a')
+    sub.nonlinear_solver = om.NewtonSolver(iprint=-1, maxiter=20)
+    sub.linear_solver = om.DirectSolver()
+    model.add_design_var('ivc.a', lower=1.0, upper=4.0)
+    model.add_objective('sub.sqrt.y')
+    return prob, sub
+
+
+class TestCoordinates(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.filepath = os.path.join(tmp.name, 'cases.bin')
+
+    def test_solver_cases_in_driver_iterations(self):
+        prob, sub = _sqrt_problem(om.DOEDriver(om.UniformGenerator(5, seed=0)))
+        rec = om.BinaryRecorder(self.filepath)
+        prob.driver.add_recorder(rec)
+        sub.nonlinear_solver.add_recorder(rec)
+        prob.setup()
+        prob.run_driver()
+        prob.cleanup()
+
+        with om.CaseReader(self.filepath) as reader:
+            coords = reader.list_cases()
+            solver_coords = reader.list_cases(source='sub.NL: Newton')
+            self.assertEqual(len(set(coords)), len(coords))
+            self.assertEqual(len(reader.list_cases(source='DOEDriver')), 5)
+            self.assertGreater(len(solver_coords), 5)
+            self.assertTrue(solver_coords[0].startswith('DOEDriver|1|sub.NL: Newton|'))
+            self.assertTrue(solver_coords[-1].startswith('DOEDriver|5|sub.NL: Newton|'))
+
+    def test_nested_solver_coordinates(self):
+        prob, sub = _sqrt_problem()
+        prob.model.nonlinear_solver = om.NonlinearBlockGS(iprint=-1)
+        rec = om.BinaryRecorder(self.filepath)
+        sub.nonlinear_solver.add_recorder(rec)
+        prob.setup()
+        prob.run_model()
+        prob.cleanup()
+
+        with om.CaseReader(self.filepath) as reader:
+            coords = reader.list_cases()
+        self.assertEqual(len(set(coords)), len(coords))
+        self.assertTrue(all(coord.startswith('root.NL: NLBGS|') for coord in coords))
+        self.assertEqual(coords[0], 'root.NL: NLBGS|0|sub.NL: Newton|1')
+
+
+class TestCaseReader(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.filepath = os.path.join(tmp.name, 'cases.bin')
+
+    def test_duplicate_coordinates(self):
+        prob, sub = _sqrt_problem()
+        rec = om.BinaryRecorder(self.filepath)
+        prob.add_recorder(rec)
+        prob.setup()
+        for a in (4.0, 9.0):
+            prob.set_val('ivc.a', a)
+            prob.run_model()
+            prob.record('final')
+        prob.cleanup()
+
+        with om.CaseReader(self.filepath) as reader:
+            self.assertEqual(reader.list_cases(), ['final', 'final'])
+            with self.assertRaises(ValueError):
+                reader.get_case('final')
+            self.assertAlmostEqual(reader.get_case('final', 0)['sub.sqrt.y'][0], 2.0)
+            self.assertAlmostEqual(reader.get_case('final', 1)['sub.sqrt.y'][0], 3.0)
+            self.assertAlmostEqual(reader.get_case(-1)['sub.sqrt.y'][0], 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import om_lite.api as om
+from om_lite.core.total_jac import _LinearSolutionCache, _TotalJacInfo
+
+
+class _Mix(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', np.ones(3))
+        self.add_output('y', np.ones(2))
+        self.declare_partials('y', 'x')
+
+    def compute(self, inputs, outputs):
+        x = inputs['x']
+        outputs['y'] = [x[0] * x[1] + x[2], np.sin(x[0]) + x[2] ** 2]
+
+    def compute_partials(self, inputs, outputs, partials):
+        x = inputs['x']
+        partials['y', 'x'] = [[x[1], x[0], 1.0], [np.cos(x[0]), 0.0, 2.0 * x[2]]]
+
+
+class _Square(om.ExplicitComponent):
+    def setup(self):
+        self.add_input('x', np.ones(3))
+        self.add_output('y', np.ones(3))
+        arange = np.arange(3)
+        self.declare_partials('y', 'x', rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = inputs['x'] ** 2
+
+    def compute_partials(self, inputs, outputs, partials):
+        partials['y', 'x'] = 2.0 * inputs['x']
+
+
+class _Stage(om.ExplicitComponent):
+    def initialize(self):
+        self.options.declare('k', default=1.0)
+
+    def setup(self):
+        self.add_input('x', 1.0)
+        self.add_output('y', 1.0)
+        self.declare_partials('y', 'x')
+
+    def compute(self, inputs, outputs):
+        outputs['y'] = self.options['k'] * np.sin(inputs['x']) + inputs['x']
+
+    def compute_partials(self, inputs, outputs, partials):
+        partials['y', 'x'] = self.options['k'] * np.cos(inputs['x']) + 1.0
+
+
+def _chain_problem(cache_linear_solution, **options):
+    # GMRES needs one iteration per stage of the chain from a zero initial guess
+    prob = om.Problem()
+    prob.options.update(options)
+    model = prob.model
+    ivc = model.add_subsystem('ivc', om.IndepVarComp('x', 0.3))
+    ivc.add_output('w', 0.2)
+    prev = 'ivc.x'
+    for i in range(5):
+        model.add_subsystem('s%d' % i, _Stage(k=0.5 * (i + 1)))
+        model.connect(prev, 's%d.x' % i)
+        prev = 's%d.y' % i
+    model.add_subsystem('t', _Stage())
+    model.connect('ivc.w', 't.x')
+    model.add_design_var('ivc.x', cache_linear_solution=cache_linear_solution)
+    model.add_design_var('ivc.w', cache_linear_solution=cache_linear_solution)
+    model.add_objective(prev)
+    model.add_constraint('t.y', upper=1.0)
+    model.linear_solver = om.ScipyKrylov()
+    prob.setup(mode='fwd')
+    prob.run_model()
+    return prob
+
+
+def _totals_problem(linear_solver, mode, vectorize_derivs):
+    prob = om.Problem()
+    model = prob.model
+    model.add_subsystem('ivc', om.IndepVarComp('x', np.array([0.5, 2.0, 3.0])))
+    model.add_subsystem('mix', _Mix())
+    model.add_subsystem('sq', _Square())
+    model.connect('ivc.x', ['mix.x', 'sq.x'])
+    model.add_design_var('ivc.x', vectorize_derivs=vectorize_derivs)
+    model.add_constraint('mix.y', upper=10.0, vectorize_derivs=vectorize_derivs)
+    model.add_constraint('sq.y', upper=10.0)
+    model.linear_solver = linear_solver
+    prob.setup(mode=mode)
+    prob.run_model()
+    return prob
+
+
+class TestVectorizeDerivs(unittest.TestCase):
+
+    def test_block_matches_columns(self):
+        x = np.array([0.5, 2.0, 3.0])
+        expected_mix = [[x[1], x[0], 1.0], [np.cos(x[0]), 0.0, 2.0 * x[2]]]
+        for solver in (om.DirectSolver, om.ScipyKrylov):
+            for mode, nsolves in (('fwd', (3, 1)), ('rev', (5, 4))):
+                columns = None
+                for vectorize, expected_nsolves in zip((False, True), nsolves):
+                    prob = _totals_problem(solver(), mode, vectorize)
+                    info = _TotalJacInfo(prob, None, None, False, 'flat_dict')
+                    self.assertEqual(info.nsolves, expected_nsolves)
+                    self.assertEqual(len(info._block_solves), int(vectorize))
+
+                    totals = info.compute_totals()
+                    assert_allclose(totals['mix.y', 'ivc.x'], expected_mix,
+                                    rtol=1e-10, atol=1e-12)
+                    assert_allclose(totals['sq.y', 'ivc.x'], np.diag(2.0 * x),
+                                    rtol=1e-10, atol=1e-12)
+                    if columns is None:
+                        columns = totals
+                    else:
+                        for key, val in columns.items():
+                            assert_allclose(totals[key], val, rtol=1e-12, atol=1e-14)
+
+    def test_coloring_replaces_blocks(self):
+        prob = om.Problem()
+        model = prob.model
+        model.add_subsystem('ivc', om.IndepVarComp('x', np.array([0.5, 2.0, 3.0])))
+        model.add_subsystem('sq', _Square())
+        model.connect('ivc.x', 'sq.x')
+        model.add_design_var('ivc.x', vectorize_derivs=True)
+        model.add_constraint('sq.y', upper=10.0)
+        prob.driver.declare_coloring()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        prob.options['coloring_dir'] = tmp.name
+        prob.setup(mode='fwd')
+        prob.run_model()
+        prob.compute_totals()
+
+        # the single color covers the whole design variable, so no block solve is left
+        info = _TotalJacInfo(prob, None, None, False, 'flat_dict')
+        self.assertIsNotNone(info.coloring)
+        self.assertEqual(info._block_solves, [])
+        self.assertEqual(info.nsolves, 1)
+        totals = info.compute_totals()
+        assert_allclose(totals['sq.y', 'ivc.x'], np.diag([1.0, 4.0, 6.0]), rtol=1e-12)
+
+
+class TestLinearSolutionCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = _LinearSolutionCache(3 * 8 * 4)
+        for key in 'abc':
+            cache.put(key, np.ones(4))
+        self.assertEqual(len(cache), 3)
+
+        # 'a' becomes the most recently used, so 'b' goes first
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('d', np.ones(4))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(set(cache._cache), {'c', 'a', 'd'})
+        self.assertEqual(cache.nbytes, 3 * 8 * 4)
+
+        # replacing an entry does not count it twice, a solution over the bound is not kept
+        cache.put('a', np.zeros(4))
+        assert_allclose(cache.get('a'), np.zeros(4))
+        self.assertEqual(cache.nbytes, 3 * 8 * 4)
+        cache.put('e', np.ones(16))
+        self.assertIsNone(cache.get('e'))
+        self.assertEqual(len(cache), 3)
+
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
+
+    def test_warm_start_across_totals(self):
+        for make_solver in (om.ScipyKrylov, lambda: om.LinearBlockJac(maxiter=20, iprint=-1)):
+            iters = {}
+            for cache in (False, True):
+                prob = _chain_problem(cache)
+                prob.model.linear_solver = solver = make_solver()
+                prob.setup(mode='fwd')
+                prob.run_model()
+                prob.compute_totals(['s4.y'], ['ivc.x'])
+                self.assertEqual(solver._iter_count, 6)
+
+                prob.set_val('ivc.x', 0.31)
+                prob.run_model()
+                totals = prob.compute_totals(['s4.y'], ['ivc.x'])
+                iters[cache] = solver._iter_count
+                self.assertEqual(len(prob._lin_sol_cache), int(cache))
+                if cache:
+                    assert_allclose(totals['s4.y', 'ivc.x'], expected, rtol=1e-8)
+                else:
+                    expected = totals['s4.y', 'ivc.x']
+
+            self.assertLess(iters[True], iters[False])
+
+    def test_eviction_under_problem_bound(self):
+        # room for one solution of the 8 outputs only
+        prob = _chain_problem(True, linear_solution_cache_mb=1.5 * 8 * 8 / 2 ** 20)
+        prob.compute_totals()
+        cache = prob._lin_sol_cache
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.nbytes, 8 * 8)
+
+        prob = _chain_problem(True)
+        prob.compute_totals()
+        self.assertEqual(len(prob._lin_sol_cache), 2)
+
+    def test_reset_by_final_setup(self):
+        prob = _chain_problem(True)
+        prob.compute_totals()
+        self.assertEqual(len(prob._lin_sol_cache), 2)
+
+        prob.setup(mode='fwd')
+        prob.final_setup()
+        self.assertEqual(len(prob._lin_sol_cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
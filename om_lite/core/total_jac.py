@@ -0,0 +1,618 @@
+"""Helper class for total jacobian computation."""
+from collections import OrderedDict
+
+import numpy as np
+
+from om_lite.core.utils import name2abs_names
+
+
+class _LinearSolutionCache(object):
+    """
+    Least recently used cache of the solutions of derivative linear solves.
+    Solutions are kept across total derivative computations, so that the solves of the next
+    driver iteration can start from them. Once the cached solutions take more than max_bytes,
+    the least recently used ones are dropped.
+    Attributes
+    ----------
+    max_bytes : int
+        Memory bound of the cached solutions.
+    nbytes : int
+        Memory used by the cached solutions.
+    _cache : OrderedDict
+        Solutions keyed by solve, least recently used first.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        max_bytes : int
+            Memory bound of the cached solutions.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        """
+        Return a cached solution, or None.
+        Parameters
+        ----------
+        key : hashable
+            Identifies the solve.
+        Returns
+        -------
+        ndarray or None
+            The last solution of that solve.
+        """
+        sol = self._cache.get(key)
+        if sol is not None:
+            self._cache.move_to_end(key)
+        return sol
+
+    def put(self, key, sol):
+        """
+        Cache a solution, evicting the least recently used ones beyond max_bytes.
+        Parameters
+        ----------
+        key : hashable
+            Identifies the solve.
+        sol : ndarray
+            The solution, copied.
+        """
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+
+        if sol.nbytes > self.max_bytes:
+            return
+
+        self._cache[key] = sol = sol.copy()
+        self.nbytes += sol.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """
+        Drop all cached solutions.
+        """
+        self._cache.clear()
+        self.nbytes = 0
+
+
+class _TotalJacInfo(object):
+    """
+    Object to manage computation of total derivatives.
+    Every design variable is the output of an independent component, whose residual row in the
+    model Jacobian J is the identity. A forward solve J x = e_i for entry i of a design variable
+    therefore gives the derivatives of all outputs with respect to it, and a reverse solve
+    J^T x = e_j for entry j of a response gives the derivatives of that entry with respect to all
+    outputs.
+    Attributes
+    ----------
+    model : System
+        The top level system.
+    mode : str
+        'fwd' or 'rev', the direction actually used.
+    of : list of str
+        Names of the responses.
+    wrt : list of str
+        Names of the design variables.
+    of_meta : dict
+        For each response, its global output indices, its slice in the total jacobian and its
+        metadata.
+    wrt_meta : dict
+        Same as of_meta, for the design variables.
+    J : ndarray
+        The total jacobian, (size of all of) x (size of all wrt).
+    coloring : Coloring or None
+        Total coloring of the driver, used when computing the driver totals.
+    return_format : str
+        'flat_dict', 'dict' or 'array'.
+    """
+
+    def __init__(self, problem, of, wrt, use_abs_names, return_format,
+                 driver_scaling=False, use_coloring=True):
+        """
+        Initialize object.
+        Parameters
+        ----------
+        problem : Problem
+            Reference to that Problem object that contains this _TotalJacInfo.
+        of : iter of str
+            Response names.
+        wrt : iter of str
+            Design variable names.
+        use_abs_names : bool
+            If True, keys of the result are absolute source names.
+        return_format : str
+            'flat_dict', 'dict' or 'array'.
+        driver_scaling : bool
+            If True, scale the derivatives with the driver scaling of the design variables and
+            responses.
+        use_coloring : bool
+            If False, ignore the total coloring of the driver.
+        """
+        if return_format not in ('flat_dict', 'dict', 'array'):
+            raise ValueError("Unsupported return format '{}'.".format(return_format))
+
+        self.model = model = problem.model
+        self.return_format = return_format
+        self.use_abs_names = use_abs_names
+        self.driver_scaling = driver_scaling
+
+        design_vars = model.get_design_vars()
+        responses = model.get_responses()
+        driver_totals = of is None and wrt is None
+
+        if of is None:
+            of = list(responses)
+        elif isinstance(of, str):
+            of = [of]
+        if wrt is None:
+            wrt = list(design_vars)
+        elif isinstance(wrt, str):
+            wrt = [wrt]
+
+        self.of = list(of)
+        self.wrt = list(wrt)
+        self.of_meta, of_size = self._create_meta(self.of, responses)
+        self.wrt_meta, wrt_size = self._create_meta(self.wrt, design_vars)
+
+        mode = problem._orig_mode
+        if mode == 'auto':
+            # one linear solve per row in rev mode, per column in fwd mode
+            mode = 'rev' if of_size < wrt_size else 'fwd'
+        self.mode = mode
+
+        # the coloring only applies to the totals of the driver
+        self.coloring = None
+        if use_coloring and driver_totals:
+            coloring = problem.driver._get_total_coloring()
+            if coloring is not None:
+                if not coloring.matches(self._get_var_sizes(self.of_meta),
+                                        self._get_var_sizes(self.wrt_meta)):
+                    raise RuntimeError(
+                        "{}: The total coloring was computed for different design variables "
+                        "or responses.".format(problem.msginfo))
+                self.coloring = coloring
+                if problem._orig_mode == 'auto':
+                    self.mode = coloring.best_mode()
+
+        self.J = np.zeros((of_size, wrt_size))
+        self._cache = problem._lin_sol_cache
+        self._solves = self._get_solves()
+
+    def _create_meta(self, names, var_meta):
+        """
+        Compute the global indices and total jacobian slice of each variable.
+        Parameters
+        ----------
+        names : list of str
+            Names of the variables, promoted or absolute.
+        var_meta : dict
+            Design variable or response metadata, keyed by name.
+        Returns
+        -------
+        dict
+            Indices, slice and metadata of each variable.
+        int
+            Total size of the variables.
+        """
+        model = self.model
+        out_slices = model._outputs._slices
+        out_meta = model._var_allprocs_abs2meta['output']
+
+        meta = {}
+        start = 0
+        for name in names:
+            if name in var_meta:
+                vmeta = var_meta[name]
+                src = vmeta['source']
+                indices = vmeta['indices']
+            else:
+                if not name2abs_names(model, name):
+                    raise KeyError("{}: Variable name '{}' not found.".format(
+                        model.msginfo, name))
+                vmeta = None
+                src = model._get_source(name)
+                indices = None
+
+            if indices is None:
+                indices = np.arange(out_meta[src]['size'], dtype=int)
+
+            end = start + indices.size
+            meta[name] = {
+                'source': src,
+                'global_idxs': out_slices[src].start + indices,
+                'jac_slice': slice(start, end),
+                'meta': vmeta,
+            }
+            start = end
+
+        return meta, start
+
+    def _get_var_sizes(self, meta):
+        """
+        Return the name and size of each variable, in total Jacobian order.
+        Parameters
+        ----------
+        meta : dict
+            of_meta or wrt_meta.
+        Returns
+        -------
+        list of (str, int)
+            Name and size of each variable.
+        """
+        return [(name, m['global_idxs'].size) for name, m in meta.items()]
+
+    def _get_var_graph(self, reverse=False):
+        """
+        Return the dependency graph between the outputs of the model.
+        An output depends on another if a declared partial of its component is taken with
+        respect to it, or to an input connected to it.
+        Parameters
+        ----------
+        reverse : bool
+            If True, map each output to the outputs it depends on instead.
+        Returns
+        -------
+        dict
+            Set of dependent (or, if reverse, dependency) outputs of each output.
+        """
+        from om_lite.core.component import Component
+
+        model = self.model
+        conns = model._conn_global_abs_in2out
+        graph = {}
+        for comp in model.system_iter(include_self=True, typ=Component):
+            prefix = comp.pathname + '.' if comp.pathname else ''
+            outputs = comp._var_rel_names['output']
+            for key in comp.partials:
+                if len(key) != 2:
+                    continue
+                of, wrt = prefix + key[0], prefix + key[1]
+                src = wrt if key[1] in outputs else conns.get(wrt)
+                if src is None:
+                    continue
+                if reverse:
+                    graph.setdefault(of, set()).add(src)
+                else:
+                    graph.setdefault(src, set()).add(of)
+        return graph
+
+    def _get_par_color_solves(self, names, seeds, targets):
+        """
+        Return the solves of a group of seed variables sharing a parallel_deriv_color.
+        Entry k of every variable in the group is seeded in the same solve. This is only valid
+        if no target variable depends on two variables of the group, which is checked.
+        Parameters
+        ----------
+        names : list of str
+            Seed variables of the color.
+        seeds : dict
+            Metadata of the seed variables.
+        targets : dict
+            Metadata of the target variables.
+        Returns
+        -------
+        list
+            Seed indices and (jac index, target jac indices, target solution indices) of each
+            solve.
+        """
+        graph = self._get_var_graph(reverse=self.mode == 'rev')
+        owner = {}
+        relevant = {}
+        for name in names:
+            # outputs reachable from the seed variable through the model
+            reached = {seeds[name]['source']}
+            stack = list(reached)
+            while stack:
+                for nxt in graph.get(stack.pop(), ()):
+                    if nxt not in reached:
+                        reached.add(nxt)
+                        stack.append(nxt)
+
+            tgt_names = [t for t, meta in targets.items() if meta['source'] in reached]
+            for tgt in tgt_names:
+                if tgt in owner:
+                    raise RuntimeError(
+                        "{}: '{}' depends on both '{}' and '{}', which have the same "
+                        "parallel_deriv_color '{}'.".format(
+                            self.model.msginfo, tgt, owner[tgt], name,
+                            seeds[name]['meta']['parallel_deriv_color']))
+                owner[tgt] = name
+
+            if tgt_names:
+                relevant[name] = (
+                    np.concatenate([np.arange(targets[t]['jac_slice'].start,
+                                              targets[t]['jac_slice'].stop) for t in tgt_names]),
+                    np.concatenate([targets[t]['global_idxs'] for t in tgt_names]))
+            else:
+                relevant[name] = (np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+
+        solves = []
+        for k in range(max(seeds[name]['global_idxs'].size for name in names)):
+            seed_idxs = []
+            parts = []
+            for name in names:
+                seed = seeds[name]
+                if k < seed['global_idxs'].size:
+                    seed_idxs.append(seed['global_idxs'][k])
+                    parts.append((seed['jac_slice'].start + k,) + relevant[name])
+            solves.append((seed_idxs, parts))
+        return solves
+
+    def _get_solves(self):
+        """
+        Return the linear solves needed for the total Jacobian.
+        Returns
+        -------
+        list
+            For each solve, the global indices of the entries seeded with 1.0 in the right-hand
+            side, and the (jac index, target jac indices, target solution indices) to copy out of
+            the solution for each seeded entry.
+            Variables with vectorize_derivs are not included, their seeds, jac slice and target
+            indices are put in _block_solves instead and solved as one block each. With a total
+            coloring, the colored solves cover every seed and _block_solves stays empty.
+            Each solve ends with its key in the linear solution cache, or None if no seeded
+            variable has cache_linear_solution.
+        """
+        if self.mode == 'fwd':
+            seeds, targets = self.wrt_meta, self.of_meta
+        else:
+            seeds, targets = self.of_meta, self.wrt_meta
+
+        target_idxs = np.concatenate([m['global_idxs'] for m in targets.values()]) \
+            if targets else np.zeros(0, dtype=int)
+        all_targets = slice(None)
+
+        cached_idxs = [m['global_idxs'] for m in seeds.values()
+                       if m['meta'] is not None and m['meta'].get('cache_linear_solution')]
+        cached_idxs = np.concatenate(cached_idxs) if cached_idxs else np.zeros(0, dtype=int)
+
+        def get_key(seed_idxs, *extra):
+            if self._cache is None or not np.any(np.isin(seed_idxs, cached_idxs)):
+                return None
+            return (self.mode, np.asarray(seed_idxs, dtype=int).tobytes()) + extra
+
+        solves = []
+        self._block_solves = []
+        if self.coloring is not None:
+            seed_idxs = np.concatenate([m['global_idxs'] for m in seeds.values()])
+            nonzeros = self.coloring.get_nonzeros(self.mode)
+            for color in self.coloring.get_colors(self.mode):
+                solves.append((seed_idxs[color],
+                               [(i, nonzeros[i], target_idxs[nonzeros[i]]) for i in color]))
+            return [solve + (get_key(solve[0]),) for solve in solves]
+
+        par_colors = {}
+        for name, seed in seeds.items():
+            meta = seed['meta'] if seed['meta'] is not None else {}
+            color = meta.get('parallel_deriv_color')
+            if color is not None:
+                par_colors.setdefault(color, []).append(name)
+                continue
+
+            if meta.get('vectorize_derivs'):
+                self._block_solves.append((seed['global_idxs'], seed['jac_slice'],
+                                           target_idxs, get_key(seed['global_idxs'], 'block')))
+                continue
+
+            jslice = seed['jac_slice']
+            for col, idx in zip(range(jslice.start, jslice.stop), seed['global_idxs']):
+                solves.append(([idx], [(col, all_targets, target_idxs)]))
+
+        for names in par_colors.values():
+            solves.extend(self._get_par_color_solves(names, seeds, targets))
+
+        return [solve + (get_key(solve[0]),) for solve in solves]
+
+    @property
+    def nsolves(self):
+        """
+        Return the number of linear solves of one total Jacobian computation.
+        Returns
+        -------
+        int
+            Number of linear solves.
+        """
+        return len(self._solves) + len(self._block_solves)
+
+    def _solve(self, solver, rhs, mode, key=None):
+        """
+        Solve for one right-hand side.
+        Parameters
+        ----------
+        solver : LinearSolver
+            Linear solver of the model.
+        rhs : ndarray
+            Right-hand side.
+        mode : str
+            'fwd' or 'rev'.
+        key : hashable or None
+            Key of the solve in the linear solution cache, None to bypass the cache.
+        Returns
+        -------
+        ndarray
+            The solution.
+        """
+        if key is None:
+            return solver.solve(rhs, mode)
+
+        sol = solver.solve(rhs, mode, self._cache.get(key))
+        self._cache.put(key, sol)
+        return sol
+
+    def _solve_block(self, solver, rhs, mode, key=None):
+        """
+        Solve for several right-hand sides at once.
+        Parameters
+        ----------
+        solver : LinearSolver
+            Linear solver of the model.
+        rhs : ndarray
+            Right-hand sides, one per column.
+        mode : str
+            'fwd' or 'rev'.
+        key : hashable or None
+            Key of the solve in the linear solution cache, None to bypass the cache.
+        Returns
+        -------
+        ndarray
+            The solutions, one per column.
+        """
+        if key is None:
+            return solver._solve_block(rhs, mode)
+
+        sol = solver._solve_block(rhs, mode, self._cache.get(key))
+        self._cache.put(key, sol)
+        return sol
+
+    def _compute_J(self, use_cache=True):
+        """
+        Fill the total Jacobian from the linear solves, the model must be linearized.
+        Parameters
+        ----------
+        use_cache : bool
+            If False, neither read nor update the linear solution cache.
+        """
+        solver = self.model.linear_solver
+        rhs = np.zeros(self.model._outputs.asarray().size)
+        J = self.J
+        fwd = self.mode == 'fwd'
+
+        for seed_idxs, parts, key in self._solves:
+            rhs[seed_idxs] = 1.0
+            sol = self._solve(solver, rhs, self.mode, key if use_cache else None)
+            rhs[seed_idxs] = 0.0
+
+            for jac_idx, tgt_jac, tgt_sol in parts:
+                if fwd:
+                    J[tgt_jac, jac_idx] = sol[tgt_sol]
+                else:
+                    J[jac_idx, tgt_jac] = sol[tgt_sol]
+
+        for seed_idxs, jslice, target_idxs, key in self._block_solves:
+            block = np.zeros((rhs.size, seed_idxs.size))
+            block[seed_idxs, np.arange(seed_idxs.size)] = 1.0
+            sol = self._solve_block(solver, block, self.mode, key if use_cache else None)
+
+            if fwd:
+                J[:, jslice] = sol[target_idxs]
+            else:
+                J[jslice, :] = sol[target_idxs].T
+
+    def _compute_sparsity(self, num_full_jacs):
+        """
+        Sum the magnitudes of total Jacobians computed with random partials.
+        Only the declared partials are randomized, so components that override apply_linear or
+        compute_jacvec_product without declaring their partials are not seen as dependent.
+        Parameters
+        ----------
+        num_full_jacs : int
+            Number of total Jacobians to compute.
+        Returns
+        -------
+        ndarray
+            Sum of the absolute values of the total Jacobians.
+        """
+        from om_lite.core.component import Component
+
+        model = self.model
+        model.run_linearize()
+
+        components = list(model.system_iter(include_self=True, typ=Component))
+        # subsystem solvers first, a parent solver may use them
+        systems = list(model.system_iter(include_self=True))[::-1]
+        rng = np.random.default_rng(11)
+
+        # constant partials, given at declaration, are not set again by a linearization
+        saved = [(comp, {key: np.copy(val) for key, val in comp.partials.items()
+                         if len(key) == 2}) for comp in components]
+
+        sparsity = np.zeros(self.J.shape)
+        for _ in range(num_full_jacs):
+            for comp in components:
+                for key, val in comp.partials.items():
+                    if len(key) == 2:
+                        comp.partials[key] = rng.random(np.shape(val)) + 1.0
+                if comp._assembled_jac is not None:
+                    comp._assembled_jac._update(comp)
+            for system in systems:
+                if system._linear_solver is not None:
+                    system._linear_solver._linearize()
+
+            self.J[:] = 0.0
+            self._compute_J(use_cache=False)
+            sparsity += np.abs(self.J)
+
+        # restore the actual partials
+        for comp, partials in saved:
+            for key, val in partials.items():
+                comp.partials[key] = val
+        model.run_linearize()
+        self.J[:] = 0.0
+        return sparsity
+
+    def compute_totals(self):
+        """
+        Compute derivatives of the requested outputs wrt the requested inputs.
+        Returns
+        -------
+        object
+            Derivatives in the requested return_format.
+        """
+        self.model.run_linearize()
+        self._compute_J()
+
+        if self.driver_scaling:
+            self._apply_driver_scaling()
+
+        return self._get_dict_J()
+
+    def _apply_driver_scaling(self):
+        """
+        Scale the total jacobian by the response and design variable scalers.
+        """
+        for meta in self.of_meta.values():
+            if meta['meta'] is not None:
+                self.J[meta['jac_slice'], :] *= np.reshape(meta['meta']['scaler'], (-1, 1))
+        for meta in self.wrt_meta.values():
+            if meta['meta'] is not None:
+                self.J[:, meta['jac_slice']] /= np.reshape(meta['meta']['scaler'], (1, -1))
+
+    def _get_dict_J(self):
+        """
+        Return the total jacobian in the requested return format.
+        Returns
+        -------
+        object
+            Derivatives in the requested return_format.
+        """
+        J = self.J
+        if self.return_format == 'array':
+            return J
+
+        def key(name, meta):
+            return meta['source'] if self.use_abs_names else name
+
+        if self.return_format == 'flat_dict':
+            totals = {}
+            for of, ofmeta in self.of_meta.items():
+                for wrt, wrtmeta in self.wrt_meta.items():
+                    totals[key(of, ofmeta), key(wrt, wrtmeta)] = \
+                        J[ofmeta['jac_slice'], wrtmeta['jac_slice']]
+            return totals
+
+        totals = {}
+        for of, ofmeta in self.of_meta.items():
+            totals[key(of, ofmeta)] = sub = {}
+            for wrt, wrtmeta in self.wrt_meta.items():
+                sub[key(wrt, wrtmeta)] = J[ofmeta['jac_slice'], wrtmeta['jac_slice']]
+        return totals
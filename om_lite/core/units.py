@@ -0,0 +1,314 @@
+"""Unit definitions and conversion factors."""
+import re
+from functools import lru_cache
+from math import pi
+
+# each unit is (factor, offset, dims): value_si = (value + offset) * factor, dims being the
+# powers of m, kg, s, K, A, mol, cd and rad
+_NDIMS = 8
+_NO_DIMS = (0, ) * _NDIMS
+
+
+def _dims(**powers):
+    names = ('m', 'kg', 's', 'K', 'A', 'mol', 'cd', 'rad')
+    return tuple(powers.get(name, 0) for name in names)
+
+
+_BASE_UNITS = {
+    'm': (1.0, 0.0, _dims(m=1)),
+    'g': (1e-3, 0.0, _dims(kg=1)),
+    's': (1.0, 0.0, _dims(s=1)),
+    'K': (1.0, 0.0, _dims(K=1)),
+    'A': (1.0, 0.0, _dims(A=1)),
+    'mol': (1.0, 0.0, _dims(mol=1)),
+    'cd': (1.0, 0.0, _dims(cd=1)),
+    'rad': (1.0, 0.0, _dims(rad=1)),
+}
+
+# units defined from others, in order; the ones in _PREFIXABLE accept SI prefixes
+_DERIVED_UNITS = [
+    ('N', 'kg*m/s**2'), ('J', 'N*m'), ('W', 'J/s'), ('Pa', 'N/m**2'), ('Hz', '1/s'),
+    ('C', 'A*s'), ('V', 'W/A'), ('ohm', 'V/A'), ('F', 'C/V'), ('T', 'V*s/m**2'),
+    ('L', '1e-3*m**3'), ('bar', '1e5*Pa'), ('atm', '101325*Pa'), ('t', '1000*kg'),
+    ('min', '60*s'), ('h', '3600*s'), ('day', '86400*s'), ('year', '365.25*day'),
+    ('deg', '{}*rad'.format(pi / 180.0)), ('rev', '{}*rad'.format(2.0 * pi)),
+    ('rpm', 'rev/min'), ('inch', '0.0254*m'), ('ft', '12*inch'), ('yd', '3*ft'),
+    ('mi', '5280*ft'), ('nmi', '1852*m'), ('lbm', '0.45359237*kg'), ('slug', '14.593903*kg'),
+    ('lbf', '4.4482216152605*N'), ('psi', 'lbf/inch**2'), ('ksi', '1000*psi'),
+    ('psf', 'lbf/ft**2'), ('mph', 'mi/h'), ('kn', 'nmi/h'), ('hp', '745.69987158*W'),
+    ('Btu', '1055.05585262*J'), ('cal', '4.184*J'), ('galUS', '3.785411784*L'),
+    ('degR', '{}*K'.format(5.0 / 9.0)), ('percent', '0.01'),
+]
+_PREFIXABLE = {'m', 'g', 's', 'K', 'A', 'mol', 'cd', 'rad', 'N', 'J', 'W', 'Pa', 'Hz', 'C',
+               'V', 'ohm', 'F', 'T', 'L', 'bar', 't'}
+
+# temperatures with an offset, only meaningful on their own
+_OFFSET_UNITS = {
+    'degC': (1.0, 273.15, _dims(K=1)),
+    'degF': (5.0 / 9.0, 459.67, _dims(K=1)),
+}
+
+_PREFIXES = {
+    'Y': 1e24, 'Z': 1e21, 'E': 1e18, 'P': 1e15, 'T': 1e12, 'G': 1e9, 'M': 1e6, 'k': 1e3,
+    'h': 1e2, 'da': 1e1, 'd': 1e-1, 'c': 1e-2, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12,
+    'f': 1e-15, 'a': 1e-18, 'z': 1e-21, 'y': 1e-24,
+}
+
+_TOKEN = re.compile(r'\s*(\*\*|\*|/|\(|\)|\^|[A-Za-z_]+|[-+]?(?:\d+\.?\d*|\.\d+)'
+                    r'(?:[eE][-+]?\d+)?)')
+
+_UNITS = {}
+
+
+def _tokenize(expr):
+    """
+    Split a unit expression into names, numbers and operators.
+    Parameters
+    ----------
+    expr : str
+        The unit expression.
+    Returns
+    -------
+    list of str
+        The tokens.
+    """
+    tokens = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        match = _TOKEN.match(expr, pos)
+        if match is None:
+            raise ValueError("The units '{}' are invalid.".format(expr))
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+def _parse(expr):
+    """
+    Compute the factor and dimensions of a unit expression.
+    Parameters
+    ----------
+    expr : str
+        Products and quotients of unit names and numbers, with integer powers.
+    Returns
+    -------
+    tuple
+        (factor, offset, dims) of the expression.
+    """
+    tokens = _tokenize(expr)
+    pos = [0]
+
+    def peek():
+        return tokens[pos[0]] if pos[0] < len(tokens) else None
+
+    def take():
+        pos[0] += 1
+        return tokens[pos[0] - 1]
+
+    def atom():
+        token = take()
+        if token == '(':
+            val = product()
+            if take() != ')':
+                raise ValueError("The units '{}' are invalid.".format(expr))
+            return val
+        if token[0].isalpha() or token[0] == '_':
+            return _find_unit(token)
+        return (float(token), 0.0, _NO_DIMS)
+
+    def power():
+        factor, offset, dims = atom()
+        if peek() in ('**', '^'):
+            take()
+            exp = float(take())
+            if exp != int(exp):
+                raise ValueError("The units '{}' have a non integer power.".format(expr))
+            exp = int(exp)
+            return (factor ** exp, 0.0, tuple(d * exp for d in dims))
+        return (factor, offset, dims)
+
+    def product():
+        val = power()
+        nterms = 1
+        while peek() in ('*', '/'):
+            op = take()
+            factor, _, dims = power()
+            if op == '*':
+                val = (val[0] * factor, 0.0, tuple(a + b for a, b in zip(val[2], dims)))
+            else:
+                val = (val[0] / factor, 0.0, tuple(a - b for a, b in zip(val[2], dims)))
+            nterms += 1
+        return val if nterms == 1 else (val[0], 0.0, val[2])
+
+    try:
+        val = product()
+    except (IndexError, KeyError):
+        raise ValueError("The units '{}' are invalid.".format(expr))
+    if pos[0] != len(tokens):
+        raise ValueError("The units '{}' are invalid.".format(expr))
+    return val
+
+
+def _find_unit(name):
+    """
+    Return the definition of a unit name, possibly with an SI prefix.
+    Parameters
+    ----------
+    name : str
+        Name of the unit.
+    Returns
+    -------
+    tuple
+        (factor, offset, dims) of the unit.
+    """
+    unit = _UNITS.get(name)
+    if unit is not None:
+        return unit
+
+    for prefix, scale in _PREFIXES.items():
+        base = name[len(prefix):]
+        if name.startswith(prefix) and base in _PREFIXABLE:
+            factor, offset, dims = _UNITS[base]
+            return (factor * scale, offset, dims)
+
+    raise ValueError("The units '{}' are invalid.".format(name))
+
+
+def _define_units():
+    """
+    Fill the table of units.
+    """
+    _UNITS.update(_BASE_UNITS)
+    _UNITS['kg'] = _BASE_UNITS['g'][0] * 1e3, 0.0, _BASE_UNITS['g'][2]
+    _UNITS.update(_OFFSET_UNITS)
+    for name, expr in _DERIVED_UNITS:
+        _UNITS[name] = _parse(expr)
+    for name in ('unitless', '1'):
+        _UNITS[name] = (1.0, 0.0, _NO_DIMS)
+
+
+_define_units()
+
+
+@lru_cache(maxsize=None)
+def _get_unit(units):
+    """
+    Return the definition of a unit string, cached.
+    Parameters
+    ----------
+    units : str
+        The units.
+    Returns
+    -------
+    tuple
+        (factor, offset, dims) of the units.
+    """
+    if units in _UNITS:
+        return _UNITS[units]
+    return _parse(units)
+
+
+def simplify_unit(units):
+    """
+    Check a unit string and return it without surrounding blanks.
+    Parameters
+    ----------
+    units : str or None
+        The units.
+    Returns
+    -------
+    str or None
+        The units, None if none were given.
+    """
+    if units is None:
+        return None
+    units = units.strip()
+    _get_unit(units)
+    return units
+
+
+def is_compatible(old_units, new_units):
+    """
+    Check if two units measure the same quantity.
+    Parameters
+    ----------
+    old_units : str
+        The first units.
+    new_units : str
+        The second units.
+    Returns
+    -------
+    bool
+        True if a value can be converted from one to the other.
+    """
+    return _get_unit(old_units)[2] == _get_unit(new_units)[2]
+
+
+@lru_cache(maxsize=None)
+def unit_conversion(old_units, new_units):
+    """
+    Return the affine conversion between two units.
+    Parameters
+    ----------
+    old_units : str
+        The units to convert from.
+    new_units : str
+        The units to convert to.
+    Returns
+    -------
+    float
+        Scale of the conversion.
+    float
+        Offset of the conversion, new value = (old value + offset) * scale.
+    """
+    old_factor, old_offset, old_dims = _get_unit(old_units)
+    new_factor, new_offset, new_dims = _get_unit(new_units)
+    if old_dims != new_dims:
+        raise TypeError("Units '{}' and '{}' are incompatible.".format(old_units, new_units))
+
+    scale = old_factor / new_factor
+    return scale, old_offset - new_offset / scale
+
+
+def convert_units(val, old_units, new_units):
+    """
+    Convert a value from one unit to another.
+    Parameters
+    ----------
+    val : float or ndarray
+        The value.
+    old_units : str or None
+        The units of the value. No conversion is done if None.
+    new_units : str or None
+        The units to convert to. No conversion is done if None.
+    Returns
+    -------
+    float or ndarray
+        The converted value.
+    """
+    if old_units is None or new_units is None or old_units == new_units:
+        return val
+    scale, offset = unit_conversion(old_units, new_units)
+    return (val + offset) * scale
+
+
+def _connection_factors(src_units, tgt_units):
+    """
+    Return the affine conversion applied when transferring a value between two variables.
+    Parameters
+    ----------
+    src_units : str or None
+        The units of the source output.
+    tgt_units : str or None
+        The units of the target input.
+    Returns
+    -------
+    float
+        Scale of the conversion, 1.0 if either variable has no units.
+    float
+        Offset of the conversion, 0.0 if either variable has no units.
+    """
+    if src_units is None or tgt_units is None or src_units == tgt_units:
+        return 1.0, 0.0
+    return unit_conversion(src_units, tgt_units)
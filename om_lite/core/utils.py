@@ -0,0 +1,349 @@
+"""Small helpers shared by the om_lite core classes."""
+import heapq
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+
+class _UndefinedType(object):
+    """
+    Singleton used to flag a value that has not been found or set.
+    """
+
+    def __repr__(self):
+        return '_UNDEFINED'
+
+
+_UNDEFINED = _UndefinedType()
+
+# slice object used to address an entire variable
+_full_slice = slice(None)
+
+
+class FakeComm(object):
+    """
+    Serial stand-in for an MPI communicator.
+    Attributes
+    ----------
+    rank : int
+        Rank of this process, always 0.
+    size : int
+        Number of processes, always 1.
+    """
+
+    def __init__(self):
+        self.rank = 0
+        self.size = 1
+
+
+def _is_slicer_op(indices):
+    """
+    Check if an indexer contains a slice or ellipsis operator.
+    Parameters
+    ----------
+    indices : object
+        Object to check.
+    Returns
+    -------
+    bool
+        True if it's a slice or ellipsis operator.
+    """
+    if isinstance(indices, tuple):
+        return any(isinstance(i, slice) or i is ... for i in indices)
+
+    return isinstance(indices, slice)
+
+
+def _slice_indices(slicer, arr_size, arr_shape):
+    """
+    Convert a slicer into flat integer indices of an array.
+    Parameters
+    ----------
+    slicer : slice or tuple of slices
+        Slicer applied to an array of the given shape.
+    arr_size : int
+        Size of the sliced array.
+    arr_shape : tuple
+        Shape of the sliced array.
+    Returns
+    -------
+    ndarray of int
+        Flat indices selected by the slicer.
+    """
+    return np.arange(arr_size, dtype=int).reshape(arr_shape)[slicer].ravel()
+
+
+def _batch_index(slices, npts):
+    """
+    Map the points of a batched vector to the flat layout of the unbatched one.
+    In a batched vector every variable has a leading batch axis, so it is stored as its
+    (npts, size) matrix, one variable after the other.
+    Parameters
+    ----------
+    slices : dict
+        Location of each variable in the unbatched vector.
+    npts : int
+        Number of points in the batch.
+    Returns
+    -------
+    ndarray of int
+        Indices into the batched buffer, (npts, size of the unbatched vector). Row i holds
+        point i laid out like the unbatched vector.
+    """
+    size = max((slc.stop for slc in slices.values()), default=0)
+    idxs = np.empty((npts, size), dtype=int)
+    for slc in slices.values():
+        idxs[:, slc] = npts * slc.start + np.arange(npts * (slc.stop - slc.start)).reshape(
+            npts, -1)
+    return idxs
+
+
+def ensure_compatible(name, value, shape=None):
+    """
+    Make value and shape consistent with each other.
+    Parameters
+    ----------
+    name : str
+        Name of the variable, used in error messages.
+    value : float or list or tuple or ndarray
+        Default value of the variable.
+    shape : int or tuple or list or None
+        Shape of the variable, if given.
+    Returns
+    -------
+    ndarray
+        Value of the variable as a float array of the given shape.
+    tuple
+        Shape of the variable.
+    """
+    if isinstance(shape, int):
+        shape = (shape, )
+    elif shape is not None:
+        shape = tuple(shape)
+
+    value = np.atleast_1d(np.asarray(value, dtype=float))
+
+    if shape is None:
+        shape = value.shape
+    elif value.size == 1:
+        value = np.full(shape, value.ravel()[0], dtype=float)
+    elif value.shape != shape:
+        raise ValueError(
+            "The shape {} of the value of '{}' does not match the given shape {}."
+            .format(value.shape, name, shape))
+
+    return value.copy(), shape
+
+
+def _as_src_indices(src_indices):
+    """
+    Convert src_indices given by the user to integer arrays.
+    Parameters
+    ----------
+    src_indices : int or list or tuple or ndarray
+        Indices of the source entries. A tuple holds one index array per source axis.
+    Returns
+    -------
+    ndarray or tuple of ndarray
+        The indices, a tuple of arrays if given as a tuple.
+    """
+    if isinstance(src_indices, tuple):
+        return tuple(np.asarray(idx, dtype=int) for idx in src_indices)
+    return np.atleast_1d(np.asarray(src_indices, dtype=int))
+
+
+def _flatten_src_indices(name, src_indices, flat, src_shape, size):
+    """
+    Convert src_indices to indices into the flattened source.
+    Non-flat indices into a source with several dimensions are either a tuple of one index
+    array per source axis, or an array whose last axis holds the index of each entry along
+    every source axis. Any other indices are flat.
+    Parameters
+    ----------
+    name : str
+        Absolute name of the input, used in error messages.
+    src_indices : ndarray or tuple of ndarray
+        The indices.
+    flat : bool or None
+        True if the indices are flat.
+    src_shape : tuple
+        Shape of the source.
+    size : int
+        Size of the input.
+    Returns
+    -------
+    ndarray
+        The flat indices, one per entry of the input.
+    """
+    ndim = len(src_shape)
+    axes = None
+    if isinstance(src_indices, tuple):
+        if flat:
+            raise ValueError("The flat src_indices of '{}' cannot be a tuple.".format(name))
+        axes = src_indices
+    elif not flat and ndim > 1 and src_indices.ndim > 1 and src_indices.shape[-1] == ndim:
+        axes = tuple(np.moveaxis(src_indices, -1, 0))
+
+    if axes is not None:
+        if len(axes) != ndim:
+            raise ValueError("The src_indices of '{}' index {} axes of a source of shape "
+                             "{}.".format(name, len(axes), src_shape))
+        axes = tuple(np.where(idx < 0, idx + dim, idx)
+                     for idx, dim in zip(np.broadcast_arrays(*axes), src_shape))
+        try:
+            src_indices = np.ravel_multi_index(axes, src_shape)
+        except ValueError:
+            raise ValueError("The src_indices of '{}' are out of bounds for a source of "
+                             "shape {}.".format(name, src_shape))
+
+    src_indices = np.asarray(src_indices, dtype=int).ravel()
+    if src_indices.size != size:
+        raise ValueError("The src_indices of '{}' select {} values but the input has size "
+                         "{}.".format(name, src_indices.size, size))
+    return src_indices
+
+
+def name2abs_names(system, name):
+    """
+    Map the given promoted, relative, or absolute name to any matching absolute names.
+    Parameters
+    ----------
+    system : System
+        System to which name is relative.
+    name : str
+        Promoted or relative variable name in the owning system's namespace.
+    Returns
+    -------
+    tuple of str
+        Absolute names of the matching variables (empty if none match).
+    """
+    prom2abs = system._var_allprocs_prom2abs_list
+
+    if name in prom2abs['output']:
+        return tuple(prom2abs['output'][name])
+
+    if name in prom2abs['input']:
+        return tuple(prom2abs['input'][name])
+
+    abs_name = system.pathname + '.' + name if system.pathname else name
+    if abs_name in system._var_allprocs_abs2prom['output']:
+        return (abs_name, )
+    if abs_name in system._var_allprocs_abs2prom['input']:
+        return (abs_name, )
+
+    return ()
+
+
+def match_prom_or_alias(name, patterns):
+    """
+    Match a variable name against a list of promotion patterns.
+    Parameters
+    ----------
+    name : str
+        Promoted name of the variable in the subsystem.
+    patterns : list of str or tuple
+        Glob patterns, or (old_name, new_name) tuples for aliased promotes.
+    Returns
+    -------
+    str or None
+        The name to promote the variable as, or None if nothing matched.
+    """
+    for pattern in patterns:
+        if isinstance(pattern, tuple):
+            if pattern[0] == name:
+                return pattern[1]
+        elif fnmatchcase(name, pattern):
+            return name
+
+    return None
+
+
+def get_sccs_topo(nodes, edges):
+    """
+    Return the strongly connected components of a directed graph in topological order.
+    Components are found with Tarjan's algorithm, then ordered with Kahn's algorithm on the
+    condensed graph, breaking ties by the position of their first node in the given order so
+    that unrelated nodes keep their original order.
+    Parameters
+    ----------
+    nodes : list
+        Nodes of the graph, in their preferred order.
+    edges : dict
+        Maps each node to the set of nodes that depend on it.
+    Returns
+    -------
+    list of list
+        Strongly connected components, each sorted in the preferred order.
+    """
+    pos = {node: i for i, node in enumerate(nodes)}
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    sccs = []
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        # iterative version of Tarjan's recursive visit
+        work = [(root, iter(sorted(edges.get(root, ()), key=pos.get)))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(edges.get(child, ()), key=pos.get))))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    scc = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        scc.append(member)
+                        if member == node:
+                            break
+                    sccs.append(sorted(scc, key=pos.get))
+
+    node2scc = {}
+    for i, scc in enumerate(sccs):
+        for node in scc:
+            node2scc[node] = i
+
+    succ = [set() for _ in sccs]
+    indegree = [0] * len(sccs)
+    for src, tgts in edges.items():
+        for tgt in tgts:
+            s, t = node2scc[src], node2scc[tgt]
+            if s != t and t not in succ[s]:
+                succ[s].add(t)
+                indegree[t] += 1
+
+    ready = [(pos[scc[0]], i) for i, scc in enumerate(sccs) if indegree[i] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _, i = heapq.heappop(ready)
+        ordered.append(sccs[i])
+        for t in succ[i]:
+            indegree[t] -= 1
+            if indegree[t] == 0:
+                heapq.heappush(ready, (pos[sccs[t][0]], t))
+
+    return ordered
@@ -0,0 +1,355 @@
+"""Define the Vector class."""
+import numpy as np
+
+from om_lite.core.utils import _full_slice
+
+
+class Vector(object):
+    """
+    Named views into one contiguous float64 buffer.
+    Variables are first declared with ``_add_var``, then ``_allocate`` lays them out back to back
+    in a single array and replaces every entry with a reshaped view into it. Subsystem vectors
+    returned by ``_get_subvector`` share the same buffer, so a whole model can be read or updated
+    with one array operation through ``asarray``.
+    Attributes
+    ----------
+    _kind : str
+        One of 'input', 'output' or 'residual'.
+    _pathname : str
+        Pathname of the system owning this vector. Names passed to ``__getitem__`` are relative
+        to this system.
+    _prefix : str
+        Prefix turning a relative name into an absolute name.
+    _data : ndarray or None
+        The flat buffer, or None before allocation.
+    _abs2meta : dict
+        Shape, size and initial value of each declared variable, keyed by absolute name.
+    _views : dict
+        Shaped views into _data keyed by absolute name.
+    _views_flat : dict
+        Flat views into _data keyed by absolute name.
+    _slices : dict
+        Location of each variable in _data keyed by absolute name.
+    """
+
+    def __init__(self, kind, pathname=''):
+        """
+        Initialize all attributes.
+        Parameters
+        ----------
+        kind : str
+            One of 'input', 'output' or 'residual'.
+        pathname : str
+            Pathname of the system owning this vector.
+        """
+        self._kind = kind
+        self._pathname = pathname
+        self._prefix = pathname + '.' if pathname else ''
+        self._data = None
+        self._abs2meta = {}
+        self._views = {}
+        self._views_flat = {}
+        self._slices = {}
+
+    def __repr__(self):
+        return '<{} {} {} vars>'.format(type(self).__name__, self._kind,
+                                        len(self._abs2meta))
+
+    def _add_var(self, name, val, shape):
+        """
+        Declare a variable in this vector.
+        Declaring the same name twice (as happens when several components share one vector
+        through promotion) is allowed as long as the sizes agree.
+        Parameters
+        ----------
+        name : str
+            Name of the variable relative to the owning system.
+        val : ndarray
+            Initial value of the variable.
+        shape : tuple
+            Shape of the variable.
+        """
+        abs_name = self._prefix + name
+        size = int(np.prod(shape))
+
+        if abs_name in self._abs2meta:
+            if self._abs2meta[abs_name]['size'] != size:
+                raise ValueError(
+                    "Variable '{}' was already declared in this {} vector with size {}, "
+                    "not {}.".format(abs_name, self._kind,
+                                     self._abs2meta[abs_name]['size'], size))
+            return
+
+        self._abs2meta[abs_name] = {'shape': shape, 'size': size, 'val': val}
+
+        if self._data is not None:
+            # declaring into an allocated vector means it has to be laid out again
+            self._allocate()
+
+    def _allocate(self, data=None):
+        """
+        Lay out all declared variables in one buffer and create the views.
+        Parameters
+        ----------
+        data : ndarray or None
+            Flat buffer to adopt. A new buffer is allocated if None.
+        """
+        total = sum(meta['size'] for meta in self._abs2meta.values())
+
+        if data is None:
+            old_views = self._views_flat
+            data = np.zeros(total)
+        else:
+            old_views = {}
+            if data.size != total:
+                raise ValueError(
+                    "Buffer of size {} given for a {} vector of size {}.".format(
+                        data.size, self._kind, total))
+
+        self._data = data
+        self._views = views = {}
+        self._views_flat = views_flat = {}
+        self._slices = slices = {}
+
+        start = 0
+        for abs_name, meta in self._abs2meta.items():
+            end = start + meta['size']
+            slices[abs_name] = slice(start, end)
+            views_flat[abs_name] = flat = data[start:end]
+            views[abs_name] = flat.reshape(meta['shape'])
+
+            if abs_name in old_views:
+                flat[:] = old_views[abs_name]
+            elif meta['val'] is not None and self._kind != 'residual':
+                flat[:] = np.ravel(meta['val'])
+            start = end
+
+    def _get_subvector(self, pathname):
+        """
+        Return the vector of a subsystem, sharing this vector's buffer.
+        Parameters
+        ----------
+        pathname : str
+            Pathname of the subsystem.
+        Returns
+        -------
+        Vector
+            Vector whose buffer is the contiguous part of this one owned by the subsystem.
+        """
+        sub = Vector(self._kind, pathname)
+        prefix = sub._prefix
+
+        names = [n for n in self._abs2meta if n.startswith(prefix)]
+        if names:
+            start = self._slices[names[0]].start
+            end = self._slices[names[-1]].stop
+        else:
+            start = end = 0
+
+        sub._data = self._data[start:end]
+        for abs_name in names:
+            sub._abs2meta[abs_name] = self._abs2meta[abs_name]
+            sub._views[abs_name] = self._views[abs_name]
+            sub._views_flat[abs_name] = self._views_flat[abs_name]
+            slc = self._slices[abs_name]
+            sub._slices[abs_name] = slice(slc.start - start, slc.stop - start)
+
+        if sum(self._abs2meta[n]['size'] for n in names) != end - start:
+            raise RuntimeError(
+                "Variables of '{}' are not contiguous in the {} vector.".format(
+                    pathname, self._kind))
+
+        return sub
+
+    def __contains__(self, name):
+        """
+        Check if a variable is in this vector.
+        Parameters
+        ----------
+        name : str
+            Name relative to the owning system.
+        Returns
+        -------
+        bool
+            True if the variable is in this vector.
+        """
+        return self._prefix + name in self._abs2meta
+
+    def __iter__(self):
+        """
+        Yield the relative names of the variables in this vector.
+        Yields
+        ------
+        str
+            Name relative to the owning system.
+        """
+        plen = len(self._prefix)
+        for abs_name in self._abs2meta:
+            yield abs_name[plen:]
+
+    def __len__(self):
+        return len(self._abs2meta)
+
+    def keys(self):
+        """
+        Return the relative names of the variables in this vector.
+        Returns
+        -------
+        list of str
+            Names relative to the owning system.
+        """
+        return list(self)
+
+    def values(self):
+        """
+        Return the values of the variables in this vector.
+        Returns
+        -------
+        list of ndarray
+            Views into the buffer, in declaration order.
+        """
+        return [self[name] for name in self]
+
+    def items(self):
+        """
+        Return (name, value) pairs for the variables in this vector.
+        Returns
+        -------
+        list of (str, ndarray)
+            Relative names and views into the buffer.
+        """
+        return [(name, self[name]) for name in self]
+
+    def __getitem__(self, name):
+        """
+        Get the value of a variable.
+        Parameters
+        ----------
+        name : str
+            Name relative to the owning system.
+        Returns
+        -------
+        ndarray
+            A view into the buffer, or the declared value before allocation.
+        """
+        abs_name = self._prefix + name
+        if self._data is not None:
+            try:
+                return self._views[abs_name]
+            except KeyError:
+                pass
+        elif abs_name in self._abs2meta:
+            return self._abs2meta[abs_name]['val']
+
+        raise KeyError("Variable name '{}' not found in {} vector.".format(
+            name, self._kind))
+
+    def __setitem__(self, name, value):
+        """
+        Set the value of a variable in place.
+        Parameters
+        ----------
+        name : str
+            Name relative to the owning system.
+        value : float or ndarray
+            Value to set. Must broadcast to the shape of the variable.
+        """
+        self.set_var(self._prefix + name, value)
+
+    def _contains_abs(self, abs_name):
+        """
+        Check if a variable is in this vector.
+        Parameters
+        ----------
+        abs_name : str
+            Absolute name of the variable.
+        Returns
+        -------
+        bool
+            True if the variable is in this vector.
+        """
+        return abs_name in self._abs2meta
+
+    def _abs_get_val(self, abs_name, flat=True):
+        """
+        Get the value of a variable by its absolute name.
+        Parameters
+        ----------
+        abs_name : str
+            Absolute name of the variable.
+        flat : bool
+            If True, return the flat view.
+        Returns
+        -------
+        ndarray
+            A view into the buffer.
+        """
+        if flat:
+            return self._views_flat[abs_name]
+        return self._views[abs_name]
+
+    def set_var(self, abs_name, val, idxs=_full_slice, flat=False):
+        """
+        Set the value of a variable, or part of it, in place.
+        Integer index arrays always address the flattened variable.
+        Parameters
+        ----------
+        abs_name : str
+            Absolute name of the variable.
+        val : float or ndarray
+            Value to set.
+        idxs : int or slice or tuple of ints and/or slices or ndarray
+            Indices into the variable.
+        flat : bool
+            If True, idxs address the flattened variable.
+        """
+        if self._data is None:
+            meta = self._abs2meta[abs_name]
+            meta['val'] = np.array(meta['val'], dtype=float)
+            meta['val'][idxs] = val
+            return
+
+        if flat or isinstance(idxs, (np.ndarray, list)):
+            self._views_flat[abs_name][idxs] = np.ravel(val) if np.ndim(val) > 1 else val
+        else:
+            self._views[abs_name][idxs] = val
+
+    def asarray(self):
+        """
+        Return the flat buffer of this vector.
+        Returns
+        -------
+        ndarray
+            The buffer itself, not a copy.
+        """
+        return self._data
+
+    def set_val(self, val):
+        """
+        Fill the whole buffer from a float or array.
+        Parameters
+        ----------
+        val : float or ndarray
+            Value to set.
+        """
+        self._data[:] = val
+
+    def set_vec(self, vec):
+        """
+        Copy the values of another vector with the same layout.
+        Parameters
+        ----------
+        vec : Vector
+            Vector to copy from.
+        """
+        self._data[:] = vec._data
+
+    def get_norm(self):
+        """
+        Return the 2-norm of the buffer.
+        Returns
+        -------
+        float
+            The norm.
+        """
+        return np.linalg.norm(self._data)